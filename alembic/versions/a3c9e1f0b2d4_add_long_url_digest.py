@@ -0,0 +1,89 @@
+"""add long_url digest
+
+Revision ID: a3c9e1f0b2d4
+Revises: 1f506d5ab46d
+Create Date: 2026-10-18 10:12:41.204113
+
+"""
+
+from hashlib import sha256
+from typing import Sequence, Union
+from urllib.parse import urlsplit, urlunsplit
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c9e1f0b2d4"
+down_revision: Union[str, Sequence[str], None] = "1f506d5ab46d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10_000
+
+
+# Cópia congelada de app.utils.hash_url: a migração precisa calcular sempre o
+# mesmo digest, mesmo que o app mude a normalização depois.
+def hash_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    userinfo, at, host = parts.netloc.rpartition("@")
+    normalized = urlunsplit(
+        parts._replace(
+            scheme=parts.scheme.lower(), netloc=f"{userinfo}{at}{host.lower()}"
+        )
+    )
+    return sha256(normalized.encode()).hexdigest()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("urls", sa.Column("long_url_digest", sa.String(64), nullable=True))
+
+    # Backfill em lotes, percorrendo a chave primária, para não segurar a tabela
+    # inteira em memória nem em uma única instrução UPDATE.
+    conn = op.get_bind()
+    last_uuid = ""
+    while True:
+        rows = conn.execute(
+            sa.text(
+                "SELECT uuid, long_url FROM urls WHERE uuid > :last_uuid "
+                "ORDER BY uuid LIMIT :limit"
+            ),
+            {"last_uuid": last_uuid, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+
+        conn.execute(
+            sa.text("UPDATE urls SET long_url_digest = :digest WHERE uuid = :uuid"),
+            [{"uuid": uuid, "digest": hash_url(long_url)} for uuid, long_url in rows],
+        )
+        last_uuid = rows[-1].uuid
+
+    # long_url era único, mas URLs que só diferem na caixa do esquema ou do
+    # host têm o mesmo digest. A mais antiga fica com o digest (e passa a ser
+    # a devolvida pelo /shorten); as demais continuam redirecionando pelos
+    # seus códigos, com um digest próprio que nunca coincide com um sha256.
+    conn.execute(
+        sa.text(
+            "UPDATE urls SET long_url_digest = 'dup:' || urls.uuid FROM ("
+            " SELECT uuid, row_number() OVER ("
+            "  PARTITION BY long_url_digest ORDER BY created_at, uuid"
+            " ) AS position FROM urls"
+            ") AS ranked WHERE urls.uuid = ranked.uuid AND ranked.position > 1"
+        )
+    )
+
+    op.alter_column("urls", "long_url_digest", nullable=False)
+    op.create_index(
+        op.f("ix_urls_long_url_digest"), "urls", ["long_url_digest"], unique=True
+    )
+    op.drop_constraint(op.f("urls_long_url_key"), "urls", type_="unique")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_unique_constraint(op.f("urls_long_url_key"), "urls", ["long_url"])
+    op.drop_index(op.f("ix_urls_long_url_digest"), table_name="urls")
+    op.drop_column("urls", "long_url_digest")
@@ -0,0 +1,43 @@
+"""add url expires_at
+
+Revision ID: b8d3f2a6c4e1
+Revises: e4b2a7c1d9f0
+Create Date: 2026-10-18 20:12:41.527903
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d3f2a6c4e1"
+down_revision: Union[str, Sequence[str], None] = "e4b2a7c1d9f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Coluna nullable sem default: só altera o catálogo, sem reescrever a tabela.
+    op.add_column("urls", sa.Column("expires_at", sa.DateTime(), nullable=True))
+    # CONCURRENTLY não bloqueia escritas em urls, mas não roda em transação.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_urls_expires_at",
+            "urls",
+            ["expires_at"],
+            postgresql_where=sa.text("expires_at IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_urls_expires_at", table_name="urls", postgresql_concurrently=True
+        )
+    op.drop_column("urls", "expires_at")
@@ -0,0 +1,33 @@
+"""add short_code sequence
+
+Revision ID: c71d5e9a8f36
+Revises: a3c9e1f0b2d4
+Create Date: 2026-10-18 11:02:17.553920
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c71d5e9a8f36"
+down_revision: Union[str, Sequence[str], None] = "a3c9e1f0b2d4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        sa.schema.CreateSequence(
+            sa.Sequence("short_code_seq", start=0, minvalue=0, increment=1024)
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(sa.schema.DropSequence(sa.Sequence("short_code_seq")))
@@ -0,0 +1,34 @@
+"""add url cacheable
+
+Revision ID: d5a1c7e3f9b2
+Revises: b8d3f2a6c4e1
+Create Date: 2026-10-18 21:04:17.310562
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d5a1c7e3f9b2"
+down_revision: Union[str, Sequence[str], None] = "b8d3f2a6c4e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Default constante: no Postgres 11+ só altera o catálogo, sem reescrever a
+    # tabela.
+    op.add_column(
+        "urls",
+        sa.Column("cacheable", sa.Boolean(), server_default=sa.true(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("urls", "cacheable")
@@ -0,0 +1,35 @@
+"""create url_clicks table
+
+Revision ID: e4b2a7c1d9f0
+Revises: c71d5e9a8f36
+Create Date: 2026-10-18 11:48:05.913274
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e4b2a7c1d9f0"
+down_revision: Union[str, Sequence[str], None] = "c71d5e9a8f36"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "url_clicks",
+        sa.Column("short_code", sa.String(), nullable=False),
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("clicks", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("short_code", "bucket"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("url_clicks")
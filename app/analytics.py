@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from time import time
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal
+from .models import UrlClicks
+from .settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+
+class ClickRecorder:
+    """Agrega cliques em memória e os grava em lote no Postgres.
+
+    `record` é chamado no caminho de redirecionamento e só incrementa um
+    contador; o flush roda em uma task de fundo, a cada `flush_interval`
+    segundos ou quando `flush_threshold` cliques se acumulam.
+    """
+
+    def __init__(self, flush_interval: float, flush_threshold: int, enabled=True):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.enabled = enabled
+        self._pending: Counter[tuple[str, int]] = Counter()
+        self._pending_clicks = 0
+        self._wake = asyncio.Event()
+
+    def record(self, short_code: str) -> None:
+        if not self.enabled:
+            return
+        self._pending[(short_code, int(time()) // 60)] += 1
+        self._pending_clicks += 1
+        if self._pending_clicks >= self.flush_threshold:
+            self._wake.set()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, Counter()
+        self._pending_clicks = 0
+
+        rows = [
+            {
+                "short_code": short_code,
+                "bucket": datetime.fromtimestamp(minute * 60),
+                "clicks": clicks,
+            }
+            # Ordem fixa de chaves evita deadlocks entre workers no upsert.
+            for (short_code, minute), clicks in sorted(pending.items())
+        ]
+        stmt = insert(UrlClicks)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UrlClicks.short_code, UrlClicks.bucket],
+            set_={"clicks": UrlClicks.clicks + stmt.excluded.clicks},
+        )
+
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(stmt, rows)
+                await session.commit()
+        except (SQLAlchemyError, OSError) as e:
+            logger.error("Error flushing click analytics: %s", e)
+            # Devolve os cliques para a próxima tentativa.
+            self._pending.update(pending)
+            self._pending_clicks += pending.total()
+
+    async def run(self) -> None:
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except TimeoutError:
+                    pass
+                self._wake.clear()
+                await self.flush()
+        finally:
+            await self.flush()
+
+
+async def get_click_stats(
+    session: AsyncSession, short_code: str, since: datetime
+) -> tuple[int, list[UrlClicks]]:
+    total = await session.scalar(
+        select(func.coalesce(func.sum(UrlClicks.clicks), 0)).where(
+            UrlClicks.short_code == short_code
+        )
+    )
+    buckets = await session.scalars(
+        select(UrlClicks)
+        .where(UrlClicks.short_code == short_code, UrlClicks.bucket >= since)
+        .order_by(UrlClicks.bucket)
+    )
+    return total, list(buckets)
+
+
+# Os cliques vão para o Postgres: sem ele (STORAGE_BACKEND=memory) não são contados.
+click_recorder = ClickRecorder(
+    settings.analytics_flush_interval,
+    settings.analytics_flush_threshold,
+    enabled=settings.storage_backend == "postgres",
+)
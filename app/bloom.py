@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import math
+from hashlib import blake2b
+from typing import AsyncIterator
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import AsyncSessionLocal
+from .metrics import register_collector
+from .models import Url
+from .settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+
+class BloomFilter:
+    """Conjunto probabilístico: sem falsos negativos, falsos positivos ~error_rate.
+
+    Dimensionado para `capacity` elementos; acima disso a taxa de falsos
+    positivos cresce, por isso o índice é reconstruído com folga.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Double hashing (Kirsch-Mitzenmacher): k posições a partir de um digest.
+        digest = blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+async def stream_short_codes() -> AsyncIterator[str]:
+    async with AsyncSessionLocal() as session:
+        codes = await session.stream_scalars(
+            select(Url.short_code).execution_options(yield_per=10_000)
+        )
+        async for code in codes:
+            yield code
+
+
+async def count_short_codes() -> int:
+    async with AsyncSessionLocal() as session:
+        return await session.scalar(select(func.count()).select_from(Url))
+
+
+class CodeIndex:
+    """Índice em memória de todos os short codes existentes.
+
+    Códigos criados por qualquer worker chegam pelo canal de anúncios do Redis.
+    Enquanto o índice não foi reconstruído com o canal já assinado (ou depois de
+    perder o canal), ele não está pronto e `might_exist` responde sempre True:
+    na dúvida, a consulta segue para o banco.
+
+    O canal não garante entrega: um worker cujo anúncio falhou incrementa o
+    epoch do índice no Redis, e quem vê o epoch mudar também deixa de rejeitar
+    até a próxima reconstrução. Reconstruções (uma varredura da tabela) têm
+    intervalo mínimo de `min_rebuild_interval` segundos.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        rebuild_interval: float,
+        enabled=True,
+        min_rebuild_interval: float = 0.0,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.min_rebuild_interval = min_rebuild_interval
+        self.enabled = enabled
+        # Marcado por quem não conseguiu anunciar códigos; o listener publica o
+        # novo epoch assim que o Redis responder.
+        self.announcements_lost = False
+        self.ready = False
+        self.rejections = 0
+        self._filter: BloomFilter | None = None
+        self._building: BloomFilter | None = None
+        self._listening = False
+        self._generation = 0
+        self._epoch: str | None = None
+        self._last_rebuild = -math.inf
+        self._stale = asyncio.Event()
+
+    def might_exist(self, short_code: str) -> bool:
+        if not self.ready:
+            return True
+        if short_code in self._filter:
+            return True
+        self.rejections += 1
+        return False
+
+    def add(self, short_code: str) -> None:
+        if self._filter is not None:
+            self._filter.add(short_code)
+        # Códigos criados durante a reconstrução também entram no novo filtro.
+        if self._building is not None:
+            self._building.add(short_code)
+
+    def start_listening(self, epoch: str | None = None) -> None:
+        """Chamado quando o canal de anúncios foi assinado: reconstrói o índice."""
+        self._epoch = epoch
+        self._listening = True
+        self._stale.set()
+
+    def observe_epoch(self, epoch: str | None) -> None:
+        """Epoch atual no Redis; se mudou, algum anúncio se perdeu."""
+        if epoch == self._epoch:
+            return
+        self._epoch = epoch
+        self.ready = False
+        self._generation += 1
+        self._stale.set()
+
+    def invalidate(self) -> None:
+        """Chamado ao perder o canal: anúncios podem ter sido perdidos."""
+        self.ready = False
+        self._listening = False
+        self._generation += 1
+
+    async def rebuild(self) -> None:
+        generation = self._generation
+        total = await count_short_codes()
+        # Folga para o crescimento até a próxima reconstrução.
+        self._building = BloomFilter(
+            max(self.capacity, math.ceil(total * 1.25)), self.error_rate
+        )
+        try:
+            async for code in stream_short_codes():
+                self._building.add(code)
+            self._filter = self._building
+        finally:
+            self._building = None
+        self.ready = self._listening and generation == self._generation
+        logger.info(
+            "Short code index rebuilt: %d codes, %d bytes",
+            self._filter.count,
+            self._filter.nbytes,
+        )
+
+    async def run(self) -> None:
+        if not self.enabled:
+            return
+
+        while True:
+            try:
+                await asyncio.wait_for(self._stale.wait(), self.rebuild_interval)
+            except TimeoutError:
+                pass
+            self._stale.clear()
+            if not self._listening:
+                continue
+
+            # Quedas seguidas do Redis não viram uma varredura da tabela por
+            # reconexão; enquanto espera, o índice só deixa de rejeitar.
+            delay = (
+                self._last_rebuild
+                + self.min_rebuild_interval
+                - asyncio.get_running_loop().time()
+            )
+            if delay > 0:
+                await asyncio.sleep(delay)
+                self._stale.clear()
+                if not self._listening:
+                    continue
+
+            self._last_rebuild = asyncio.get_running_loop().time()
+            try:
+                await self.rebuild()
+            except (SQLAlchemyError, OSError) as e:
+                logger.error("Error rebuilding short code index: %s", e)
+                self._stale.set()
+                await asyncio.sleep(5)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "ready": self.ready,
+            "codes": self._filter.count if self._filter else 0,
+            "bytes": self._filter.nbytes if self._filter else 0,
+            "hashes": self._filter.hashes if self._filter else 0,
+            "rejections": self.rejections,
+        }
+
+
+code_index = CodeIndex(
+    settings.bloom_capacity,
+    settings.bloom_error_rate,
+    settings.bloom_rebuild_interval,
+    enabled=settings.bloom_enabled,
+    min_rebuild_interval=settings.bloom_min_rebuild_interval,
+)
+
+register_collector(
+    "code_index_rejections_total",
+    "counter",
+    "Códigos rejeitados pelo filtro de Bloom sem consultar o banco.",
+    lambda: [("code_index_rejections_total", (), code_index.rejections)],
+)
+register_collector(
+    "code_index_bytes",
+    "gauge",
+    "Memória do filtro de Bloom dos short codes.",
+    lambda: [("code_index_bytes", (), code_index.stats()["bytes"])],
+)
@@ -0,0 +1,80 @@
+from time import monotonic
+
+from redis.exceptions import ConnectionError, RedisError, TimeoutError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RedisError):
+    """Chamada recusada sem tocar no Redis: o circuito está aberto."""
+
+
+class CircuitBreaker:
+    """Circuit breaker para as chamadas ao Redis.
+
+    Depois de `failure_threshold` falhas de conexão seguidas o circuito abre e
+    as chamadas falham na hora com CircuitOpenError, em vez de esperar o
+    timeout do socket a cada requisição. Passados `reset_timeout` segundos, uma
+    única chamada de teste (half-open) é liberada: se der certo o circuito
+    fecha, senão volta a abrir.
+
+    Uso: `async with breaker: await redis_client.get(...)`. CircuitOpenError é
+    um RedisError, então os `except RedisError` existentes já tratam o
+    circuito aberto.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.trips += 1
+            self.state = OPEN
+            self.opened_at = monotonic()
+        self._probing = False
+
+    async def __aenter__(self):
+        if not self.allow():
+            raise CircuitOpenError("Redis circuit breaker is open")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Só falhas de conexão contam: um erro de comando (ex.: WRONGTYPE)
+        # mostra que o Redis está respondendo.
+        if exc_type is not None and issubclass(
+            exc_type, (ConnectionError, TimeoutError, OSError)
+        ):
+            self.record_failure()
+        elif exc_type is None or issubclass(exc_type, RedisError):
+            self.record_success()
+        else:
+            # Cancelamento ou erro do próprio app: libera a sonda sem concluir.
+            self._probing = False
+        return False
@@ -0,0 +1,77 @@
+import json
+from http import HTTPStatus
+
+from fastapi import HTTPException
+from fastapi.requests import Request
+
+from .schemas import validate_long_url
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson")
+
+
+def _loads(raw: bytes):
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        raise HTTPException(HTTPStatus.BAD_REQUEST, detail="JSON inválido.")
+
+
+def _parse_item(item, position: int) -> str:
+    """Aceita tanto `"https://..."` quanto `{"url": "https://..."}`."""
+    if isinstance(item, dict):
+        item = item.get("url")
+    # Validada antes de qualquer escrita: um item inválido não deixa o resto
+    # do lote gravado pela metade.
+    try:
+        return validate_long_url(item)
+    except ValueError:
+        raise HTTPException(
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail=f"URL inválida na posição {position}.",
+        )
+
+
+def _check_size(count: int, max_batch_size: int) -> None:
+    if count > max_batch_size:
+        raise HTTPException(
+            HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            detail=f"O lote excede o limite de {max_batch_size} URLs.",
+        )
+
+
+async def _read_ndjson(request: Request, max_batch_size: int) -> list[str]:
+    # Lê o corpo em streaming e aborta assim que o limite é ultrapassado, sem
+    # carregar lotes grandes demais na memória.
+    urls: list[str] = []
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                urls.append(_parse_item(_loads(line), len(urls)))
+                _check_size(len(urls), max_batch_size)
+
+    if buffer.strip():
+        urls.append(_parse_item(_loads(buffer), len(urls)))
+        _check_size(len(urls), max_batch_size)
+    return urls
+
+
+async def read_bulk_urls(request: Request, max_batch_size: int) -> list[str]:
+    """Lê um array JSON ou um stream NDJSON de URLs do corpo da requisição."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_MEDIA_TYPES:
+        urls = await _read_ndjson(request, max_batch_size)
+    else:
+        items = _loads(await request.body())
+        if not isinstance(items, list):
+            raise HTTPException(
+                HTTPStatus.UNPROCESSABLE_ENTITY, detail="Esperado um array de URLs."
+            )
+        _check_size(len(items), max_batch_size)
+        urls = [_parse_item(item, position) for position, item in enumerate(items)]
+
+    if not urls:
+        raise HTTPException(HTTPStatus.BAD_REQUEST, detail="Lote vazio.")
+    return urls
@@ -1,35 +1,447 @@
+import asyncio
 import logging
+import os
+import random
+import time
+from datetime import datetime
 
-import redis
-from redis.cache import CacheConfig
+from redis.exceptions import RedisError
 
+from .bloom import code_index
+from .breaker import CircuitBreaker, CircuitOpenError
+from .local_cache import LocalCache
+from .metrics import register_collector
+from .redirects import RedirectTarget
+from .schemas import UrlOut
 from .settings import Settings
+from .sharding import ShardedRedis
 
 logger = logging.getLogger(__name__)
 
-redis_client = redis.Redis(
+settings = Settings()
+
+# Um pool por nó, compartilhado por todas as requisições do worker. O
+# BlockingConnectionPool espera por uma conexão livre (até redis_pool_timeout)
+# em vez de falhar com "Too many connections" quando o pool está saturado.
+# Cada nó tem seu breaker: com um nó fora do ar, as chamadas a ele falham na
+# hora em vez de esperar o timeout do socket, e as chaves dele seguem pelo
+# cache local e pelo banco.
+redis_shards = ShardedRedis(
+    settings.redis_nodes
+    or [f"redis://{settings.redis_host}:{settings.redis_port}/{settings.redis_db}"],
+    settings.redis_virtual_nodes,
+    lambda: CircuitBreaker(
+        settings.redis_breaker_failure_threshold, settings.redis_breaker_reset_timeout
+    ),
+    max_connections=settings.redis_max_connections,
+    timeout=settings.redis_pool_timeout,
     protocol=3,
-    cache_config=CacheConfig(),
     decode_responses=True,
-    host=Settings().redis_host,
-    port=Settings().redis_port,
-    db=Settings().redis_db,
+    socket_timeout=settings.redis_socket_timeout,
+    socket_connect_timeout=settings.redis_socket_connect_timeout,
+    health_check_interval=settings.redis_health_check_interval,
 )
 
+# Nó primário: pub/sub, o lock do aquecimento e as chaves que não são de links.
+redis_client = redis_shards.primary.client
+redis_breaker = redis_shards.primary.breaker
+
+# Primeiro nível do cache: códigos quentes são servidos sem I/O de rede.
+local_cache = LocalCache(settings.local_cache_maxsize, settings.local_cache_ttl)
+
+# Valor gravado no Redis para códigos inexistentes (cache negativo).
+NOT_FOUND = ""
+
+# Espera máxima de cada leitura do canal de invalidação; ocioso não é erro.
+LISTEN_POLL_TIMEOUT = 5.0
+# Incrementado quando um worker não consegue anunciar códigos (ver CodeIndex).
+CODE_INDEX_EPOCH_KEY = "code-index:epoch"
+
+
+def _reset_after_fork():
+    # Ver database._reset_pools_after_fork: conexões e entradas locais do
+    # processo pai não são reaproveitadas pelo worker.
+    redis_shards.reset_after_fork()
+    local_cache.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
 
-def get_cached_code(key):
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.errors = 0
+
+    def snapshot(self) -> dict[str, int]:
+        return {
+            "redis_hits": self.hits,
+            "redis_misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "errors": self.errors,
+            "local": local_cache.stats(),
+        }
+
+
+cache_stats = CacheStats()
+
+register_collector(
+    "cache_requests_total",
+    "counter",
+    "Consultas ao cache por camada e resultado.",
+    lambda: [
+        (
+            "cache_requests_total",
+            (("tier", "local"), ("result", "hit")),
+            local_cache.hits,
+        ),
+        (
+            "cache_requests_total",
+            (("tier", "local"), ("result", "miss")),
+            local_cache.misses,
+        ),
+        (
+            "cache_requests_total",
+            (("tier", "redis"), ("result", "hit")),
+            cache_stats.hits,
+        ),
+        (
+            "cache_requests_total",
+            (("tier", "redis"), ("result", "miss")),
+            cache_stats.misses,
+        ),
+        (
+            "cache_requests_total",
+            (("tier", "redis"), ("result", "negative_hit")),
+            cache_stats.negative_hits,
+        ),
+        (
+            "cache_requests_total",
+            (("tier", "redis"), ("result", "error")),
+            cache_stats.errors,
+        ),
+    ],
+)
+register_collector(
+    "redis_circuit_state",
+    "gauge",
+    "Estado do circuit breaker de cada nó Redis (1 no estado atual).",
+    lambda: [
+        (
+            "redis_circuit_state",
+            (("node", node.name), ("state", state)),
+            int(node.breaker.state == state),
+        )
+        for node in redis_shards.nodes
+        for state in ("closed", "open", "half_open")
+    ],
+)
+register_collector(
+    "redis_circuit_trips_total",
+    "counter",
+    "Vezes em que o circuit breaker de cada nó Redis abriu.",
+    lambda: [
+        ("redis_circuit_trips_total", (("node", node.name),), node.breaker.trips)
+        for node in redis_shards.nodes
+    ],
+)
+register_collector(
+    "redis_circuit_rejected_total",
+    "counter",
+    "Chamadas a cada nó Redis recusadas com o circuito aberto.",
+    lambda: [
+        ("redis_circuit_rejected_total", (("node", node.name),), node.breaker.rejected)
+        for node in redis_shards.nodes
+    ],
+)
+register_collector(
+    "local_cache_evictions_total",
+    "counter",
+    "Entradas removidas do cache local por falta de espaço.",
+    lambda: [("local_cache_evictions_total", (), local_cache.evictions)],
+)
+register_collector(
+    "local_cache_entries",
+    "gauge",
+    "Entradas no cache local.",
+    lambda: [("local_cache_entries", (), len(local_cache))],
+)
+
+
+def jittered_ttl(ttl: int) -> int:
+    # Espalha as expirações para que chaves criadas juntas não expirem juntas.
+    jitter = ttl * settings.cache_ttl_jitter
+    return max(1, round(ttl + random.uniform(-jitter, jitter)))
+
+
+def cache_ttl_for(expires_at: datetime | None) -> int | None:
+    """TTL de cache de uma URL, sem passar da sua expiração (None: já expirou)."""
+    ttl = jittered_ttl(settings.cache_ttl)
+    if expires_at is None:
+        return ttl
+
+    remaining = int((expires_at - datetime.now()).total_seconds())
+    return min(ttl, remaining) if remaining > 0 else None
+
+
+def _redis_failed(message: str, e: RedisError) -> None:
+    # Chamadas recusadas pelo circuito aberto já aparecem nas métricas do
+    # breaker; logar cada uma só inundaria o log durante a queda.
+    if isinstance(e, CircuitOpenError):
+        return
+    cache_stats.errors += 1
+    logger.error("%s: %s", message, e)
+
+
+async def get_cached_code(key):
+    """Retorna a URL em cache, NOT_FOUND para um 404 em cache ou None (miss)."""
+    data = local_cache.get(key)
+    if data is not None:
+        return data
+
+    node = redis_shards.node_for(key)
     try:
-        data = redis_client.get(key)
-        if data:
-            logger.info(f"Cache hit for key: {key}")
+        async with node.breaker:
+            data = await node.client.get(key)
+        if data == NOT_FOUND:
+            cache_stats.negative_hits += 1
+        elif data:
+            cache_stats.hits += 1
+            logger.debug("Cache hit for key: %s", key)
+            # A cópia local também não pode durar mais do que o link.
+            expires_at = RedirectTarget.decode(data).expires_at
+            ttl = local_cache.ttl
+            if expires_at is not None:
+                ttl = min(ttl, expires_at - time.time())
+            if ttl > 0:
+                local_cache.set(key, data, ttl=ttl)
         else:
-            logger.info(f"Cache miss for key: {key}")
+            cache_stats.misses += 1
+            logger.debug("Cache miss for key: %s", key)
         return data
-    except redis.RedisError as e:
-        logger.error(f"Error accessing Redis: {str(e)}")
+    except RedisError as e:
+        _redis_failed("Error accessing Redis", e)
         return None
 
 
-def set_cached_data(key, value):
-    redis_client.set(key, value)
-    logger.info(f"Data cached for key: {key}")
+async def set_cached_data(key, value, expires_at=None):
+    ttl = cache_ttl_for(expires_at)
+    if ttl is None:
+        return
+
+    local_cache.set(key, value, ttl=min(local_cache.ttl, ttl))
+    node = redis_shards.node_for(key)
+    try:
+        async with node.breaker:
+            await node.client.set(key, value, ex=ttl)
+        logger.debug("Data cached for key: %s", key)
+    except RedisError as e:
+        # O redirecionamento não depende do Redis: a URL já veio do banco e
+        # fica no cache local.
+        _redis_failed("Error accessing Redis", e)
+
+
+async def set_negative_cache(key):
+    # Só no Redis: o cache local de outros workers não seria atualizado quando o
+    # código passasse a existir, e o SET de set_cached_data sobrescreve esta chave.
+    node = redis_shards.node_for(key)
+    try:
+        async with node.breaker:
+            await node.client.set(key, NOT_FOUND, ex=settings.negative_cache_ttl)
+    except RedisError as e:
+        _redis_failed("Error accessing Redis", e)
+
+
+async def set_cached_many(mapping, local=True):
+    """Grava várias chaves, cada uma com seu TTL, em uma única ida a cada nó.
+
+    `mapping` leva cada chave a (valor, expires_at do link).
+    """
+    pipe = redis_shards.pipeline()
+    cached = 0
+    for key, (value, expires_at) in mapping.items():
+        # Como em set_cached_data: a entrada não sobrevive ao link.
+        ttl = cache_ttl_for(expires_at)
+        if ttl is None:
+            continue
+        if local:
+            local_cache.set(key, value, ttl=min(local_cache.ttl, ttl))
+        pipe.keyed("set", key, value, ex=ttl)
+        cached += 1
+    if not cached:
+        return
+
+    await pipe.execute()
+    logger.debug("Data cached for %d keys", cached)
+
+
+def digest_key(digest: str) -> str:
+    return f"digest:{digest}"
+
+
+async def get_cached_urls(digests):
+    """UrlOut em JSON por digest, para as URLs já encurtadas que estão em cache."""
+    if not digests:
+        return {}
+
+    async def mget(node, keys):
+        async with node.breaker:
+            return keys, await node.client.mget(keys)
+
+    # Um MGET por nó, em paralelo; as chaves de um nó fora do ar contam como
+    # miss e seguem para o banco.
+    digest_of = {digest_key(digest): digest for digest in digests}
+    groups = redis_shards.group(digest_of)
+    cached = {}
+    for result in await asyncio.gather(
+        *(mget(node, keys) for node, keys in groups.items()), return_exceptions=True
+    ):
+        if isinstance(result, RedisError):
+            _redis_failed("Error accessing Redis", result)
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            keys, values = result
+            cached.update(
+                (digest_of[key], value) for key, value in zip(keys, values) if value
+            )
+    return cached
+
+
+async def cache_urls(urls):
+    """Write-through de URLs recém-criadas ou lidas do banco.
+
+    Grava código -> RedirectTarget (redirecionamento) e digest -> UrlOut (deduplicação no
+    /shorten) e anuncia os códigos ao índice dos demais workers, tudo em uma
+    única ida a cada nó Redis envolvido (os nós em paralelo).
+    """
+    if not urls:
+        return
+
+    entries = []
+    for url in urls:
+        code_index.add(url.short_code)
+        # Entradas de links com expiração somem do cache junto com eles.
+        ttl = cache_ttl_for(url.expires_at)
+        if ttl is None:
+            continue
+        target = RedirectTarget.from_url(url).encode()
+        local_cache.set(url.short_code, target, ttl=min(local_cache.ttl, ttl))
+        entries.append((url, target, ttl))
+    if not entries:
+        return
+
+    pipe = redis_shards.pipeline()
+    for url, target, ttl in entries:
+        out = UrlOut.model_validate(url, from_attributes=True)
+        pipe.keyed("set", url.short_code, target, ex=ttl)
+        pipe.keyed(
+            "set", digest_key(url.long_url_digest), out.model_dump_json(), ex=ttl
+        )
+        pipe.primary("publish", settings.code_announce_channel, url.short_code)
+    try:
+        await pipe.execute()
+    except RedisError as e:
+        # A URL já está no banco: sem cache, o próximo acesso faz a consulta.
+        # O anúncio pode ter se perdido: o listener avisa os demais workers
+        # pelo epoch do índice.
+        code_index.announcements_lost = True
+        _redis_failed("Error caching new URLs", e)
+
+
+async def announce_codes(codes):
+    """Anuncia códigos criados fora do app (ex.: importação) ao índice dos workers."""
+    if not codes:
+        return
+
+    pipe = redis_shards.pipeline()
+    for code in codes:
+        pipe.primary("publish", settings.code_announce_channel, code)
+    try:
+        await pipe.execute()
+    except RedisError as e:
+        code_index.announcements_lost = True
+        _redis_failed("Error announcing short codes", e)
+
+
+async def invalidate_cached_codes(*keys):
+    """Remove as chaves do Redis e avisa todos os workers para descartá-las."""
+    for key in keys:
+        local_cache.delete(key)
+
+    pipe = redis_shards.pipeline()
+    for node, node_keys in redis_shards.group(keys).items():
+        pipe.on(node, "delete", *node_keys)
+    for key in keys:
+        pipe.primary("publish", settings.cache_invalidation_channel, key)
+    try:
+        await pipe.execute()
+    except RedisError as e:
+        _redis_failed("Error invalidating Redis keys", e)
+
+
+async def sync_code_index_epoch():
+    """Publica o novo epoch após anúncios perdidos e repassa o atual ao índice."""
+    if code_index.announcements_lost:
+        code_index.announcements_lost = False
+        try:
+            epoch = str(await redis_client.incr(CODE_INDEX_EPOCH_KEY))
+        except RedisError:
+            code_index.announcements_lost = True
+            raise
+    else:
+        epoch = await redis_client.get(CODE_INDEX_EPOCH_KEY)
+    code_index.observe_epoch(epoch)
+
+
+async def listen_invalidations():
+    """Sincroniza cache local e índice de códigos com os demais workers."""
+    loop = asyncio.get_running_loop()
+    disconnected = False
+    while True:
+        try:
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(
+                    settings.cache_invalidation_channel, settings.code_announce_channel
+                )
+                if disconnected:
+                    # Entradas gravadas durante a queda podem ter perdido
+                    # invalidações.
+                    local_cache.clear()
+                    disconnected = False
+                code_index.start_listening(await redis_client.get(CODE_INDEX_EPOCH_KEY))
+                await sync_code_index_epoch()
+                next_epoch_check = loop.time() + LISTEN_POLL_TIMEOUT
+                while True:
+                    # listen() leria com o socket_timeout do pool e, num canal
+                    # ocioso, falharia a cada meio segundo como se o Redis
+                    # tivesse caído. Com timeout explícito, a leitura ociosa
+                    # só devolve None; a volta ao loop faz o PING de health
+                    # check quando ele vence.
+                    message = await pubsub.get_message(timeout=LISTEN_POLL_TIMEOUT)
+                    if loop.time() >= next_epoch_check:
+                        await sync_code_index_epoch()
+                        next_epoch_check = loop.time() + LISTEN_POLL_TIMEOUT
+                    if message is None or message["type"] != "message":
+                        continue
+                    if message["channel"] == settings.code_announce_channel:
+                        code_index.add(message["data"])
+                    else:
+                        local_cache.delete(message["data"])
+        except RedisError as e:
+            if not disconnected:
+                logger.error("Invalidation listener disconnected: %s", e)
+                # Sem o canal, entradas podem estar obsoletas e anúncios podem
+                # ter se perdido: esvazia o cache local e suspende o índice de
+                # códigos. Durante a queda o cache local volta a ser usado,
+                # com obsolescência limitada pelo seu TTL.
+                local_cache.clear()
+                code_index.invalidate()
+                disconnected = True
+            await asyncio.sleep(1)
+
+
+async def close_cache():
+    await redis_shards.close()
@@ -0,0 +1,119 @@
+import asyncio
+import string
+from hashlib import sha256
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import short_code_seq
+from .settings import Settings
+
+ALPHABET = string.digits + string.ascii_letters
+CODE_LENGTH = 7
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+
+# Rede de Feistel sobre 42 bits (2**42 > 62**7); valores fora do espaço de códigos
+# são cifrados novamente (cycle walking), o que mantém a bijeção em [0, 62**7).
+HALF_BITS = 21
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+ROUND_MULTIPLIER = 0x9E3779B1
+
+_PAIRS = tuple(a + b for a in ALPHABET for b in ALPHABET)
+
+
+class CodeSpaceExhausted(Exception):
+    pass
+
+
+def _round_keys(secret: str) -> tuple[int, ...]:
+    digest = sha256(secret.encode()).digest()
+    return tuple(
+        int.from_bytes(digest[i * 4 : i * 4 + 4], "big") for i in range(ROUNDS)
+    )
+
+
+# A função de rodada fica inline: é o trecho mais quente da alocação.
+def _feistel(value: int, keys: tuple[int, ...]) -> int:
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for key in keys:
+        left, right = (
+            right,
+            left ^ ((((right ^ key) * ROUND_MULTIPLIER) >> 11) & HALF_MASK),
+        )
+    return (left << HALF_BITS) | right
+
+
+def _feistel_inverse(value: int, keys: tuple[int, ...]) -> int:
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for key in reversed(keys):
+        left, right = (
+            right ^ ((((left ^ key) * ROUND_MULTIPLIER) >> 11) & HALF_MASK),
+            left,
+        )
+    return (left << HALF_BITS) | right
+
+
+def encode_base62(value: int) -> str:
+    """Codifica em exatamente CODE_LENGTH caracteres, dois dígitos por divisão."""
+    value, c = divmod(value, 3844)
+    value, b = divmod(value, 3844)
+    value, a = divmod(value, 3844)
+    return ALPHABET[value] + _PAIRS[a] + _PAIRS[b] + _PAIRS[c]
+
+
+def decode_base62(code: str) -> int:
+    value = 0
+    for char in code:
+        value = value * 62 + ALPHABET.index(char)
+    return value
+
+
+class ShortCodeAllocator:
+    """Distribui códigos únicos a partir de blocos de IDs reservados no Postgres.
+
+    Cada worker reserva um bloco com um único nextval() e o consome localmente;
+    cada ID é embaralhado pela rede de Feistel e codificado em base62 com 7
+    caracteres. Como o mapeamento é bijetor, IDs distintos nunca geram o mesmo
+    código e os códigos não são sequenciais.
+    """
+
+    def __init__(self, secret: str, block_size: int):
+        self.block_size = block_size
+        self._keys = _round_keys(secret)
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    def encode_id(self, value: int) -> str:
+        if not 0 <= value < CODE_SPACE:
+            raise CodeSpaceExhausted(f"ID fora do espaço de códigos: {value}")
+
+        value = _feistel(value, self._keys)
+        while value >= CODE_SPACE:
+            value = _feistel(value, self._keys)
+        return encode_base62(value)
+
+    def decode_code(self, code: str) -> int:
+        value = _feistel_inverse(decode_base62(code), self._keys)
+        while value >= CODE_SPACE:
+            value = _feistel_inverse(value, self._keys)
+        return value
+
+    def assign_block(self, start: int) -> None:
+        self._next, self._end = start, start + self.block_size
+
+    async def allocate(self, session: AsyncSession) -> str:
+        if self._next >= self._end:
+            async with self._lock:
+                if self._next >= self._end:
+                    self.assign_block(
+                        await session.scalar(select(short_code_seq.next_value()))
+                    )
+
+        value = self._next
+        self._next += 1
+        return self.encode_id(value)
+
+
+code_allocator = ShortCodeAllocator(Settings().secret_key, short_code_seq.increment)
@@ -1,17 +1,278 @@
-from typing import AsyncGenerator
+import asyncio
+import itertools
+import logging
+import os
+from collections import deque
+from statistics import quantiles
+from time import perf_counter
+from typing import AsyncGenerator, AsyncIterator, Sequence
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import Row, exc, text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from .metrics import instrument_engine, register_collector, register_gauge
 from .settings import Settings
 
-DATABASE_URL = Settings().database_url  # type: ignore
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+DATABASE_URL = settings.database_url  # type: ignore
+
+
+class PoolWaitStats:
+    """Tempo de espera por uma conexão do pool (checkout)."""
+
+    def __init__(self, window: int = 2048):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._recent: deque[float] = deque(maxlen=window)
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self._recent.append(wait)
+
+    def snapshot(self) -> dict[str, float]:
+        recent = sorted(self._recent)
+        cuts = quantiles(recent, n=100) if len(recent) > 1 else [0.0] * 99
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": self.total_wait / self.checkouts * 1000
+            if self.checkouts
+            else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+            "p50_wait_ms": cuts[49] * 1000,
+            "p99_wait_ms": cuts[98] * 1000,
+        }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    def connect(self):
+        start = perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_wait_stats.timeouts += 1
+            raise
+        finally:
+            pool_wait_stats.record(perf_counter() - start)
+
+
+def build_engine(url: str) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        echo=settings.db_echo,
+        poolclass=TimedAsyncQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle,
+        connect_args={
+            "prepared_statement_cache_size": settings.db_statement_cache_size
+        },
+    )
+    instrument_engine(engine)
+    return engine
+
+
+async_engine = build_engine(DATABASE_URL)
 
-async_engine = create_async_engine(DATABASE_URL, echo=True)
 AsyncSessionLocal = async_sessionmaker(
     async_engine, expire_on_commit=False, class_=AsyncSession, autoflush=False
 )
 
 
+class ReplicaRouter:
+    """Distribui leituras entre as réplicas saudáveis (round-robin).
+
+    Uma réplica que falha (no health check ou numa consulta) fica fora da
+    rotação até passar no próximo health check. Sem réplicas saudáveis, as
+    leituras vão para o primário.
+    """
+
+    def __init__(self, engines: list[AsyncEngine], health_interval: float):
+        self.engines = engines
+        self.health_interval = health_interval
+        self._down: set[AsyncEngine] = set()
+        self._next = itertools.cycle(engines)
+        self.failovers = 0
+
+    def healthy(self) -> list[AsyncEngine]:
+        return [engine for engine in self.engines if engine not in self._down]
+
+    def pick(self) -> AsyncEngine:
+        for _ in range(len(self.engines)):
+            engine = next(self._next)
+            if engine not in self._down:
+                return engine
+        return async_engine
+
+    def mark_down(self, engine: AsyncEngine, error: Exception) -> None:
+        if engine not in self._down:
+            logger.error("Read replica %s marked down: %s", engine.url.host, error)
+        self._down.add(engine)
+
+    async def check(self, engine: AsyncEngine) -> None:
+        try:
+            async with asyncio.timeout(settings.db_pool_timeout):
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+        except (exc.SQLAlchemyError, OSError, TimeoutError) as e:
+            self.mark_down(engine, e)
+        else:
+            if engine in self._down:
+                self._down.discard(engine)
+                logger.info("Read replica %s back in rotation", engine.url.host)
+
+    async def run(self) -> None:
+        if not self.engines:
+            return
+
+        while True:
+            await asyncio.gather(*(self.check(engine) for engine in self.engines))
+            await asyncio.sleep(self.health_interval)
+
+    def status(self) -> list[dict]:
+        return [
+            {"host": engine.url.host, "healthy": engine not in self._down}
+            for engine in self.engines
+        ]
+
+
+replica_router = ReplicaRouter(
+    [build_engine(url) for url in settings.database_replica_urls],
+    settings.db_replica_health_interval,
+)
+
+
+def _reset_pools_after_fork():
+    # Servidores que fazem fork depois de importar o app (ex.: gunicorn
+    # --preload) herdariam as conexões do processo pai; cada worker abre as suas.
+    # O uvicorn com --workers usa spawn e importa o app em cada worker.
+    for engine in (async_engine, *replica_router.engines):
+        engine.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+async def read_first(statement):
+    """Executa uma leitura numa réplica, com failover para o primário.
+
+    Réplicas podem estar atrasadas: quem precisa ler o que acabou de ser
+    escrito deve usar o primário (AsyncSessionLocal).
+    """
+    engine = replica_router.pick()
+    if engine is not async_engine:
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                return (await session.execute(statement)).first()
+        except (exc.SQLAlchemyError, OSError) as e:
+            replica_router.mark_down(engine, e)
+            replica_router.failovers += 1
+
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(statement)).first()
+
+
+async def stream_partitions(statement, batch_size: int) -> AsyncIterator[Sequence[Row]]:
+    """Lê `statement` em lotes de `batch_size` linhas, numa réplica se houver.
+
+    Para leituras longas e tolerantes a atraso (exportação, snapshots,
+    aquecimento do cache). Se a réplica falha antes do primeiro lote, a leitura
+    é refeita no primário; depois dele, o erro sobe, para não repetir linhas.
+    """
+    statement = statement.execution_options(yield_per=batch_size)
+    engine = replica_router.pick()
+    if engine is not async_engine:
+        started = False
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                # Cursor do lado do servidor: as linhas chegam em lotes.
+                result = await session.stream(statement)
+                async for rows in result.partitions():
+                    started = True
+                    yield rows
+            return
+        except (exc.SQLAlchemyError, OSError) as e:
+            replica_router.mark_down(engine, e)
+            if started:
+                raise
+            replica_router.failovers += 1
+
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(statement)
+        async for rows in result.partitions():
+            yield rows
+
+
+def pool_status() -> dict:
+    pool = async_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        **pool_wait_stats.snapshot(),
+        "replicas": replica_router.status(),
+        "replica_failovers": replica_router.failovers,
+    }
+
+
+register_gauge("db_pool_size", "Tamanho do pool.", lambda: async_engine.pool.size())
+register_gauge(
+    "db_pool_checked_out",
+    "Conexões em uso.",
+    lambda: async_engine.pool.checkedout(),
+)
+register_gauge(
+    "db_pool_overflow",
+    "Conexões além de pool_size.",
+    lambda: async_engine.pool.overflow(),
+)
+register_collector(
+    "db_pool_checkout_wait_seconds",
+    "summary",
+    "Espera por uma conexão do pool.",
+    lambda: [
+        ("db_pool_checkout_wait_seconds_sum", (), pool_wait_stats.total_wait),
+        ("db_pool_checkout_wait_seconds_count", (), pool_wait_stats.checkouts),
+    ],
+)
+register_gauge(
+    "db_replicas_healthy",
+    "Réplicas de leitura em rotação.",
+    lambda: len(replica_router.healthy()),
+)
+register_collector(
+    "db_replica_failovers_total",
+    "counter",
+    "Leituras que falharam na réplica e foram refeitas no primário.",
+    lambda: [("db_replica_failovers_total", (), replica_router.failovers)],
+)
+register_collector(
+    "db_pool_timeouts_total",
+    "counter",
+    "Checkouts que estouraram pool_timeout.",
+    lambda: [("db_pool_timeouts_total", (), pool_wait_stats.timeouts)],
+)
+
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         try:
@@ -0,0 +1,63 @@
+"""Nó de borda: só redirecionamentos, servidos de snapshots mapeados em memória.
+
+Não usa Postgres nem Redis; lê os arquivos de `SNAPSHOT_DIR` (ver
+app/snapshot_builder.py) e troca para um conjunto mais novo assim que ele
+aparece no diretório.
+
+    WEB_APP=edge uv run python -m app.server
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from http import HTTPStatus
+
+from fastapi import FastAPI, HTTPException
+
+from .responses import FastJSONResponse, FastRedirectResponse
+from .settings import ServerSettings
+from .snapshot import SnapshotSet
+
+logger = logging.getLogger(__name__)
+
+settings = ServerSettings()
+
+snapshots = SnapshotSet(settings.snapshot_dir)
+
+
+async def watch_snapshots(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            snapshots.reload()
+        except (OSError, ValueError) as e:
+            # Arquivo removido ou corrompido no meio da troca: o conjunto atual
+            # continua valendo até a próxima tentativa.
+            logger.error("Error reloading redirect snapshot: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    snapshots.reload()
+    watcher = asyncio.create_task(watch_snapshots(settings.snapshot_reload_interval))
+    yield
+    watcher.cancel()
+    with suppress(asyncio.CancelledError):
+        await watcher
+    snapshots.close()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+
+@app.get("/debug/snapshot")
+async def debug_snapshot():
+    return snapshots.stats()
+
+
+@app.get("/{short_code}")
+async def get_url(short_code: str):
+    long_url = snapshots.get(short_code)
+    if long_url is None:
+        raise HTTPException(HTTPStatus.NOT_FOUND, detail="URL não encontrada.")
+    return FastRedirectResponse(long_url)
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .cache import digest_key, invalidate_cached_codes
+from .database import AsyncSessionLocal
+from .metrics import register_collector
+from .models import Url, UrlClicks
+from .settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+
+def purge_statement(now: datetime, batch_size: int):
+    """DELETE de até `batch_size` links expirados, pelo índice parcial de expires_at."""
+    expired = (
+        select(Url.uuid)
+        .where(Url.expires_at.is_not(None), Url.expires_at <= now)
+        .order_by(Url.expires_at)
+        .limit(batch_size)
+        # Vários workers podem limpar ao mesmo tempo sem disputar as mesmas linhas.
+        .with_for_update(skip_locked=True)
+    )
+    return (
+        delete(Url)
+        .where(Url.uuid.in_(expired.scalar_subquery()))
+        .returning(Url.short_code, Url.long_url_digest)
+    )
+
+
+class ExpiryPurger:
+    """Remove links expirados em lotes pequenos, cada um em sua transação.
+
+    Lotes curtos seguram poucos locks e não acumulam WAL de uma vez; a pausa
+    entre eles deixa espaço para o tráfego normal. A expiração em si já vale
+    nas leituras (ver `PostgresStorage.get_by_code`): a limpeza só recupera
+    espaço e é segura de atrasar.
+    """
+
+    def __init__(self, batch_size: int, interval: float, pause: float):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pause = pause
+        self.purged = 0
+
+    async def purge_batch(self) -> int:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                purge_statement(datetime.now(), self.batch_size)
+            )
+            rows = result.all()
+            if rows:
+                codes = [code for code, _ in rows]
+                await session.execute(
+                    delete(UrlClicks).where(UrlClicks.short_code.in_(codes))
+                )
+            await session.commit()
+
+        if rows:
+            # Os links apagados saem do Redis e do cache local de todos os workers.
+            await invalidate_cached_codes(
+                *(code for code, _ in rows),
+                *(digest_key(digest) for _, digest in rows),
+            )
+        self.purged += len(rows)
+        return len(rows)
+
+    async def purge(self) -> int:
+        """Remove todos os links já expirados, lote a lote."""
+        total = 0
+        while True:
+            purged = await self.purge_batch()
+            total += purged
+            if purged < self.batch_size:
+                return total
+            await asyncio.sleep(self.pause)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                purged = await self.purge()
+            except (SQLAlchemyError, OSError) as e:
+                logger.error("Error purging expired URLs: %s", e)
+                continue
+            if purged:
+                logger.info("Purged %d expired URLs", purged)
+
+
+expiry_purger = ExpiryPurger(
+    settings.expiry_purge_batch_size,
+    settings.expiry_purge_interval,
+    settings.expiry_purge_pause,
+)
+
+register_collector(
+    "expired_urls_purged_total",
+    "counter",
+    "Links expirados removidos pela limpeza em segundo plano.",
+    lambda: [("expired_urls_purged_total", (), expiry_purger.purged)],
+)
@@ -1,69 +1,368 @@
+import asyncio
+import logging
+import secrets
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timedelta
 from http import HTTPStatus
-from typing import Annotated
-from uuid import uuid4
+from typing import Annotated, Literal
 
-from fastapi import Depends, FastAPI, HTTPException
-from fastapi.responses import RedirectResponse
+from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .utils import generate_short_code
-from .cache import get_cached_code, set_cached_data
-from .database import get_session
-from .models import Url
-from .schemas import UrlOut
+from .analytics import click_recorder, get_click_stats
+from .bloom import code_index
+from .bulk import read_bulk_urls
+from .cache import (
+    NOT_FOUND,
+    cache_stats,
+    cache_urls,
+    close_cache,
+    get_cached_code,
+    get_cached_urls,
+    listen_invalidations,
+    redis_shards,
+    set_cached_data,
+    set_negative_cache,
+)
+from .codes import CodeSpaceExhausted
+from .database import get_session, pool_status, replica_router
+from .expiry import expiry_purger
+from .metrics import (
+    MetricsMiddleware,
+    exposition,
+    publish_snapshots,
+    register_collector,
+)
+from .ratelimit import rate_limit
+from .redirects import RedirectTarget, redirect_response
+from .responses import FastJSONResponse
+from .schemas import UrlOut, UrlStats, validate_long_url
+from .settings import Settings
+from .singleflight import SingleFlight
+from .storage import url_storage
+from .transfer import MEDIA_TYPES, code_sequence_bound, export_chunks
+from .utils import hash_url, parse_local_datetime
+from .warmup import warm_cache_on_startup
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background_tasks = [
+        asyncio.create_task(listen_invalidations()),
+        asyncio.create_task(
+            redis_shards.run_health_checks(settings.redis_node_check_interval)
+        ),
+        asyncio.create_task(url_storage.run()),
+        asyncio.create_task(publish_snapshots()),
+    ]
+    # Tarefas que leem ou gravam direto no Postgres.
+    if settings.storage_backend == "postgres":
+        background_tasks += [
+            asyncio.create_task(click_recorder.run()),
+            asyncio.create_task(code_index.run()),
+            asyncio.create_task(replica_router.run()),
+            asyncio.create_task(expiry_purger.run()),
+        ]
+        warmup = asyncio.create_task(warm_cache_on_startup())
+        background_tasks.append(warmup)
+        # Segura o startup só até o prazo; o restante do aquecimento segue em
+        # segundo plano enquanto o worker já atende.
+        await asyncio.wait([warmup], timeout=settings.warmup_readiness_timeout)
+    yield
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await close_cache()
+
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+app.add_middleware(MetricsMiddleware)
 templates = Jinja2Templates(directory="templates")
+settings = Settings()
 
 Session = Annotated[AsyncSession, Depends(get_session)]
 
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+lookups = SingleFlight()
+
+register_collector(
+    "coalesced_lookups_total",
+    "counter",
+    "Misses que aguardaram uma consulta já em andamento.",
+    lambda: [("coalesced_lookups_total", (), lookups.coalesced)],
+)
+
+
+def require_postgres():
+    # Estatísticas e exportação leem tabelas que o armazenamento em memória não tem.
+    if settings.storage_backend != "postgres":
+        raise HTTPException(
+            HTTPStatus.NOT_IMPLEMENTED,
+            detail="Disponível apenas com o armazenamento no Postgres.",
+        )
+
+
+admin_credentials = HTTPBearer(auto_error=False)
+
+
+def require_admin(
+    credentials: Annotated[
+        HTTPAuthorizationCredentials | None, Depends(admin_credentials)
+    ],
+):
+    # Sem ADMIN_TOKEN, as rotas administrativas ficam desligadas.
+    if not settings.admin_token:
+        raise HTTPException(
+            HTTPStatus.FORBIDDEN, detail="Defina ADMIN_TOKEN para habilitar esta rota."
+        )
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials.encode(), settings.admin_token.encode()
+    ):
+        raise HTTPException(
+            HTTPStatus.UNAUTHORIZED,
+            detail="Token de administrador inválido.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@app.exception_handler(CodeSpaceExhausted)
+async def code_space_exhausted(request: Request, e: CodeSpaceExhausted):
+    # A sequência passou de 62**7: nenhum novo código pode ser gerado até
+    # alguém intervir, mas redirecionamentos seguem funcionando.
+    logger.critical("Short code space exhausted: %s", e)
+    return FastJSONResponse(
+        {"detail": "Não foi possível gerar o código."},
+        HTTPStatus.SERVICE_UNAVAILABLE,
+    )
+
+
+def expiry_covers(current: datetime | None, requested: datetime | None) -> bool:
+    """Se um link com expiração `current` já atende a um pedido por `requested`."""
+    return current is None or (requested is not None and current >= requested)
+
+
+def parse_expires_at(value) -> datetime | None:
+    if value is None:
+        return None
+
+    try:
+        expires_at = parse_local_datetime(value)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail="expires_at deve ser uma data ISO 8601.",
+        )
+
+    if expires_at <= datetime.now():
+        raise HTTPException(
+            HTTPStatus.UNPROCESSABLE_ENTITY, detail="expires_at deve estar no futuro."
+        )
+    return expires_at
+
 
 @app.get("/", status_code=HTTPStatus.OK)
 async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
-@app.post("/shorten", response_model=UrlOut, status_code=HTTPStatus.CREATED)
-async def shorten(data: dict, session: Session):
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(exposition(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/debug/pool")
+async def debug_pool():
+    return pool_status()
+
+
+@app.get("/debug/cache")
+async def debug_cache():
+    return {
+        **cache_stats.snapshot(),
+        "coalesced_lookups": lookups.coalesced,
+        "code_index": code_index.stats(),
+        "redis_circuit": redis_shards.stats(),
+    }
+
+
+@app.get(
+    "/urls/export", dependencies=[Depends(require_postgres), Depends(require_admin)]
+)
+async def export_urls(format: Literal["ndjson", "csv"] = "ndjson"):
+    # Em streaming, lote a lote do cursor: a memória não cresce com a tabela.
+    # O limite da sequência vai no cabeçalho para o import --sequence-bound.
+    return StreamingResponse(
+        export_chunks(format, settings.transfer_batch_size),
+        media_type=MEDIA_TYPES[format],
+        headers={"X-Short-Code-Sequence-Bound": str(await code_sequence_bound())},
+    )
+
+
+@app.post(
+    "/shorten",
+    response_model=UrlOut,
+    status_code=HTTPStatus.CREATED,
+    dependencies=[Depends(rate_limit("shorten"))],
+)
+async def shorten(data: dict):
     url = data.get("url")
     if not url:
         raise HTTPException(HTTPStatus.BAD_REQUEST, detail="URL é obrigatória")
+    try:
+        validate_long_url(url)
+    except ValueError:
+        raise HTTPException(HTTPStatus.UNPROCESSABLE_ENTITY, detail="URL inválida.")
+    expires_at = parse_expires_at(data.get("expires_at"))
+    cacheable = data.get("cacheable", True)
+    if not isinstance(cacheable, bool):
+        raise HTTPException(
+            HTTPStatus.UNPROCESSABLE_ENTITY, detail="cacheable deve ser booleano."
+        )
+
+    digest = hash_url(url)
+
+    # URLs populares já encurtadas são respondidas do cache, sem o banco; o
+    # JSON gravado no Redis já é o corpo da resposta. Se o pedido quer o link
+    # por mais tempo do que ele dura, ou sem cache HTTP, o banco é atualizado.
+    cached = await get_cached_urls([digest])
+    if digest in cached:
+        out = UrlOut.model_validate_json(cached[digest])
+        if expiry_covers(out.expires_at, expires_at) and (
+            cacheable or not out.cacheable
+        ):
+            return FastJSONResponse(cached[digest], HTTPStatus.CREATED)
+
+    short_url_object = await url_storage.create(digest, url, expires_at, cacheable)
+    await cache_urls([short_url_object])
+
+    return FastJSONResponse(
+        UrlOut.model_validate(short_url_object, from_attributes=True),
+        HTTPStatus.CREATED,
+    )
+
+
+@app.post(
+    "/shorten/bulk",
+    status_code=HTTPStatus.CREATED,
+    dependencies=[Depends(rate_limit("shorten_bulk"))],
+)
+async def shorten_bulk(request: Request):
+    urls = await read_bulk_urls(request, settings.bulk_max_batch_size)
+    digests = [hash_url(url) for url in urls]
+
+    # Deduplica dentro do lote, mantendo a primeira ocorrência de cada URL.
+    pending: dict[str, str] = {}
+    for digest, url in zip(digests, urls):
+        pending.setdefault(digest, url)
+
+    # Links do lote não expiram: entradas com expiração passam pelo upsert,
+    # que a remove.
+    by_digest = {
+        digest: out
+        for digest, value in (await get_cached_urls(list(pending))).items()
+        if (out := UrlOut.model_validate_json(value)).expires_at is None
+    }
 
-    existing_url = await session.scalar(select(Url).where(Url.long_url == url))
+    uncached = [d for d in pending if d not in by_digest]
+    if uncached:
+        found = {
+            digest: url
+            for digest, url in (await url_storage.get_by_digests(uncached)).items()
+            if url.expires_at is None
+        }
+        missing = {d: pending[d] for d in uncached if d not in found}
+        created = await url_storage.create_many(missing) if missing else []
+        await cache_urls([*found.values(), *created])
+        by_digest.update((url.long_url_digest, url) for url in found.values())
+        by_digest.update((url.long_url_digest, url) for url in created)
 
-    if existing_url:
-        return existing_url
-    
-    url_uuid = uuid4()
+    results = [by_digest[digest] for digest in digests]
 
-    short_url_object = Url(
-        uuid=str(url_uuid),
-        long_url=url,
-        short_code=generate_short_code(url_uuid),
+    def ndjson_lines():
+        for url in results:
+            yield UrlOut.model_validate(url, from_attributes=True).model_dump_json()
+            yield "\n"
+
+    return StreamingResponse(
+        ndjson_lines(), HTTPStatus.CREATED, media_type="application/x-ndjson"
     )
 
-    session.add(short_url_object)
-    await session.commit()
-    await session.refresh(short_url_object)
 
-    return short_url_object
+async def load_long_url(short_code: str) -> RedirectTarget | None:
+    url = await url_storage.get_by_code(short_code)
+
+    if url is None:
+        await set_negative_cache(short_code)
+        return None
 
+    target = RedirectTarget.from_url(url)
+    await set_cached_data(short_code, target.encode(), url.expires_at)
+    return target
 
-@app.get("/{short_code}")
-async def get_url(short_code: str, session: Session):
-    cached_data = get_cached_code(short_code)
+
+@app.api_route("/{short_code}", methods=["GET", "HEAD"])
+async def get_url(short_code: str, request: Request):
+    # Sem dependência de sessão: no cache hit não há nenhum acesso ao banco, e
+    # a sessão só é aberta em caso de miss.
+    cached_data = await get_cached_code(short_code)
+    # HEAD (verificadores de links, prévias) não conta como clique.
+    is_click = request.method == "GET"
 
     if cached_data:
-        cached_short_code = str(cached_data)
-        return RedirectResponse(cached_short_code, HTTPStatus.FOUND)
+        target = RedirectTarget.decode(cached_data)
+        # O TTL das entradas acompanha a expiração, mas em segundos inteiros:
+        # a entrada pode sobreviver ao link por uma fração de segundo.
+        if target.expired:
+            raise HTTPException(HTTPStatus.NOT_FOUND, detail="URL não encontrada.")
+        if is_click:
+            click_recorder.record(short_code)
+        return redirect_response(request, target)
+
+    if cached_data == NOT_FOUND:
+        raise HTTPException(HTTPStatus.NOT_FOUND, detail="URL não encontrada.")
+
+    # Códigos que certamente não existem não chegam ao banco (nem ao cache
+    # negativo, que só serviria para poupar a mesma consulta).
+    if not code_index.might_exist(short_code):
+        raise HTTPException(HTTPStatus.NOT_FOUND, detail="URL não encontrada.")
 
-    url_db = await session.scalar(select(Url).where(Url.short_code == short_code))
+    # Misses simultâneos do mesmo código compartilham uma única consulta.
+    target = await lookups.do(short_code, lambda: load_long_url(short_code))
 
-    if not url_db:
+    if not target:
         raise HTTPException(HTTPStatus.NOT_FOUND, detail="URL não encontrada.")
 
-    set_cached_data(url_db.short_code, url_db.long_url)
-    return RedirectResponse(url_db.long_url, HTTPStatus.FOUND)
+    if is_click:
+        click_recorder.record(short_code)
+    return redirect_response(request, target)
+
+
+@app.get(
+    "/{short_code}/stats",
+    response_model=UrlStats,
+    dependencies=[Depends(require_postgres)],
+)
+async def get_url_stats(
+    short_code: str,
+    session: Session,
+    minutes: int = Query(60, ge=1, le=settings.analytics_stats_max_minutes),
+):
+    if await url_storage.get_by_code(short_code) is None:
+        raise HTTPException(HTTPStatus.NOT_FOUND, detail="URL não encontrada.")
+
+    since = datetime.now().replace(second=0, microsecond=0) - timedelta(minutes=minutes)
+    total, buckets = await get_click_stats(session, short_code, since)
+
+    return UrlStats(
+        short_code=short_code,
+        total_clicks=total,
+        buckets=[{"minute": b.bucket, "clicks": b.clicks} for b in buckets],
+    )
@@ -0,0 +1,284 @@
+"""Métricas no formato texto do Prometheus, sem dependências externas.
+
+Os valores são ints/floats simples do worker, atualizados sem lock (todo acesso
+acontece na thread do event loop). O caminho quente só faz somas; a montagem
+do texto e a leitura de contadores de outros módulos (cache, pool) acontecem no
+scrape. Com vários workers, cada um grava periodicamente seu snapshot em
+`metrics_dir` e o worker que atende o scrape soma todos.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from bisect import bisect_left
+from pathlib import Path
+from time import perf_counter, time
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+# Amostra: (nome, labels ordenados, valor)
+Sample = tuple[str, tuple[tuple[str, str], ...], float]
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: tuple) -> Iterable[Sample]:
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f"{name}_bucket", (*labels, ("le", repr(bound))), cumulative
+        yield f"{name}_bucket", (*labels, ("le", "+Inf")), self.count
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, self.count
+
+
+class HistogramFamily:
+    """Histogramas indexados por labels, criados sob demanda."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], Histogram] = {}
+
+    def labels(self, *values: str) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = Histogram()
+        return child
+
+    def collect(self) -> Iterable[Sample]:
+        for values, child in self._children.items():
+            yield from child.samples(self.name, tuple(zip(self.labelnames, values)))
+
+
+class CounterFamily:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *values: str) -> None:
+        self.values[values] = self.values.get(values, 0) + 1
+
+    def collect(self) -> Iterable[Sample]:
+        for values, value in self.values.items():
+            yield self.name, tuple(zip(self.labelnames, values)), value
+
+
+http_request_duration = HistogramFamily(
+    "http_request_duration_seconds",
+    "Latência das requisições HTTP por rota.",
+    ("method", "route"),
+)
+http_requests = CounterFamily(
+    "http_requests_total",
+    "Requisições HTTP por rota e status.",
+    ("method", "route", "status"),
+)
+db_query_duration = HistogramFamily(
+    "db_query_duration_seconds", "Latência das consultas ao Postgres.", ()
+)
+in_flight_requests = 0
+
+# Coletores avaliados só no scrape: (nome, tipo, ajuda, função -> amostras)
+_collectors: list[tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+
+
+def register_collector(
+    name: str, type_: str, help: str, collect: Callable[[], Iterable[Sample]]
+) -> None:
+    _collectors.append((name, type_, help, collect))
+
+
+def register_gauge(name: str, help: str, read: Callable[[], float]) -> None:
+    register_collector(name, "gauge", help, lambda: [(name, (), read())])
+
+
+class MetricsMiddleware:
+    """Middleware ASGI puro: mede latência e requisições em andamento."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        global in_flight_requests
+        in_flight_requests += 1
+        status = 500
+        start = perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight_requests -= 1
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            http_request_duration.labels(method, path).observe(perf_counter() - start)
+            http_requests.inc(method, path, str(status))
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        db_query_duration.labels().observe(perf_counter() - context._query_start)
+
+
+def _families():
+    yield (
+        http_request_duration.name,
+        "histogram",
+        http_request_duration.help,
+        http_request_duration.collect,
+    )
+    yield http_requests.name, "counter", http_requests.help, http_requests.collect
+    yield (
+        db_query_duration.name,
+        "histogram",
+        db_query_duration.help,
+        db_query_duration.collect,
+    )
+    yield (
+        "http_requests_in_flight",
+        "gauge",
+        "Requisições HTTP em andamento.",
+        lambda: [("http_requests_in_flight", (), in_flight_requests)],
+    )
+    yield from _collectors
+
+
+def snapshot() -> dict:
+    """Estado atual do worker, serializável em JSON."""
+    families = {}
+    for name, type_, help, collect in _families():
+        samples = [[sample, list(labels), value] for sample, labels, value in collect()]
+        families[name] = {"type": type_, "help": help, "samples": samples}
+    return families
+
+
+def merge(snapshots: Iterable[dict]) -> dict:
+    merged: dict = {}
+    for families in snapshots:
+        for name, family in families.items():
+            target = merged.setdefault(
+                name, {"type": family["type"], "help": family["help"], "values": {}}
+            )
+            for sample, labels, value in family["samples"]:
+                key = (sample, tuple(map(tuple, labels)))
+                target["values"][key] = target["values"].get(key, 0) + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render(families: dict) -> str:
+    lines = []
+    for name, family in families.items():
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for (sample, labels), value in family["values"].items():
+            if labels:
+                label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels)
+                lines.append(f"{sample}{{{label_text}}} {value}")
+            else:
+                lines.append(f"{sample} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _snapshot_path(pid: int) -> Path:
+    return Path(settings.metrics_dir) / f"worker-{pid}.json"
+
+
+def write_snapshot() -> None:
+    path = _snapshot_path(os.getpid())
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(snapshot()))
+    tmp.replace(path)
+
+
+def exposition() -> str:
+    """Texto do /metrics: este worker mais os snapshots dos demais."""
+    current = snapshot()
+    if not settings.metrics_dir:
+        return render(merge([current]))
+
+    own = _snapshot_path(os.getpid())
+    deadline = time() - settings.metrics_stale_after
+    others = []
+    for path in Path(settings.metrics_dir).glob("worker-*.json"):
+        try:
+            if path == own or path.stat().st_mtime < deadline:
+                continue
+            others.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return render(merge([current, *others]))
+
+
+async def publish_snapshots() -> None:
+    """Grava o snapshot do worker para que outros workers o incluam no scrape."""
+    if not settings.metrics_dir:
+        return
+
+    Path(settings.metrics_dir).mkdir(parents=True, exist_ok=True)
+    try:
+        while True:
+            try:
+                write_snapshot()
+            except OSError as e:
+                logger.error("Error writing metrics snapshot: %s", e)
+            await asyncio.sleep(settings.metrics_flush_interval)
+    finally:
+        _snapshot_path(os.getpid()).unlink(missing_ok=True)
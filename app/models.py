@@ -1,5 +1,6 @@
 from datetime import datetime
 
+from sqlalchemy import Index, Sequence, String, text, true
 from sqlalchemy.orm import (
     Mapped,
     mapped_as_dataclass,
@@ -9,12 +10,49 @@ from sqlalchemy.orm import (
 
 table_registry = registry()
 
+# Cada nextval() reserva um bloco de `increment` IDs para um worker (ver app/codes.py).
+short_code_seq = Sequence(
+    "short_code_seq",
+    start=0,
+    minvalue=0,
+    increment=1024,
+    metadata=table_registry.metadata,
+)
+
 
 @mapped_as_dataclass(table_registry)
 class Url:
     __tablename__ = "urls"
 
     uuid: Mapped[str] = mapped_column(unique=True, primary_key=True)
-    long_url: Mapped[str] = mapped_column(unique=True)
+    long_url: Mapped[str]
     short_code: Mapped[str] = mapped_column(unique=True)
+    # SHA-256 (hex) da URL normalizada: índice de tamanho fixo para deduplicação
+    long_url_digest: Mapped[str] = mapped_column(String(64), unique=True, index=True)
     created_at: Mapped[datetime] = mapped_column(default=datetime.now())
+    # Links sem expiração ficam com NULL e fora do índice parcial usado pela
+    # limpeza (app/expiry.py).
+    expires_at: Mapped[datetime | None] = mapped_column(default=None)
+    # Se navegadores e CDNs podem guardar o redirecionamento (app/redirects.py).
+    cacheable: Mapped[bool] = mapped_column(default=True, server_default=true())
+
+    __table_args__ = (
+        Index(
+            "ix_urls_expires_at",
+            "expires_at",
+            postgresql_where=text("expires_at IS NOT NULL"),
+        ),
+    )
+
+
+@mapped_as_dataclass(table_registry)
+class UrlClicks:
+    """Cliques agregados por código e por minuto (gravados em lote)."""
+
+    __tablename__ = "url_clicks"
+
+    # Sem chave estrangeira para urls: o flush de analytics não deve pagar
+    # pela verificação a cada upsert.
+    short_code: Mapped[str] = mapped_column(primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(primary_key=True)
+    clicks: Mapped[int]
@@ -0,0 +1,165 @@
+import hmac
+import logging
+import math
+from collections import Counter, OrderedDict
+from hashlib import sha1, sha256
+from http import HTTPStatus
+from time import monotonic
+
+from fastapi import HTTPException
+from fastapi.requests import Request
+from redis.exceptions import NoScriptError, RedisError
+
+from .cache import redis_shards
+from .metrics import register_collector
+from .settings import RateLimit, Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+# Token bucket atômico: lê, reabastece e consome em uma única chamada. O
+# relógio é o do Redis, igual para todos os workers. Retorna "0" quando a
+# requisição passa, senão os segundos até a próxima ficha.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(retry_after)
+"""
+TOKEN_BUCKET_SHA = sha1(TOKEN_BUCKET_SCRIPT.encode()).hexdigest()
+
+
+class LocalBuckets:
+    """Token buckets em memória do worker, usados com o Redis fora do ar.
+
+    O limite passa a valer por worker, e não para o cluster; o LRU limita a
+    memória mesmo com muitos clientes distintos.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, limit: RateLimit) -> float:
+        now = monotonic()
+        tokens, updated = self._buckets.pop(key, (limit.burst, now))
+        tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / limit.rate
+
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+class RateLimiter:
+    """Limites por rota e por cliente, compartilhados entre workers pelo Redis."""
+
+    def __init__(self, limits: dict[str, RateLimit], enabled: bool, local_maxsize: int):
+        self.limits = limits
+        self.enabled = enabled
+        self.local = LocalBuckets(local_maxsize)
+        self.limited: Counter[str] = Counter()
+        self.fallbacks = 0
+
+    async def retry_after(self, route: str, client: str) -> float:
+        """0 se a requisição pode seguir, senão os segundos até poder."""
+        limit = self.limits[route]
+        key = f"ratelimit:{route}:{client}"
+        node = redis_shards.node_for(key)
+        try:
+            async with node.breaker:
+                try:
+                    result = await node.client.evalsha(
+                        TOKEN_BUCKET_SHA, 1, key, limit.rate, limit.burst
+                    )
+                except NoScriptError:
+                    # Redis reiniciado: o EVAL roda o script e o deixa em cache
+                    # para os próximos EVALSHA.
+                    result = await node.client.eval(
+                        TOKEN_BUCKET_SCRIPT, 1, key, limit.rate, limit.burst
+                    )
+            return float(result)
+        except RedisError as e:
+            self.fallbacks += 1
+            logger.debug("Rate limiting locally: %s", e)
+            return self.local.take(key, limit)
+
+
+rate_limiter = RateLimiter(
+    settings.rate_limits,
+    settings.rate_limit_enabled,
+    settings.rate_limit_local_maxsize,
+)
+
+register_collector(
+    "rate_limited_requests_total",
+    "counter",
+    "Requisições recusadas com 429, por rota.",
+    lambda: [
+        ("rate_limited_requests_total", (("route", route),), count)
+        for route, count in rate_limiter.limited.items()
+    ],
+)
+register_collector(
+    "rate_limit_local_fallbacks_total",
+    "counter",
+    "Verificações feitas no worker por falta do Redis.",
+    lambda: [("rate_limit_local_fallbacks_total", (), rate_limiter.fallbacks)],
+)
+
+
+def is_known_api_key(api_key: str) -> bool:
+    return any(
+        hmac.compare_digest(api_key.encode(), known.encode())
+        for known in settings.rate_limit_api_keys
+    )
+
+
+def client_identity(request: Request) -> str:
+    """Chave de API cadastrada, se enviada; senão o IP do cliente (já resolvido
+    pelo proxy). Chaves desconhecidas não ganham bucket próprio: trocar de
+    chave a cada requisição não escapa do limite.
+    """
+    api_key = request.headers.get("x-api-key")
+    if api_key and is_known_api_key(api_key):
+        # A chave em si não vai para o Redis.
+        return "key:" + sha256(api_key.encode()).hexdigest()[:32]
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+def rate_limit(route: str):
+    """Dependência que aplica o limite de `route` (ver Settings.rate_limits)."""
+
+    async def check(request: Request) -> None:
+        if not rate_limiter.enabled or route not in rate_limiter.limits:
+            return
+
+        retry_after = await rate_limiter.retry_after(route, client_identity(request))
+        if retry_after > 0:
+            rate_limiter.limited[route] += 1
+            raise HTTPException(
+                HTTPStatus.TOO_MANY_REQUESTS,
+                detail="Muitas requisições. Tente novamente mais tarde.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    return check
@@ -0,0 +1,158 @@
+"""Política de cache HTTP dos redirecionamentos.
+
+Links cacheáveis saem com `Cache-Control: public, max-age`, `ETag` e
+`Last-Modified` (ambos de `created_at`), para que navegadores e CDNs repitam
+o redirecionamento sem voltar à origem:
+
+- sem expiração: redirecionamento permanente (`redirect_permanent_status`,
+  301 ou 308) com max-age de `redirect_cache_max_age`;
+- com expiração: 302, com max-age limitado ao tempo que resta ao link;
+- não cacheáveis (`Url.cacheable`, ex.: para contar todos os cliques) ou com
+  `redirect_cache_max_age=0`: 302 com `Cache-Control: no-store`.
+
+Cliques servidos por um cache intermediário não chegam à origem e não entram
+nas estatísticas.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from http import HTTPStatus
+from time import time
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .responses import FastRedirectResponse, NotModifiedResponse
+from .settings import Settings
+
+settings = Settings()
+
+# Valor de um código no cache: "v1|created_at|expires_at|cacheable|long_url",
+# datas em segundos Unix (expires_at vazio para links sem expiração). Valores
+# sem o prefixo são URLs puras, gravadas antes da política de cache.
+CACHE_FORMAT = "v1|"
+
+NO_STORE = [(b"cache-control", b"no-store")]
+
+
+@dataclass(slots=True)
+class RedirectTarget:
+    long_url: str
+    created_at: int | None = None
+    expires_at: int | None = None
+    cacheable: bool = False
+
+    @classmethod
+    def from_fields(
+        cls,
+        long_url: str,
+        created_at: datetime,
+        expires_at: datetime | None,
+        cacheable: bool,
+    ) -> "RedirectTarget":
+        return cls(
+            long_url,
+            int(created_at.timestamp()),
+            int(expires_at.timestamp()) if expires_at else None,
+            cacheable,
+        )
+
+    @classmethod
+    def from_url(cls, url) -> "RedirectTarget":
+        return cls.from_fields(
+            url.long_url, url.created_at, url.expires_at, url.cacheable
+        )
+
+    @classmethod
+    def decode(cls, value: str) -> "RedirectTarget":
+        if not value.startswith(CACHE_FORMAT):
+            return cls(value)
+        _, created_at, expires_at, cacheable, long_url = value.split("|", 4)
+        return cls(
+            long_url,
+            int(created_at),
+            int(expires_at) if expires_at else None,
+            cacheable == "1",
+        )
+
+    def encode(self) -> str:
+        expires_at = "" if self.expires_at is None else self.expires_at
+        return (
+            f"{CACHE_FORMAT}{self.created_at}|{expires_at}|"
+            f"{int(self.cacheable)}|{self.long_url}"
+        )
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= time()
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.created_at:x}"'
+
+
+@lru_cache(maxsize=4096)
+def validator_headers(created_at: int) -> tuple[tuple[bytes, bytes], ...]:
+    # formatdate custa mais do que o resto da resposta; links quentes repetem
+    # sempre os mesmos valores.
+    return (
+        (b"etag", f'"{created_at:x}"'.encode()),
+        (b"last-modified", formatdate(created_at, usegmt=True).encode()),
+    )
+
+
+@lru_cache(maxsize=4096)
+def cache_control(max_age: int) -> tuple[bytes, bytes]:
+    return (b"cache-control", f"public, max-age={max_age}".encode())
+
+
+def not_modified(request: Request, target: RedirectTarget) -> bool:
+    """Se a cópia do cliente (pelos validadores da requisição) ainda vale."""
+    # Varre os headers crus uma vez: quase nenhuma requisição traz validadores,
+    # e request.headers custaria uma busca por header.
+    if_none_match = if_modified_since = None
+    for name, value in request.scope["headers"]:
+        if name == b"if-none-match":
+            if_none_match = value.decode("latin-1")
+        elif name == b"if-modified-since":
+            if_modified_since = value.decode("latin-1")
+
+    if if_none_match is not None:
+        # If-None-Match tem precedência sobre If-Modified-Since (RFC 9110).
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or target.etag in tags
+
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return since.tzinfo is not None and since.timestamp() >= target.created_at
+
+
+def redirect_response(request: Request, target: RedirectTarget) -> Response:
+    # `target` nunca está expirado: get_url responde 404 antes de chegar aqui.
+    # Entradas antigas do cache, sem os metadados: redirecionamento simples.
+    if target.created_at is None:
+        return FastRedirectResponse(target.long_url)
+
+    max_age = settings.redirect_cache_max_age if target.cacheable else 0
+    if target.expires_at is not None:
+        max_age = min(max_age, target.expires_at - int(time()))
+    if max_age <= 0:
+        return FastRedirectResponse(target.long_url, headers=NO_STORE)
+
+    headers = [cache_control(max_age), *validator_headers(target.created_at)]
+    if not_modified(request, target):
+        return NotModifiedResponse(headers)
+
+    # Um link que vai expirar não pode ser redirecionado para sempre.
+    status = (
+        settings.redirect_permanent_status
+        if target.expires_at is None
+        else HTTPStatus.FOUND
+    )
+    return FastRedirectResponse(target.long_url, status, headers)
@@ -0,0 +1,63 @@
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import quote
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.responses import Response
+
+# Mesmos caracteres preservados pelo RedirectResponse do Starlette.
+LOCATION_SAFE_CHARS = ":/%#?=@[]!$&'()*+,;"
+
+
+class FastRedirectResponse(Response):
+    """Redirecionamento sem corpo, com os headers crus montados diretamente.
+
+    Evita o MutableHeaders e o init_headers do Response padrão, que aparecem no
+    perfil do caminho de cache hit.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        status_code: int = HTTPStatus.FOUND,
+        headers: list[tuple[bytes, bytes]] = (),
+    ):
+        self.status_code = status_code
+        self.background = None
+        self.body = b""
+        self.raw_headers = [
+            (b"location", quote(url, safe=LOCATION_SAFE_CHARS).encode("latin-1")),
+            (b"content-length", b"0"),
+            *headers,
+        ]
+
+
+class NotModifiedResponse(Response):
+    """304 com os headers de cache da representação, sem corpo nem Content-Length."""
+
+    def __init__(self, headers: list[tuple[bytes, bytes]]):
+        self.status_code = HTTPStatus.NOT_MODIFIED
+        self.background = None
+        self.body = b""
+        self.raw_headers = list(headers)
+
+
+class FastJSONResponse(Response):
+    """JSON serializado pelo pydantic-core (Rust), sem passar por json.dumps.
+
+    Modelos são serializados direto para bytes, sem o dict intermediário do
+    jsonable_encoder; str/bytes são tratados como JSON pronto (ex.: lido do
+    Redis) e enviados sem reprocessamento.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if isinstance(content, str):
+            return content.encode()
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return to_json(content)
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from pydantic import UUID4, BaseModel, HttpUrl
+from pydantic import UUID4, BaseModel, HttpUrl, TypeAdapter
 
 
 class Message(BaseModel):
@@ -12,3 +12,25 @@ class UrlOut(BaseModel):
     long_url: HttpUrl
     short_code: str
     created_at: datetime
+    expires_at: datetime | None = None
+    cacheable: bool = True
+
+
+_long_url = TypeAdapter(HttpUrl)
+
+
+def validate_long_url(url) -> str:
+    """Rejeita (ValueError) o que UrlOut não conseguiria devolver como long_url."""
+    _long_url.validate_python(url)
+    return url
+
+
+class ClickBucket(BaseModel):
+    minute: datetime
+    clicks: int
+
+
+class UrlStats(BaseModel):
+    short_code: str
+    total_clicks: int
+    buckets: list[ClickBucket]
@@ -0,0 +1,50 @@
+"""Servidor de produção: um worker uvicorn por CPU, com uvloop e httptools.
+
+    uv run python -m app.server
+
+Cada worker é um processo novo (spawn) que importa o app e cria os seus
+próprios pools de Postgres e Redis. WEB_WORKERS fixa o número de workers, e
+WEB_APP=edge sobe o nó de borda somente leitura (app/edge.py).
+"""
+
+import os
+import tempfile
+
+import uvicorn
+
+from .settings import ServerSettings
+
+
+def worker_count(settings: ServerSettings) -> int:
+    # Com STORAGE_BACKEND=memory os links vivem no processo: cada worker teria
+    # os seus.
+    if settings.web_app == "main" and settings.storage_backend == "memory":
+        return 1
+    return settings.web_workers or os.cpu_count() or 1
+
+
+def main() -> None:
+    settings = ServerSettings()
+    workers = worker_count(settings)
+
+    if workers > 1 and not settings.metrics_dir:
+        # O /metrics de qualquer worker soma os snapshots de todos.
+        os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="url-shortener-metrics-")
+
+    uvicorn.run(
+        f"app.{settings.web_app}:app",
+        host=settings.web_host,
+        port=settings.web_port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        # O log de acesso custa mais que o próprio redirecionamento em cache;
+        # latência e status por rota estão no /metrics.
+        access_log=False,
+        proxy_headers=True,
+        server_header=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
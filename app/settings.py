@@ -1,14 +1,130 @@
+from typing import Literal
+
+from pydantic import BaseModel, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
-class Settings(BaseSettings):
-    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
+class RateLimit(BaseModel):
+    """Token bucket: `rate` fichas por segundo, acumulando até `burst`."""
+
+    rate: float
+    burst: int
+
+
+class ServerSettings(BaseSettings):
+    """Só o necessário para subir o servidor: nós de borda não têm banco nem Redis."""
+
+    model_config = SettingsConfigDict(
+        env_file=".env", env_file_encoding="utf-8", extra="ignore"
+    )
+
+    web_host: str = "0.0.0.0"
+    web_port: int = 8000
+    web_workers: int | None = None  # padrão: um por CPU
+    web_app: Literal["main", "edge"] = "main"
+    snapshot_dir: str = "snapshots"
+    snapshot_reload_interval: float = 10.0
+    # Onde ficam os links (ver app/storage.py); memory roda com um só worker.
+    storage_backend: Literal["postgres", "memory"] = "postgres"
+    # Diretório compartilhado em que cada worker publica as suas métricas.
+    metrics_dir: str | None = None
 
+    @field_validator("web_workers", mode="before")
+    @classmethod
+    def empty_is_default(cls, value):
+        # WEB_WORKERS= (como no .env.example) vale o padrão.
+        return None if value == "" else value
+
+
+class Settings(ServerSettings):
+    model_config = SettingsConfigDict(extra="forbid")
+
+    environment: Literal["development", "production"] = "development"
     database_url: str
     secret_key: str
+    # Bearer das rotas administrativas (/urls/export); sem ele, ficam desligadas.
+    admin_token: str | None = None
     postgres_db: str
     postgres_user: str
     postgres_password: str
+    db_echo: bool | None = None  # padrão: ligado só em development
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 5.0
+    db_pool_pre_ping: bool = False
+    db_pool_recycle: int = 1800
+    db_statement_cache_size: int = 500
+    database_replica_urls: list[str] = []
+    db_replica_health_interval: float = 5.0
     redis_host: str
     redis_port: int
     redis_db: int
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 1.0
+    redis_socket_timeout: float = 0.5
+    redis_socket_connect_timeout: float = 0.5
+    redis_health_check_interval: int = 30
+    redis_breaker_failure_threshold: int = 5
+    redis_breaker_reset_timeout: float = 5.0
+    # URLs dos nós do cache (redis://host:porta/db); vazio usa só
+    # redis_host/redis_port/redis_db. O primeiro nó também cuida do pub/sub.
+    redis_nodes: list[str] = []
+    redis_virtual_nodes: int = 160
+    redis_node_check_interval: float = 5.0
+    cache_ttl: int = 86_400
+    cache_ttl_jitter: float = 0.1
+    negative_cache_ttl: int = 30
+    local_cache_maxsize: int = 10_000
+    local_cache_ttl: float = 60.0
+    cache_invalidation_channel: str = "url-invalidation"
+    code_announce_channel: str = "url-created"
+    bloom_enabled: bool = True
+    bloom_capacity: int = 1_000_000
+    bloom_error_rate: float = 0.01
+    bloom_rebuild_interval: float = 3600.0
+    bloom_min_rebuild_interval: float = 60.0
+    warmup_enabled: bool = True
+    warmup_max_rows: int = 50_000
+    warmup_max_seconds: float = 30.0
+    warmup_batch_size: int = 1_000
+    warmup_window_hours: int = 24
+    warmup_readiness_timeout: float = 5.0
+    expiry_purge_interval: float = 60.0
+    expiry_purge_batch_size: int = 1_000
+    expiry_purge_pause: float = 0.1
+    rate_limit_enabled: bool = True
+    # Por rota; ex.: RATE_LIMITS='{"shorten": {"rate": 1, "burst": 20}}'
+    rate_limits: dict[str, RateLimit] = {
+        "shorten": RateLimit(rate=1.0, burst=20),
+        "shorten_bulk": RateLimit(rate=0.1, burst=5),
+    }
+    rate_limit_local_maxsize: int = 10_000
+    # Chaves de X-API-Key com bucket próprio; as demais contam pelo IP.
+    rate_limit_api_keys: list[str] = []
+    # Cache HTTP dos redirecionamentos (ver app/redirects.py); 0 desliga.
+    redirect_cache_max_age: int = 3_600
+    # 301 ou 308; int porque Literal[301, 308] não aceita o texto do ambiente.
+    redirect_permanent_status: int = 301
+    # Idade máxima do snapshot completo antes de um delta virar full.
+    snapshot_max_base_age: float = 3_600.0
+    bulk_max_batch_size: int = 5_000
+    transfer_batch_size: int = 5_000
+    analytics_flush_interval: float = 5.0
+    analytics_flush_threshold: int = 10_000
+    # Maior janela aceita em /{short_code}/stats?minutes= (padrão: 7 dias).
+    analytics_stats_max_minutes: int = 10_080
+    metrics_flush_interval: float = 5.0
+    metrics_stale_after: float = 60.0
+
+    @field_validator("redirect_permanent_status")
+    @classmethod
+    def check_permanent_status(cls, value: int) -> int:
+        if value not in (301, 308):
+            raise ValueError("deve ser 301 ou 308")
+        return value
+
+    @model_validator(mode="after")
+    def apply_environment_defaults(self):
+        if self.db_echo is None:
+            self.db_echo = self.environment == "development"
+        return self
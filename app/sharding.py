@@ -0,0 +1,179 @@
+"""Cache distribuído entre vários nós Redis por hashing consistente.
+
+Cada nó ocupa `virtual_nodes` pontos de um anel de hashes de 64 bits; a chave
+fica no nó dono do primeiro ponto depois do hash dela. Com muitos pontos por
+nó as chaves se dividem por igual, e adicionar ou remover um nó move só as
+chaves que passam a ser (ou deixam de ser) dele: cerca de 1/N, sem tocar nas
+demais.
+"""
+
+import asyncio
+import logging
+from bisect import bisect
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from hashlib import blake2b
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from .breaker import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+def ring_hash(value: str) -> int:
+    return int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Anel de hashing consistente sobre nomes de nós."""
+
+    def __init__(self, nodes: Iterable[str], virtual_nodes: int):
+        points = sorted(
+            (ring_hash(f"{node}#{i}"), node)
+            for node in nodes
+            for i in range(virtual_nodes)
+        )
+        if not points:
+            raise ValueError("O anel precisa de ao menos um nó")
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        # O anel é circular: depois do último ponto vem o primeiro.
+        position = bisect(self._hashes, ring_hash(key)) % len(self._hashes)
+        return self._nodes[position]
+
+
+class RedisNode:
+    """Um nó do cache, com pool de conexões e circuit breaker próprios."""
+
+    def __init__(self, url: str, breaker: CircuitBreaker, **pool_options):
+        self.pool = redis.BlockingConnectionPool.from_url(url, **pool_options)
+        self.client = redis.Redis(connection_pool=self.pool)
+        self.breaker = breaker
+        # Nome estável (e sem a senha da URL) para o anel e as métricas.
+        options = self.pool.connection_kwargs
+        address = options.get("path") or (
+            f"{options.get('host', 'localhost')}:{options.get('port', 6379)}"
+        )
+        self.name = f"{address}/{options.get('db', 0)}"
+
+
+class ShardedRedis:
+    """Os nós do cache e o roteamento de cada chave para o seu nó.
+
+    O primeiro nó é também o primário: pub/sub, locks e as demais chaves que
+    não pertencem a um link ficam nele.
+
+    Um nó fora do ar não sai do anel: as chaves dele não migram para os
+    vizinhos (que as serviriam desatualizadas quando ele voltasse); o breaker
+    dele abre e elas seguem pelo cache local e pelo banco até ele voltar.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        virtual_nodes: int,
+        breaker_factory: Callable[[], CircuitBreaker],
+        **pool_options,
+    ):
+        self.nodes = [RedisNode(url, breaker_factory(), **pool_options) for url in urls]
+        self._by_name = {node.name: node for node in self.nodes}
+        if len(self._by_name) != len(self.nodes):
+            raise ValueError(f"Nós Redis repetidos: {urls}")
+        self.primary = self.nodes[0]
+        self._ring = HashRing(self._by_name, virtual_nodes)
+
+    def node_for(self, key: str) -> RedisNode:
+        if len(self.nodes) == 1:
+            return self.primary
+        return self._by_name[self._ring.node_for(key)]
+
+    def group(self, keys: Iterable[str]) -> dict[RedisNode, list[str]]:
+        groups = defaultdict(list)
+        for key in keys:
+            groups[self.node_for(key)].append(key)
+        return groups
+
+    def pipeline(self) -> "ShardedPipeline":
+        return ShardedPipeline(self)
+
+    async def check_health(self) -> None:
+        """PING em cada nó, pelo breaker dele.
+
+        Abre o circuito de um nó caído sem esperar que as requisições o
+        encontrem, e o fecha assim que ele volta, mesmo sem tráfego.
+        """
+
+        async def ping(node: RedisNode) -> None:
+            try:
+                async with node.breaker:
+                    await node.client.ping()
+            except CircuitOpenError:
+                pass
+            except RedisError as e:
+                logger.warning("Redis node %s failed health check: %s", node.name, e)
+
+        await asyncio.gather(*(ping(node) for node in self.nodes))
+
+    async def run_health_checks(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_health()
+
+    def reset_after_fork(self) -> None:
+        for node in self.nodes:
+            node.pool.reset()
+
+    async def close(self) -> None:
+        for node in self.nodes:
+            await node.client.aclose()
+            await node.pool.disconnect()
+
+    def stats(self) -> dict[str, str]:
+        return {node.name: node.breaker.state for node in self.nodes}
+
+
+class ShardedPipeline:
+    """Comandos roteados por chave e executados em um pipeline por nó.
+
+    Os pipelines dos nós rodam em paralelo, então o lote custa uma ida à rede
+    qualquer que seja o número de nós envolvidos.
+    """
+
+    def __init__(self, shards: ShardedRedis):
+        self._shards = shards
+        self._commands: dict[RedisNode, list] = defaultdict(list)
+
+    def on(self, node: RedisNode, command: str, *args, **kwargs) -> None:
+        self._commands[node].append((command, args, kwargs))
+
+    def keyed(self, command: str, key: str, *args, **kwargs) -> None:
+        """Enfileira o comando no nó dono de `key` (o primeiro argumento)."""
+        self.on(self._shards.node_for(key), command, key, *args, **kwargs)
+
+    def primary(self, command: str, *args, **kwargs) -> None:
+        self.on(self._shards.primary, command, *args, **kwargs)
+
+    async def execute(self) -> None:
+        """Executa todos os pipelines; se algum falhar, levanta o primeiro erro.
+
+        Os nós que responderam já aplicaram seus comandos.
+        """
+
+        async def run(node: RedisNode, commands: list) -> None:
+            async with node.breaker, node.client.pipeline(transaction=False) as pipe:
+                for command, args, kwargs in commands:
+                    getattr(pipe, command)(*args, **kwargs)
+                await pipe.execute()
+
+        commands, self._commands = self._commands, defaultdict(list)
+        results = await asyncio.gather(
+            *(run(node, batch) for node, batch in commands.items()),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
@@ -0,0 +1,250 @@
+"""Snapshot somente leitura dos redirecionamentos, consultado via mmap.
+
+Formato (little-endian), pensado para ser mapeado e lido sem desserialização:
+
+    cabeçalho   magic (8s), largura do código (Q), N (Q), built_at (d)
+    códigos     N chaves u64 ordenadas: o código com \\0 à direita até 8 bytes,
+                lido como inteiro big-endian (a ordem dos inteiros é a dos bytes)
+    offsets     N + 1 u64: início de cada URL no blob (o último é o fim)
+    expirações  N i64: expires_at em segundos Unix, 0 para links sem expiração
+    blob        URLs longas em UTF-8, concatenadas
+
+O snapshot completo (`base-*.snap`) é complementado por deltas
+(`delta-*.snap`) com os links criados depois dele; ver app/snapshot_builder.py
+e app/edge.py.
+"""
+
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from bisect import bisect_left
+from pathlib import Path
+from time import time
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"URLSNAP1"
+HEADER = struct.Struct("<8sQQd")
+BASE_PREFIX = "base-"
+DELTA_PREFIX = "delta-"
+SUFFIX = ".snap"
+KEY_SIZE = 8
+
+
+def encode_key(short_code: str, code_width: int) -> int | None:
+    """Chave de largura fixa do código, ou None se ele não cabe nela."""
+    key = short_code.encode()
+    if len(key) > code_width:
+        return None
+    return int.from_bytes(key.ljust(KEY_SIZE, b"\0"), "big")
+
+
+def snapshot_name(prefix: str, built_at: float) -> str:
+    # Largura fixa: a ordem alfabética dos nomes é a ordem de construção.
+    return f"{prefix}{round(built_at * 1_000_000):020d}{SUFFIX}"
+
+
+class SnapshotWriter:
+    """Grava um snapshot a partir de linhas já ordenadas por código.
+
+    Cada seção vai para um arquivo temporário próprio enquanto as linhas
+    chegam, então a memória não depende do tamanho da tabela; `commit` junta
+    as seções e publica o arquivo com um rename atômico.
+    """
+
+    def __init__(self, path: str | Path, code_width: int, built_at: float):
+        if code_width > KEY_SIZE:
+            raise ValueError(f"Códigos de até {KEY_SIZE} bytes: {code_width}")
+        self.path = Path(path)
+        self.code_width = code_width
+        self.built_at = built_at
+        self.count = 0
+        self.skipped = 0
+        self._last_key = -1
+        self._blob_size = 0
+        self._keys = tempfile.TemporaryFile()
+        self._offsets = tempfile.TemporaryFile()
+        self._expires = tempfile.TemporaryFile()
+        self._blob = tempfile.TemporaryFile()
+
+    def add(self, short_code: str, long_url: str, expires_at: float | None) -> None:
+        key = encode_key(short_code, self.code_width)
+        if key is None:
+            # Códigos legados mais longos não cabem na chave de largura fixa.
+            self.skipped += 1
+            logger.warning("Skipping short code wider than the key: %s", short_code)
+            return
+
+        if key <= self._last_key:
+            raise ValueError(f"Códigos fora de ordem no snapshot: {short_code}")
+        self._last_key = key
+
+        url = long_url.encode()
+        self._keys.write(key.to_bytes(KEY_SIZE, "little"))
+        self._offsets.write(self._blob_size.to_bytes(8, "little"))
+        self._expires.write(round(expires_at or 0).to_bytes(8, "little", signed=True))
+        self._blob.write(url)
+        self._blob_size += len(url)
+        self.count += 1
+
+    def commit(self) -> Path:
+        self._offsets.write(self._blob_size.to_bytes(8, "little"))
+
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(
+                    HEADER.pack(MAGIC, self.code_width, self.count, self.built_at)
+                )
+                for section in (self._keys, self._offsets, self._expires, self._blob):
+                    section.seek(0)
+                    shutil.copyfileobj(section, out)
+                out.flush()
+                os.fsync(out.fileno())
+            # Leitores veem o arquivo antigo ou o novo inteiro, nunca um parcial.
+            os.replace(tmp, self.path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        finally:
+            self.close()
+        return self.path
+
+    def close(self) -> None:
+        for section in (self._keys, self._offsets, self._expires, self._blob):
+            section.close()
+
+
+class Snapshot:
+    """Um arquivo de snapshot mapeado em memória, com busca binária nos códigos.
+
+    As seções são views tipadas sobre o mmap: a busca (`bisect` em C) e a
+    leitura dos offsets não copiam nada do arquivo; só a URL encontrada vira
+    um objeto Python.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as file:
+            self._mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.code_width, self.count, self.built_at = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Arquivo de snapshot inválido: {self.path}")
+
+        offsets_at = HEADER.size + self.count * KEY_SIZE
+        expires_at = offsets_at + (self.count + 1) * 8
+        self._blob_at = expires_at + self.count * 8
+        view = memoryview(self._mm)
+        self._keys = view[HEADER.size : offsets_at].cast("Q")
+        self._offsets = view[offsets_at:expires_at].cast("Q")
+        self._expires = view[expires_at : self._blob_at].cast("q")
+        view.release()
+
+    def find(self, short_code: str) -> int:
+        """Posição do código no snapshot, ou -1."""
+        key = encode_key(short_code, self.code_width)
+        if key is None:
+            return -1
+        position = bisect_left(self._keys, key)
+        if position < self.count and self._keys[position] == key:
+            return position
+        return -1
+
+    def expired(self, position: int, now: float) -> bool:
+        expires_at = self._expires[position]
+        return 0 < expires_at <= now
+
+    def long_url(self, position: int) -> str:
+        start = self._blob_at + self._offsets[position]
+        end = self._blob_at + self._offsets[position + 1]
+        return self._mm[start:end].decode()
+
+    def close(self) -> None:
+        # As views precisam ser liberadas antes de fechar o mmap.
+        self._keys.release()
+        self._offsets.release()
+        self._expires.release()
+        self._mm.close()
+
+
+def list_snapshots(directory: str | Path) -> tuple[Path | None, list[Path]]:
+    """O snapshot completo mais novo e os deltas construídos depois dele."""
+    directory = Path(directory)
+    bases = sorted(directory.glob(f"{BASE_PREFIX}*{SUFFIX}"))
+    if not bases:
+        return None, []
+
+    base = bases[-1]
+    base_stamp = base.name.removeprefix(BASE_PREFIX)
+    deltas = [
+        path
+        for path in sorted(directory.glob(f"{DELTA_PREFIX}*{SUFFIX}"))
+        if path.name.removeprefix(DELTA_PREFIX) > base_stamp
+    ]
+    return base, deltas
+
+
+class SnapshotSet:
+    """Snapshot completo mais deltas, trocados atomicamente em `reload`.
+
+    As buscas são síncronas e leem `self._files` uma única vez, então uma
+    troca nunca é vista pela metade: a requisição usa o conjunto antigo ou o
+    novo inteiro.
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        # Do mais novo para o mais antigo: o primeiro arquivo com o código vence.
+        self._files: tuple[Snapshot, ...] = ()
+        self.reloads = 0
+
+    def get(self, short_code: str) -> str | None:
+        now = time()
+        for snapshot in self._files:
+            position = snapshot.find(short_code)
+            if position >= 0:
+                if snapshot.expired(position, now):
+                    return None
+                return snapshot.long_url(position)
+        return None
+
+    def reload(self) -> bool:
+        """Abre os arquivos novos do diretório; retorna se o conjunto mudou."""
+        base, deltas = list_snapshots(self.directory)
+        paths = [*reversed(deltas), base] if base else []
+        current = {snapshot.path: snapshot for snapshot in self._files}
+        if paths == list(current):
+            return False
+
+        files = tuple(current.get(path) or Snapshot(path) for path in paths)
+        old, self._files = self._files, files
+        for snapshot in old:
+            if snapshot not in files:
+                snapshot.close()
+        self.reloads += 1
+        logger.info(
+            "Loaded redirect snapshot %s with %d deltas",
+            base.name if base else None,
+            len(deltas),
+        )
+        return True
+
+    def close(self) -> None:
+        for snapshot in self._files:
+            snapshot.close()
+        self._files = ()
+
+    def stats(self) -> dict:
+        return {
+            "files": [snapshot.path.name for snapshot in self._files],
+            "codes": sum(snapshot.count for snapshot in self._files),
+            "built_at": max(
+                (snapshot.built_at for snapshot in self._files), default=None
+            ),
+            "reloads": self.reloads,
+        }
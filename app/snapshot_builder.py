@@ -0,0 +1,159 @@
+"""Constrói os snapshots de redirecionamento lidos pelos nós de borda (app/edge.py).
+
+    uv run python -m app.snapshot_builder full
+    uv run python -m app.snapshot_builder delta
+
+O `full` grava um novo `base-*.snap` com todos os links válidos e remove os
+arquivos anteriores; o `delta` grava só os links criados desde o arquivo mais
+novo do diretório. Distribua o diretório aos nós de borda (rsync, volume
+compartilhado, etc.): eles trocam de snapshot sozinhos.
+
+Deltas não trazem alterações de links antigos: uma expiração estendida (o
+upsert só a estende) ou um link apagado direto no banco só chega à borda no
+próximo `full`. Links expirados já somem pelo `expires_at` gravado, e a
+limpeza só apaga links expirados. Para limitar essa defasagem, o `delta` vira
+um `full` quando o snapshot completo tem mais de `SNAPSHOT_MAX_BASE_AGE`
+segundos.
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from time import monotonic, time
+
+from sqlalchemy import or_, select
+
+from .codes import CODE_LENGTH
+from .database import async_engine, stream_partitions
+from .models import Url
+from .settings import Settings
+from .snapshot import (
+    BASE_PREFIX,
+    DELTA_PREFIX,
+    SUFFIX,
+    Snapshot,
+    SnapshotWriter,
+    list_snapshots,
+    snapshot_name,
+)
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+# created_at é definido pelo app antes do commit: linhas gravadas logo antes
+# do início da leitura anterior podem não ter entrado nela. A sobreposição
+# entre arquivos só repete links, sem perder nenhum.
+DELTA_OVERLAP = timedelta(minutes=5)
+
+
+def snapshot_statement(now: datetime, created_after: datetime | None = None):
+    stmt = (
+        select(Url.short_code, Url.long_url, Url.expires_at)
+        .where(or_(Url.expires_at.is_(None), Url.expires_at > now))
+        # Ordem por byte, a mesma da busca binária no arquivo.
+        .order_by(Url.short_code.collate("C"))
+    )
+    if created_after is not None:
+        stmt = stmt.where(Url.created_at > created_after)
+    return stmt
+
+
+async def build_snapshot(
+    path: Path, built_at: float, created_after: datetime | None, batch_size: int
+) -> SnapshotWriter:
+    writer = SnapshotWriter(path, CODE_LENGTH, built_at)
+    try:
+        statement = snapshot_statement(datetime.fromtimestamp(built_at), created_after)
+        async for rows in stream_partitions(statement, batch_size):
+            for short_code, long_url, expires_at in rows:
+                writer.add(
+                    short_code,
+                    long_url,
+                    expires_at.timestamp() if expires_at else None,
+                )
+    except BaseException:
+        writer.close()
+        raise
+
+    writer.commit()
+    return writer
+
+
+async def build_full(directory: Path, batch_size: int) -> SnapshotWriter:
+    built_at = time()
+    path = directory / snapshot_name(BASE_PREFIX, built_at)
+    writer = await build_snapshot(path, built_at, None, batch_size)
+
+    # Os nós de borda que ainda mapeiam os arquivos antigos continuam lendo
+    # até a próxima troca: remover o nome não invalida o mmap. Deltas gravados
+    # durante esta construção ficam.
+    stamp = path.name.removeprefix(BASE_PREFIX)
+    for old in directory.glob(f"*{SUFFIX}"):
+        if old.name.removeprefix(BASE_PREFIX).removeprefix(DELTA_PREFIX) < stamp:
+            old.unlink(missing_ok=True)
+    return writer
+
+
+async def build_delta(
+    directory: Path, batch_size: int, max_base_age: float
+) -> SnapshotWriter:
+    base, deltas = list_snapshots(directory)
+    if base is None:
+        raise SystemExit(f"Nenhum snapshot completo em {directory}: rode `full` antes.")
+
+    base_snapshot = Snapshot(base)
+    base_age = time() - base_snapshot.built_at
+    base_snapshot.close()
+    if base_age > max_base_age:
+        logger.info("Base snapshot is %.0fs old, building a full one", base_age)
+        return await build_full(directory, batch_size)
+
+    latest = Snapshot((deltas or [base])[-1])
+    since = datetime.fromtimestamp(latest.built_at) - DELTA_OVERLAP
+    latest.close()
+
+    built_at = time()
+    path = directory / snapshot_name(DELTA_PREFIX, built_at)
+    return await build_snapshot(path, built_at, since, batch_size)
+
+
+async def run(args: argparse.Namespace) -> None:
+    directory = Path(args.directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    start = monotonic()
+    try:
+        if args.kind == "full":
+            writer = await build_full(directory, args.batch_size)
+        else:
+            writer = await build_delta(directory, args.batch_size, args.max_base_age)
+    finally:
+        await async_engine.dispose()
+
+    logger.info(
+        "Wrote %s with %d codes (%d skipped) in %.1fs",
+        writer.path.name,
+        writer.count,
+        writer.skipped,
+        monotonic() - start,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("kind", choices=["full", "delta"])
+    parser.add_argument("--directory", default=settings.snapshot_dir)
+    parser.add_argument("--batch-size", type=int, default=settings.transfer_batch_size)
+    parser.add_argument(
+        "--max-base-age", type=float, default=settings.snapshot_max_base_age
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
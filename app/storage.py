@@ -0,0 +1,353 @@
+"""Armazenamento dos links, atrás de uma interface única.
+
+Os handlers só falam com `url_storage`, escolhido por STORAGE_BACKEND:
+
+- `postgres` (padrão): `PostgresStorage`, com upsert em uma ida ao banco e
+  leituras nas réplicas;
+- `memory`: `MemoryStorage`, com os links em dicts no próprio processo. Serve
+  para os testes, para medir as camadas HTTP e de cache sem o banco e para um
+  nó único sem Postgres; o conteúdo some no restart e não é compartilhado entre
+  workers (app/server.py sobe um só).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from http import HTTPStatus
+from uuid import uuid4
+
+from fastapi import HTTPException
+from sqlalchemy import and_, case, delete, func, not_, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .cache import digest_key, invalidate_cached_codes
+from .codes import ShortCodeAllocator, code_allocator
+from .database import AsyncSessionLocal, read_first, replica_router
+from .models import Url, UrlClicks
+from .settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+SHORT_CODE_ATTEMPTS = 3
+
+
+class UrlStorage(ABC):
+    """Operações sobre os links usadas pelos handlers.
+
+    Os links devolvidos têm os atributos de `Url`; `get_by_code` pode devolver
+    só os que o redirecionamento usa.
+    """
+
+    @abstractmethod
+    async def get_by_code(self, short_code: str):
+        """long_url, expires_at, created_at e cacheable de um código válido."""
+
+    @abstractmethod
+    async def get_by_digests(self, digests: list[str]) -> dict:
+        """Links já encurtados, indexados pelo digest (inclusive os expirados)."""
+
+    @abstractmethod
+    async def create_many(
+        self,
+        urls: dict[str, str],
+        expires_at: datetime | None = None,
+        cacheable: bool = True,
+    ) -> list:
+        """Cria (ou recupera) os links de `urls`, indexadas pelo digest."""
+
+    @abstractmethod
+    async def delete(self, short_code: str) -> bool:
+        """Remove o link e invalida o cache; False se o código não existe."""
+
+    async def create(
+        self,
+        digest: str,
+        long_url: str,
+        expires_at: datetime | None = None,
+        cacheable: bool = True,
+    ):
+        [url] = await self.create_many({digest: long_url}, expires_at, cacheable)
+        return url
+
+    async def run(self) -> None:
+        """Manutenção em segundo plano, se a implementação precisar."""
+
+
+def upsert_url_statement():
+    # INSERT ... ON CONFLICT ... RETURNING: cria ou atualiza a URL em uma única
+    # ida ao banco, sem corrida entre requisições simultâneas. O DO UPDATE só
+    # roda quando o pedido muda o link, então o RETURNING traz as linhas novas e
+    # as alteradas; as que já atendiam ao pedido são lidas em seguida.
+    stmt = insert(Url)
+    return stmt.on_conflict_do_update(
+        index_elements=[Url.long_url_digest],
+        set_={
+            # Um link nunca expira antes do que qualquer pedido para ele pediu:
+            # sem expiração (NULL) prevalece, senão fica a expiração mais longa.
+            "expires_at": case(
+                (
+                    or_(Url.expires_at.is_(None), stmt.excluded.expires_at.is_(None)),
+                    None,
+                ),
+                else_=func.greatest(Url.expires_at, stmt.excluded.expires_at),
+            ),
+            # Basta um pedido sem cache HTTP para o link deixar de ser cacheável.
+            "cacheable": and_(Url.cacheable, stmt.excluded.cacheable),
+        },
+        where=or_(
+            and_(Url.cacheable, not_(stmt.excluded.cacheable)),
+            and_(
+                Url.expires_at.is_not(None),
+                or_(
+                    stmt.excluded.expires_at.is_(None),
+                    stmt.excluded.expires_at > Url.expires_at,
+                ),
+            ),
+        ),
+    ).returning(Url)
+
+
+async def invalidate_changed(urls) -> None:
+    """Avisa os workers de links existentes que o upsert estendeu ou tirou do cache."""
+    if urls:
+        await invalidate_cached_codes(
+            *(url.short_code for url in urls),
+            *(digest_key(url.long_url_digest) for url in urls),
+        )
+
+
+class PostgresStorage(UrlStorage):
+    """Links na tabela `urls`; cada operação usa uma sessão de `session_factory`."""
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+
+    async def get_by_code(self, short_code: str):
+        stmt = select(
+            Url.long_url, Url.expires_at, Url.created_at, Url.cacheable
+        ).where(
+            Url.short_code == short_code,
+            or_(Url.expires_at.is_(None), Url.expires_at > datetime.now()),
+        )
+        row = await read_first(stmt)
+        if row is None and replica_router.engines:
+            # Um código recém-criado pode ainda não ter chegado à réplica; o 404
+            # só é confirmado no primário.
+            async with self.session_factory() as session:
+                row = (await session.execute(stmt)).first()
+        return row
+
+    async def get_by_digests(self, digests: list[str]) -> dict[str, Url]:
+        async with self.session_factory() as session:
+            existing = await session.scalars(
+                select(Url).where(Url.long_url_digest.in_(digests))
+            )
+            return {url.long_url_digest: url for url in existing}
+
+    async def create_many(
+        self,
+        urls: dict[str, str],
+        expires_at: datetime | None = None,
+        cacheable: bool = True,
+    ) -> list[Url]:
+        async with self.session_factory() as session:
+            for _ in range(SHORT_CODE_ATTEMPTS):
+                now = datetime.now()
+                rows = [
+                    {
+                        "uuid": str(uuid4()),
+                        "long_url": url,
+                        "short_code": await code_allocator.allocate(session),
+                        "long_url_digest": digest,
+                        "created_at": now,
+                        "expires_at": expires_at,
+                        "cacheable": cacheable,
+                    }
+                    for digest, url in urls.items()
+                ]
+
+                try:
+                    if len(rows) == 1:
+                        written = [
+                            await session.scalar(upsert_url_statement(), rows[0])
+                        ]
+                    else:
+                        written = list(
+                            await session.scalars(upsert_url_statement(), rows)
+                        )
+                    await session.commit()
+                except IntegrityError:
+                    # Só ocorre se um código colidir com um código legado (gerado
+                    # antes do alocador); novos IDs do bloco são usados.
+                    await session.rollback()
+                    continue
+
+                by_digest = {url.long_url_digest: url for url in written if url}
+                new_uuids = {row["uuid"] for row in rows}
+                await invalidate_changed(
+                    [url for url in by_digest.values() if url.uuid not in new_uuids]
+                )
+                unchanged = [digest for digest in urls if digest not in by_digest]
+                if unchanged:
+                    by_digest.update(
+                        (url.long_url_digest, url)
+                        for url in await session.scalars(
+                            select(Url).where(Url.long_url_digest.in_(unchanged))
+                        )
+                    )
+                return [by_digest[digest] for digest in urls]
+
+        raise HTTPException(
+            HTTPStatus.SERVICE_UNAVAILABLE, detail="Não foi possível gerar o código."
+        )
+
+    async def delete(self, short_code: str) -> bool:
+        async with self.session_factory() as session:
+            digest = await session.scalar(
+                delete(Url)
+                .where(Url.short_code == short_code)
+                .returning(Url.long_url_digest)
+            )
+            if digest is not None:
+                # Como na limpeza dos expirados, os cliques saem junto.
+                await session.execute(
+                    delete(UrlClicks).where(UrlClicks.short_code == short_code)
+                )
+            await session.commit()
+
+        if digest is None:
+            return False
+        await invalidate_cached_codes(short_code, digest_key(digest))
+        return True
+
+
+@dataclass(slots=True)
+class StoredUrl:
+    """Um link do MemoryStorage, com os mesmos atributos de `Url`."""
+
+    uuid: str
+    long_url: str
+    short_code: str
+    long_url_digest: str
+    created_at: datetime
+    expires_at: datetime | None = None
+    cacheable: bool = True
+
+
+class MemoryStorage(UrlStorage):
+    """Links em dicts no processo, indexados por código e por digest.
+
+    Nenhuma operação faz await entre ler e alterar os índices: no event loop,
+    corrotinas concorrentes nunca veem uma criação pela metade, e o mesmo
+    digest pedido ao mesmo tempo gera um único link, sem lock. Os códigos saem
+    do mesmo embaralhamento do alocador do Postgres, sobre um contador local.
+    """
+
+    def __init__(self, secret: str, purge_interval: float = 60.0):
+        self.purge_interval = purge_interval
+        self.by_code: dict[str, StoredUrl] = {}
+        self.by_digest: dict[str, StoredUrl] = {}
+        self._allocator = ShortCodeAllocator(secret, 1)
+        self._ids = itertools.count()
+        # Heap de (expires_at, código); entradas de links já estendidos ou
+        # removidos são descartadas na limpeza.
+        self._expiring: list[tuple[datetime, str]] = []
+
+    async def get_by_code(self, short_code: str) -> StoredUrl | None:
+        url = self.by_code.get(short_code)
+        if url is None or (
+            url.expires_at is not None and url.expires_at <= datetime.now()
+        ):
+            return None
+        return url
+
+    async def get_by_digests(self, digests: list[str]) -> dict[str, StoredUrl]:
+        by_digest = self.by_digest
+        return {d: by_digest[d] for d in digests if d in by_digest}
+
+    async def create_many(
+        self,
+        urls: dict[str, str],
+        expires_at: datetime | None = None,
+        cacheable: bool = True,
+    ) -> list[StoredUrl]:
+        now = datetime.now()
+        result = []
+        changed = []
+        for digest, long_url in urls.items():
+            url = self.by_digest.get(digest)
+            previous = url and url.expires_at
+            if url is None:
+                url = StoredUrl(
+                    str(uuid4()),
+                    long_url,
+                    self._allocator.encode_id(next(self._ids)),
+                    digest,
+                    now,
+                    expires_at,
+                    cacheable,
+                )
+                self.by_digest[digest] = self.by_code[url.short_code] = url
+            else:
+                # As mesmas regras do upsert do Postgres.
+                before = (url.expires_at, url.cacheable)
+                if url.expires_at is not None:
+                    url.expires_at = expires_at and max(url.expires_at, expires_at)
+                url.cacheable = url.cacheable and cacheable
+                if (url.expires_at, url.cacheable) != before:
+                    changed.append(url)
+            if url.expires_at is not None and url.expires_at != previous:
+                heapq.heappush(self._expiring, (url.expires_at, url.short_code))
+            result.append(url)
+        await invalidate_changed(changed)
+        return result
+
+    def _remove(self, url: StoredUrl) -> None:
+        del self.by_code[url.short_code]
+        del self.by_digest[url.long_url_digest]
+
+    async def delete(self, short_code: str) -> bool:
+        url = self.by_code.get(short_code)
+        if url is None:
+            return False
+        self._remove(url)
+        await invalidate_cached_codes(short_code, digest_key(url.long_url_digest))
+        return True
+
+    def purge_expired(self) -> int:
+        """Remove os links já expirados; custa só o que expirou."""
+        now = datetime.now()
+        purged = 0
+        while self._expiring and self._expiring[0][0] <= now:
+            _, short_code = heapq.heappop(self._expiring)
+            url = self.by_code.get(short_code)
+            if url is not None and url.expires_at is not None and url.expires_at <= now:
+                self._remove(url)
+                purged += 1
+        return purged
+
+    async def run(self) -> None:
+        # As entradas de cache de links com expiração já vencem junto com eles
+        # (ver cache_ttl_for em app/cache.py): não há o que invalidar.
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            purged = self.purge_expired()
+            if purged:
+                logger.info("Purged %d expired URLs", purged)
+
+
+def build_storage(backend: str) -> UrlStorage:
+    if backend == "memory":
+        return MemoryStorage(settings.secret_key, settings.expiry_purge_interval)
+    return PostgresStorage(AsyncSessionLocal)
+
+
+url_storage = build_storage(settings.storage_backend)
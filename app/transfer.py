@@ -0,0 +1,325 @@
+"""Exportação e importação em streaming da tabela de links.
+
+A exportação também está disponível em `GET /urls/export` (com ADMIN_TOKEN). A
+importação lê o arquivo linha a linha e grava em lotes, com memória constante:
+
+    uv run python -m app.transfer export --format csv > urls.csv
+    uv run python -m app.transfer import urls.csv --sequence-bound 1048576
+
+A exportação informa o limite da sequência do alocador na origem; passado em
+`--sequence-bound`, ele faz a sequência do destino avançar além dos códigos
+importados que a origem alocou. Sem ele, a sequência não muda.
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Iterator
+from uuid import uuid4
+
+from pydantic_core import to_json
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from .cache import announce_codes, close_cache
+from .codes import ALPHABET, CODE_LENGTH, code_allocator
+from .database import AsyncSessionLocal, async_engine, stream_partitions
+from .models import Url, short_code_seq
+from .schemas import validate_long_url
+from .settings import Settings
+from .utils import hash_url, parse_local_datetime
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+COLUMNS = ("uuid", "long_url", "short_code", "created_at", "expires_at", "cacheable")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# A coluna short_code não tem limite de tamanho; códigos importados maiores
+# que isso são tratados como inválidos.
+MAX_IMPORTED_CODE_LENGTH = 32
+
+
+def export_statement():
+    return select(*(getattr(Url, column) for column in COLUMNS))
+
+
+async def stream_url_rows(batch_size: int) -> AsyncIterator[list]:
+    async for rows in stream_partitions(export_statement(), batch_size):
+        yield rows
+
+
+async def code_sequence_bound() -> int:
+    """Primeiro ID que o alocador desta instância ainda não reservou."""
+    async with AsyncSessionLocal() as session:
+        return await session.scalar(
+            text(
+                f"SELECT CASE WHEN is_called THEN last_value + :increment"
+                f" ELSE last_value END FROM {short_code_seq.name}"
+            ),
+            {"increment": short_code_seq.increment},
+        )
+
+
+def format_ndjson(rows) -> str:
+    return "".join(to_json(row._asdict()).decode() + "\n" for row in rows)
+
+
+def format_csv(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for row in rows:
+        writer.writerow(
+            value.isoformat() if isinstance(value, datetime) else value for value in row
+        )
+    return buffer.getvalue()
+
+
+async def export_chunks(format: str, batch_size: int) -> AsyncIterator[str]:
+    """Tabela `urls` em NDJSON ou CSV, um pedaço por lote do cursor."""
+    if format == "csv":
+        yield ",".join(COLUMNS) + "\n"
+    formatter = format_csv if format == "csv" else format_ndjson
+    async for rows in stream_url_rows(batch_size):
+        yield formatter(rows)
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[dict | None]:
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            # Contado como inválido em import_urls, sem abortar a importação.
+            yield None
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[dict]:
+    # Colunas vazias do CSV equivalem a valores ausentes.
+    for record in csv.DictReader(lines):
+        yield {key: value for key, value in record.items() if value}
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    # Como o CSV exportado grava booleanos ("True"/"False").
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    raise ValueError(f"booleano inválido: {value!r}")
+
+
+def _parse_short_code(value) -> str | None:
+    if value is None:
+        return None
+    # O código vira caminho do redirecionamento: só base62, como os alocados.
+    if (
+        not isinstance(value, str)
+        or not 0 < len(value) <= MAX_IMPORTED_CODE_LENGTH
+        or not all(char in ALPHABET for char in value)
+    ):
+        raise ValueError(f"short_code inválido: {value!r}")
+    return value
+
+
+def _is_allocator_code(code: str) -> bool:
+    return len(code) == CODE_LENGTH and all(char in ALPHABET for char in code)
+
+
+def import_row(record: dict, now: datetime) -> dict:
+    """Linha de `urls` a partir de um registro exportado (short_code opcional)."""
+    if not isinstance(record, dict):
+        raise TypeError("registro inválido")
+    long_url = record.get("long_url") or record.get("url")
+    if not isinstance(long_url, str) or not long_url.strip():
+        raise ValueError("long_url ausente")
+    validate_long_url(long_url)
+
+    return {
+        "uuid": record.get("uuid") or str(uuid4()),
+        "long_url": long_url,
+        "short_code": _parse_short_code(record.get("short_code")),
+        "long_url_digest": hash_url(long_url),
+        "created_at": parse_local_datetime(record.get("created_at")) or now,
+        "expires_at": parse_local_datetime(record.get("expires_at")),
+        "cacheable": _parse_bool(record.get("cacheable", True)),
+    }
+
+
+# Tentativas de gravar uma linha cujo código alocado colidiu com um importado.
+CODE_ATTEMPTS = 3
+
+
+@dataclass
+class ImportStats:
+    inserted: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    max_code_id: int = -1
+
+
+async def insert_batch(
+    rows: list[dict], stats: ImportStats, sequence_bound: int | None = None
+) -> None:
+    total = len(rows)
+    inserted: list[str] = []
+    async with AsyncSessionLocal() as session:
+        allocated = []
+        for row in rows:
+            if row["short_code"] is None:
+                row["short_code"] = await code_allocator.allocate(session)
+                allocated.append(row)
+            elif sequence_bound is not None and _is_allocator_code(row["short_code"]):
+                # Códigos legados ou de outro sistema também têm 7 caracteres,
+                # mas decodificam para IDs quaisquer: só contam os que a origem
+                # de fato alocou.
+                code_id = code_allocator.decode_code(row["short_code"])
+                if code_id < sequence_bound:
+                    stats.max_code_id = max(stats.max_code_id, code_id)
+
+        # URL já encurtada (digest) ou código já usado: a linha existente fica.
+        stmt = insert(Url).on_conflict_do_nothing().returning(Url.short_code)
+        for _ in range(CODE_ATTEMPTS):
+            inserted += await session.scalars(stmt, rows)
+            await session.commit()
+
+            # Um código alocado pode colidir com um código importado; essas
+            # linhas são repetidas com novos códigos. As demais já existiam.
+            created = set(inserted)
+            lost = [row for row in allocated if row["short_code"] not in created]
+            if not lost:
+                break
+            existing = set(
+                await session.scalars(
+                    select(Url.long_url_digest).where(
+                        Url.long_url_digest.in_(
+                            [row["long_url_digest"] for row in lost]
+                        )
+                    )
+                )
+            )
+            rows = allocated = [
+                row for row in lost if row["long_url_digest"] not in existing
+            ]
+            if not rows:
+                break
+            for row in rows:
+                row["short_code"] = await code_allocator.allocate(session)
+
+    stats.inserted += len(inserted)
+    stats.skipped += total - len(inserted)
+    await announce_codes(inserted)
+
+
+async def advance_code_sequence(max_code_id: int) -> None:
+    """Garante que novos blocos do alocador comecem depois dos códigos importados."""
+    block_start = max_code_id - max_code_id % short_code_seq.increment
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            text(
+                f"SELECT setval('{short_code_seq.name}', GREATEST(:start, last_value))"
+                f" FROM {short_code_seq.name}"
+            ),
+            {"start": block_start},
+        )
+        await session.commit()
+
+
+async def import_urls(
+    records: Iterable[dict | None], batch_size: int, sequence_bound: int | None = None
+) -> ImportStats:
+    """Grava `records` em lotes de `batch_size`, cada um em sua transação.
+
+    Com `sequence_bound` (o de `code_sequence_bound` na origem), a sequência
+    do alocador avança além dos códigos importados com ID abaixo dele.
+    """
+    stats = ImportStats()
+    batch: list[dict] = []
+    now = datetime.now()
+
+    for position, record in enumerate(records, start=1):
+        try:
+            batch.append(import_row(record, now))
+        except (ValueError, TypeError) as e:
+            stats.invalid += 1
+            logger.warning("Skipping record %d: %s", position, e)
+            continue
+
+        if len(batch) >= batch_size:
+            await insert_batch(batch, stats, sequence_bound)
+            batch = []
+
+    if batch:
+        await insert_batch(batch, stats, sequence_bound)
+    if stats.max_code_id >= 0:
+        await advance_code_sequence(stats.max_code_id)
+    return stats
+
+
+async def run(args: argparse.Namespace, lines=None) -> None:
+    try:
+        if args.command == "export":
+            async for chunk in export_chunks(args.format, args.batch_size):
+                sys.stdout.write(chunk)
+            logger.info(
+                "Short code sequence bound: %d (pass it to import --sequence-bound)",
+                await code_sequence_bound(),
+            )
+            return
+
+        format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+        reader = read_csv if format == "csv" else read_ndjson
+        stats = await import_urls(
+            reader(lines), args.batch_size, sequence_bound=args.sequence_bound
+        )
+        logger.info(
+            "Imported %d URLs (%d already present, %d invalid)",
+            stats.inserted,
+            stats.skipped,
+            stats.invalid,
+        )
+    finally:
+        await close_cache()
+        await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="grava a tabela na saída padrão")
+    export.add_argument("--format", choices=MEDIA_TYPES, default="ndjson")
+    export.add_argument("--batch-size", type=int, default=settings.transfer_batch_size)
+
+    load = commands.add_parser("import", help="carrega um arquivo NDJSON ou CSV")
+    load.add_argument("path")
+    load.add_argument("--format", choices=MEDIA_TYPES)
+    load.add_argument("--batch-size", type=int, default=settings.transfer_batch_size)
+    # Opcional: códigos de outro sistema não vêm do alocador, e avançar a
+    # sequência até eles poderia esgotar o espaço de códigos.
+    load.add_argument(
+        "--sequence-bound",
+        type=int,
+        help="limite da sequência na origem, informado pela exportação; avança"
+        " a sequência além dos códigos importados abaixo dele",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    if args.command == "export":
+        asyncio.run(run(args))
+        return
+
+    with open(args.path, newline="") as lines:
+        asyncio.run(run(args, lines))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,28 @@
-# antiga implementação, incoerente com a proposta mas útil para outros casos
+from datetime import datetime
+from hashlib import sha256
+from urllib.parse import urlsplit, urlunsplit
 
-# import random
-# import string
 
-# base62_chars = string.digits + string.ascii_letters
+def normalize_url(url: str) -> str:
+    """Esquema e host não diferenciam maiúsculas; o restante da URL é mantido."""
+    parts = urlsplit(url.strip())
+    userinfo, at, host = parts.netloc.rpartition("@")
+    return urlunsplit(
+        parts._replace(
+            scheme=parts.scheme.lower(), netloc=f"{userinfo}{at}{host.lower()}"
+        )
+    )
 
-# def generate_short_code():
-#     length = random.randint(2, 9)
-#     return "".join(random.choice(base62_chars) for _ in range(length))
 
-from uuid import UUID
-import base62
+def hash_url(url: str) -> str:
+    return sha256(normalize_url(url).encode()).hexdigest()
 
-def generate_short_code(url_uuid: UUID):
-    uuid_to_int = int(url_uuid)
-    short_code = base62.encode(uuid_to_int)
-    return short_code[:7]
+
+def parse_local_datetime(value: str | None) -> datetime | None:
+    """Data ISO 8601 no horário local sem fuso, como created_at."""
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
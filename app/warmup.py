@@ -0,0 +1,140 @@
+"""Aquecimento do cache do Redis com as URLs mais acessadas e mais recentes.
+
+Roda no startup do app (ver `lifespan` em app/main.py) e também fora dele, por
+exemplo depois de um restart do Redis:
+
+    uv run python -m app.warmup --rows 100000 --seconds 60
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import os
+from datetime import datetime, timedelta
+from time import monotonic
+from typing import AsyncIterator
+
+from redis.exceptions import RedisError
+from sqlalchemy import func, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .cache import close_cache, redis_breaker, redis_client, set_cached_many
+from .database import async_engine, stream_partitions
+from .models import Url, UrlClicks
+from .redirects import RedirectTarget
+from .settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+# Com vários workers, só o primeiro a subir aquece o cache.
+WARMUP_LOCK_KEY = "cache-warmup"
+
+
+def warmup_statement(since: datetime, max_rows: int):
+    """Até `max_rows` URLs, pelos cliques desde `since` e, depois, as mais novas."""
+    recent_clicks = (
+        select(UrlClicks.short_code, func.sum(UrlClicks.clicks).label("clicks"))
+        .where(UrlClicks.bucket >= since)
+        .group_by(UrlClicks.short_code)
+        .subquery()
+    )
+    # Links com expiração entram com o TTL limitado a ela (ver cache_ttl_for).
+    return (
+        select(
+            Url.short_code, Url.long_url, Url.created_at, Url.expires_at, Url.cacheable
+        )
+        .outerjoin(recent_clicks, recent_clicks.c.short_code == Url.short_code)
+        .where(or_(Url.expires_at.is_(None), Url.expires_at > datetime.now()))
+        .order_by(
+            func.coalesce(recent_clicks.c.clicks, 0).desc(), Url.created_at.desc()
+        )
+        .limit(max_rows)
+    )
+
+
+async def stream_warmup_batches(
+    max_rows: int, batch_size: int
+) -> AsyncIterator[dict[str, tuple[str, datetime | None]]]:
+    since = datetime.now() - timedelta(hours=settings.warmup_window_hours)
+    async for rows in stream_partitions(warmup_statement(since, max_rows), batch_size):
+        yield {
+            short_code: (
+                RedirectTarget.from_fields(
+                    long_url, created_at, expires_at, cacheable
+                ).encode(),
+                expires_at,
+            )
+            for short_code, long_url, created_at, expires_at, cacheable in rows
+        }
+
+
+async def warm_cache(max_rows: int, max_seconds: float, batch_size: int) -> int:
+    """Carrega até `max_rows` URLs no Redis em até `max_seconds` segundos."""
+    start = monotonic()
+    warmed = 0
+    try:
+        async with asyncio.timeout(max_seconds):
+            async for batch in stream_warmup_batches(max_rows, batch_size):
+                # Só no Redis: o cache local do worker se aquece com o tráfego.
+                await set_cached_many(batch, local=False)
+                warmed += len(batch)
+    except TimeoutError:
+        logger.warning("Cache warm-up stopped after %.0fs budget", max_seconds)
+    except (SQLAlchemyError, RedisError, OSError) as e:
+        logger.error("Error warming cache: %s", e)
+
+    logger.info("Cache warm-up loaded %d URLs in %.1fs", warmed, monotonic() - start)
+    return warmed
+
+
+async def warm_cache_on_startup() -> None:
+    if not settings.warmup_enabled:
+        return
+
+    try:
+        async with redis_breaker:
+            acquired = await redis_client.set(
+                WARMUP_LOCK_KEY,
+                os.getpid(),
+                nx=True,
+                ex=math.ceil(settings.warmup_max_seconds),
+            )
+    except RedisError as e:
+        logger.error("Error accessing Redis: %s", e)
+        return
+
+    if not acquired:
+        logger.info("Cache warm-up already running in another worker")
+        return
+
+    await warm_cache(
+        settings.warmup_max_rows,
+        settings.warmup_max_seconds,
+        settings.warmup_batch_size,
+    )
+
+
+async def run(args: argparse.Namespace) -> None:
+    try:
+        await warm_cache(args.rows, args.seconds, args.batch_size)
+    finally:
+        await close_cache()
+        await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=settings.warmup_max_rows)
+    parser.add_argument("--seconds", type=float, default=settings.warmup_max_seconds)
+    parser.add_argument("--batch-size", type=int, default=settings.warmup_batch_size)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
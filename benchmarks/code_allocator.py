@@ -0,0 +1,52 @@
+"""Vazão do alocador de códigos curtos (códigos/s), sem banco de dados.
+
+A reserva de blocos é simulada em memória, então o número mede apenas o custo
+local por código: Feistel + base62 + contabilidade do bloco.
+
+    uv run python -m benchmarks.code_allocator --codes 1000000
+"""
+
+import argparse
+import asyncio
+import itertools
+import time
+
+from app.codes import ShortCodeAllocator
+
+
+class BlockSequence:
+    """Imita `SELECT nextval('short_code_seq')` com INCREMENT BY block_size."""
+
+    def __init__(self, block_size: int):
+        self._starts = itertools.count(0, block_size)
+        self.calls = 0
+
+    async def scalar(self, _statement) -> int:
+        self.calls += 1
+        return next(self._starts)
+
+
+async def run(args: argparse.Namespace) -> None:
+    allocator = ShortCodeAllocator("benchmark", args.block_size)
+    sequence = BlockSequence(args.block_size)
+
+    start = time.perf_counter()
+    for _ in range(args.codes):
+        await allocator.allocate(sequence)
+    elapsed = time.perf_counter() - start
+
+    print(f"codes:        {args.codes}")
+    print(f"block size:   {args.block_size}")
+    print(f"db calls:     {sequence.calls}")
+    print(f"codes/s:      {args.codes / elapsed:.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--codes", type=int, default=1_000_000)
+    parser.add_argument("--block-size", type=int, default=1024)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Latência (p50/p99) de redirecionamentos com cache hit, em processo.
+
+Chama o app ASGI diretamente, sem servidor HTTP nem rede, com o cache
+substituído por um valor fixo; mede apenas o custo do framework e do handler.
+
+    uv run python -m benchmarks.redirect_latency --requests 20000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+from app.main import app
+
+LONG_URL = "https://example.com/some/long/path?utm_source=benchmark"
+
+
+async def cached(_key):
+    return LONG_URL
+
+
+def make_scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 8000),
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def run(args: argparse.Namespace) -> None:
+    status = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    scope = make_scope("/abc1234")
+    latencies = []
+    with patch("app.main.get_cached_code", cached):
+        for _ in range(args.warmup):
+            await app(dict(scope), receive, send)
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            await app(dict(scope), receive, send)
+            latencies.append(time.perf_counter() - start)
+
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"requests:  {args.requests}")
+    print(f"statuses:  {sorted(set(status))}")
+    print(f"p50 (us):  {cuts[49] * 1e6:.1f}")
+    print(f"p99 (us):  {cuts[98] * 1e6:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--warmup", type=int, default=1_000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
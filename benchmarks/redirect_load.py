@@ -0,0 +1,83 @@
+"""Carga de redirecionamentos contra uma instância rodando da API.
+
+Cria `--codes` URLs via POST /shorten e dispara `--requests` redirecionamentos
+com `--concurrency` requisições simultâneas, reportando redirects/s e latências.
+
+Para comparar antes/depois, rode contra o mesmo Postgres/Redis:
+
+    git checkout <commit-antigo> && uv run uvicorn app.main:app --port 8000
+    uv run python benchmarks/redirect_load.py --concurrency 200
+
+    git checkout <commit-novo> && uv run uvicorn app.main:app --port 8000
+    uv run python benchmarks/redirect_load.py --concurrency 200
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from http import HTTPStatus
+
+import httpx
+
+
+async def seed_codes(client: httpx.AsyncClient, total: int) -> list[str]:
+    codes = []
+    for i in range(total):
+        response = await client.post(
+            "/shorten", json={"url": f"https://example.com/bench/{i}"}
+        )
+        response.raise_for_status()
+        codes.append(response.json()["short_code"])
+    return codes
+
+
+async def run(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits) as client:
+        codes = await seed_codes(client, args.codes)
+
+        # Aquece o cache para medir apenas o caminho de cache hit.
+        for code in codes:
+            await client.get(f"/{code}", follow_redirects=False)
+
+        latencies: list[float] = []
+        errors = 0
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def hit(code: str) -> None:
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f"/{code}", follow_redirects=False)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != HTTPStatus.FOUND:
+                    errors += 1
+
+        targets = [random.choice(codes) for _ in range(args.requests)]
+        start = time.perf_counter()
+        await asyncio.gather(*(hit(code) for code in targets))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"requests:     {args.requests}")
+    print(f"concurrency:  {args.concurrency}")
+    print(f"errors:       {errors}")
+    print(f"redirects/s:  {args.requests / elapsed:.0f}")
+    print(f"p50 (ms):     {quantiles[49] * 1000:.2f}")
+    print(f"p99 (ms):     {quantiles[98] * 1000:.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--codes", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
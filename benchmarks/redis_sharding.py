@@ -0,0 +1,121 @@
+"""Escalonamento da vazão do cache de redirecionamentos de 1 a N nós Redis.
+
+Para cada quantidade de nós (os primeiros n de `--nodes`), grava `--keys`
+códigos no anel e dispara GETs roteados por hashing consistente, como faz
+`get_cached_code`, de `--clients` processos durante `--duration` segundos.
+Mede só a camada Redis (sem o app nem o cache local): é ela que deixa de
+caber em um nó. Um único cliente Python satura antes do Redis; mantenha
+`--clients` alto o bastante para que os nós sejam o gargalo.
+
+Também mostra a fração de chaves que muda de nó a cada nó adicionado (o ideal
+é 1/n); `--ring-only` mostra só isso, sem precisar de Redis.
+
+    for port in 6379 6380 6381 6382; do redis-server --port $port --save '' & done
+    uv run python -m benchmarks.redis_sharding \\
+        --nodes redis://localhost:6379/0 redis://localhost:6380/0 \\
+                redis://localhost:6381/0 redis://localhost:6382/0
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import time
+
+from app.breaker import CircuitBreaker
+from app.sharding import HashRing, ShardedRedis
+
+
+def connect(nodes: list[str], args) -> ShardedRedis:
+    return ShardedRedis(
+        nodes,
+        args.virtual_nodes,
+        lambda: CircuitBreaker(5, 5.0),
+        max_connections=args.concurrency,
+        decode_responses=True,
+        protocol=3,
+    )
+
+
+def keys_for(total: int) -> list[str]:
+    # Prefixo próprio: não colide com os códigos do app se os nós forem os do .env.
+    return [f"bench:sharding:{i}" for i in range(total)]
+
+
+def moved_share(nodes: list[str], keys: list[str], virtual_nodes: int) -> float:
+    """Fração das chaves que muda de nó quando o último de `nodes` entra."""
+    before = HashRing(nodes[:-1], virtual_nodes)
+    after = HashRing(nodes, virtual_nodes)
+    return sum(before.node_for(k) != after.node_for(k) for k in keys) / len(keys)
+
+
+async def seed(nodes: list[str], keys: list[str], args) -> None:
+    shards = connect(nodes, args)
+    try:
+        for start in range(0, len(keys), 10_000):
+            pipe = shards.pipeline()
+            for key in keys[start : start + 10_000]:
+                pipe.keyed("set", key, f"https://example.com/{key}")
+            await pipe.execute()
+    finally:
+        await shards.close()
+
+
+async def hammer(nodes, keys, args, seed_value) -> int:
+    shards = connect(nodes, args)
+    rng = random.Random(seed_value)
+    done = 0
+    deadline = time.monotonic() + args.duration
+
+    async def worker():
+        nonlocal done
+        while time.monotonic() < deadline:
+            key = rng.choice(keys)
+            await shards.node_for(key).client.get(key)
+            done += 1
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    finally:
+        await shards.close()
+    return done
+
+
+def client_process(job) -> int:
+    return asyncio.run(hammer(*job))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--nodes", nargs="+", default=["redis://localhost:6379/0"], metavar="URL"
+    )
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=os.cpu_count())
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--virtual-nodes", type=int, default=160)
+    parser.add_argument("--ring-only", action="store_true", help="só o remapeamento")
+    args = parser.parse_args()
+
+    keys = keys_for(args.keys)
+    baseline = None
+    for n in range(1, len(args.nodes) + 1):
+        nodes = args.nodes[:n]
+        line = f"nodes={n:<3}"
+        if n > 1:
+            moved = moved_share(nodes, keys, args.virtual_nodes)
+            line += f" moved={moved:6.1%} (ideal {1 / n:6.1%})"
+        if not args.ring_only:
+            asyncio.run(seed(nodes, keys, args))
+            jobs = [(nodes, keys, args, i) for i in range(args.clients)]
+            with multiprocessing.Pool(args.clients) as pool:
+                ops = sum(pool.map(client_process, jobs)) / args.duration
+            baseline = baseline or ops
+            line += f"  {ops:>10.0f} GETs/s  {ops / baseline:.2f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
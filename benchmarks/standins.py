@@ -0,0 +1,155 @@
+"""Substitutos em memória de Redis e Postgres para rodar o harness sem serviços.
+
+Implementam apenas o que o app usa, contando as idas ao "servidor" do mesmo
+jeito que o harness conta no modo real: um comando avulso ou um pipeline
+executado valem uma chamada.
+"""
+
+from time import monotonic
+from unittest.mock import patch
+
+from app.storage import MemoryStorage
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self._redis = redis
+        self._commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._commands.clear()
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        self._redis.calls += 1
+        return [
+            getattr(self._redis, f"_{name}")(*args, **kwargs)
+            for name, args, kwargs in self._commands
+        ]
+
+
+class FakeRedis:
+    def __init__(self):
+        self._data: dict[str, tuple[float | None, str]] = {}
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self.calls = 0
+
+    def _get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at <= monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def _set(self, key, value, ex=None):
+        self._data[key] = (monotonic() + ex if ex else None, value)
+        return True
+
+    def _delete(self, *keys):
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def _publish(self, channel, message):
+        return 0
+
+    async def get(self, key):
+        self.calls += 1
+        return self._get(key)
+
+    async def mget(self, keys):
+        self.calls += 1
+        return [self._get(key) for key in keys]
+
+    async def set(self, key, value, ex=None):
+        self.calls += 1
+        return self._set(key, value, ex)
+
+    async def delete(self, *keys):
+        self.calls += 1
+        return self._delete(*keys)
+
+    async def publish(self, channel, message):
+        self.calls += 1
+        return 0
+
+    async def evalsha(self, sha, numkeys, key, rate, burst):
+        # Só o script do rate limiting roda no app: o token bucket dele.
+        self.calls += 1
+        now = monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        retry_after = 0 if tokens >= 1 else (1 - tokens) / rate
+        self._buckets[key] = (tokens - 1 if tokens >= 1 else tokens, now)
+        return str(retry_after)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def aclose(self):
+        pass
+
+
+class InMemoryDatabase(MemoryStorage):
+    """O MemoryStorage do app, contando cada operação como uma ida ao banco."""
+
+    def __init__(self):
+        super().__init__("benchmark")
+        self.calls = 0
+
+    async def get_by_code(self, short_code):
+        self.calls += 1
+        return await super().get_by_code(short_code)
+
+    async def get_by_digests(self, digests):
+        self.calls += 1
+        return await super().get_by_digests(digests)
+
+    async def create_many(self, urls, expires_at=None, cacheable=True):
+        self.calls += 1
+        return await super().create_many(urls, expires_at, cacheable)
+
+    async def count_short_codes(self) -> int:
+        self.calls += 1
+        return len(self.by_code)
+
+    async def stream_short_codes(self):
+        self.calls += 1
+        for code in list(self.by_code):
+            yield code
+
+
+def install_standins(app, fake_redis=True):
+    """Troca Redis e Postgres do app pelos substitutos; retorna (db, redis, patches).
+
+    Com `fake_redis=False` só o banco é substituído (redis é None).
+    """
+    from app.cache import redis_shards
+
+    database = InMemoryDatabase()
+    redis = FakeRedis() if fake_redis else None
+
+    patches = [
+        patch("app.main.url_storage", database),
+        patch("app.bloom.count_short_codes", database.count_short_codes),
+        patch("app.bloom.stream_short_codes", database.stream_short_codes),
+    ]
+    if redis is not None:
+        # Um único substituto para todos os nós: o harness mede o app, não o anel.
+        patches += [
+            patch("app.cache.redis_client", redis),
+            *(patch.object(node, "client", redis) for node in redis_shards.nodes),
+        ]
+    for p in patches:
+        p.start()
+    return database, redis, patches
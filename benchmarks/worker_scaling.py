@@ -0,0 +1,108 @@
+"""Escalonamento da vazão de redirecionamentos de 1 a N workers.
+
+Para cada valor de `--workers`, sobe `python -m app.server` com WEB_WORKERS=n
+contra o Postgres/Redis do .env e dispara redirecionamentos de `--clients`
+processos geradores de carga durante `--duration` segundos. O gerador roda na
+mesma máquina e disputa CPU com o servidor: mantenha `--clients` fixo entre as
+medições e deixe núcleos livres para ele (ex.: até metade dos CPUs em workers).
+
+    uv run python -m benchmarks.worker_scaling --workers 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def wait_until_ready(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/metrics", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start in time")
+
+
+def seed(base_url: str, total: int) -> list[str]:
+    urls = [f"https://example.com/scaling/{i}" for i in range(total)]
+    response = httpx.post(f"{base_url}/shorten/bulk", json=urls, timeout=60)
+    response.raise_for_status()
+    return [json.loads(line)["short_code"] for line in response.text.splitlines()]
+
+
+async def hammer(base_url, codes, duration, concurrency, seed_value) -> int:
+    rng = random.Random(seed_value)
+    done = 0
+    deadline = time.monotonic() + duration
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=httpx.Limits(max_connections=concurrency)
+    ) as client:
+
+        async def worker():
+            nonlocal done
+            while time.monotonic() < deadline:
+                await client.get(f"/{rng.choice(codes)}", follow_redirects=False)
+                done += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done
+
+
+def client_process(args) -> int:
+    return asyncio.run(hammer(*args))
+
+
+def measure(args, workers: int, codes: list[str] | None) -> tuple[float, list[str]]:
+    env = {**os.environ, "WEB_WORKERS": str(workers), "WEB_PORT": str(args.port)}
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen([sys.executable, "-m", "app.server"], env=env)
+    try:
+        wait_until_ready(base_url)
+        codes = codes or seed(base_url, args.codes)
+        # Aquece os caches de todos os workers antes de medir.
+        asyncio.run(hammer(base_url, codes, 2, args.concurrency, 0))
+
+        jobs = [
+            (base_url, codes, args.duration, args.concurrency, i)
+            for i in range(args.clients)
+        ]
+        with multiprocessing.Pool(args.clients) as pool:
+            total = sum(pool.map(client_process, jobs))
+        return total / args.duration, codes
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()])
+    parser.add_argument("--clients", type=int, default=max(1, os.cpu_count() // 2))
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--codes", type=int, default=2_000)
+    parser.add_argument("--port", type=int, default=8077)
+    args = parser.parse_args()
+
+    codes = None
+    baseline = None
+    for workers in args.workers:
+        rps, codes = measure(args, workers, codes)
+        baseline = baseline or rps
+        print(f"workers={workers:<3} {rps:>10.0f} redirects/s  {rps / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
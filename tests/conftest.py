@@ -0,0 +1,15 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+
+@pytest.fixture
+def mock_session_factory():
+    """Build a session factory whose `async with` yields the given session."""
+
+    def build(session):
+        factory = MagicMock()
+        factory.return_value.__aenter__.return_value = session
+        return factory
+
+    return build
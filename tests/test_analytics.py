@@ -0,0 +1,149 @@
+from datetime import datetime
+from http import HTTPStatus
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..app.analytics import ClickRecorder
+from ..app.database import get_session
+from ..app.main import app, settings
+from ..app.models import UrlClicks
+
+
+class TestClickRecorder:
+    """Tests for the in-memory click aggregation."""
+
+    def test_record_aggregates_by_code_and_minute(self):
+        """Test that clicks in the same minute collapse into one counter."""
+        recorder = ClickRecorder(flush_interval=60, flush_threshold=100)
+
+        with patch("app.analytics.time", return_value=120.5):
+            recorder.record("abc123")
+            recorder.record("abc123")
+            recorder.record("xyz789")
+
+        assert recorder._pending == {("abc123", 2): 2, ("xyz789", 2): 1}
+
+    def test_threshold_wakes_flusher(self):
+        """Test that reaching the threshold signals an early flush."""
+        recorder = ClickRecorder(flush_interval=60, flush_threshold=2)
+
+        recorder.record("abc123")
+        assert not recorder._wake.is_set()
+        recorder.record("abc123")
+        assert recorder._wake.is_set()
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_one_bulk_upsert(self, mock_session_factory):
+        """Test that a flush issues a single statement with all counters."""
+        recorder = ClickRecorder(flush_interval=60, flush_threshold=100)
+        session = AsyncMock(spec=AsyncSession)
+
+        with patch("app.analytics.time", return_value=120.0):
+            for _ in range(3):
+                recorder.record("abc123")
+            recorder.record("xyz789")
+
+        with patch("app.analytics.AsyncSessionLocal", mock_session_factory(session)):
+            await recorder.flush()
+
+        session.execute.assert_awaited_once()
+        rows = session.execute.await_args.args[1]
+        assert [(r["short_code"], r["clicks"]) for r in rows] == [
+            ("abc123", 3),
+            ("xyz789", 1),
+        ]
+        session.commit.assert_awaited_once()
+        assert not recorder._pending
+
+    @pytest.mark.asyncio
+    async def test_unreachable_database_keeps_clicks(self, mock_session_factory):
+        """Test that a refused connection requeues the counters for a retry."""
+        recorder = ClickRecorder(flush_interval=60, flush_threshold=100)
+        session = AsyncMock(spec=AsyncSession)
+        session.execute.side_effect = ConnectionRefusedError("db down")
+
+        with patch("app.analytics.time", return_value=120.0):
+            recorder.record("abc123")
+        with patch("app.analytics.AsyncSessionLocal", mock_session_factory(session)):
+            await recorder.flush()
+
+        assert recorder._pending == {("abc123", 2): 1}
+
+
+class TestUrlStatsEndpoint:
+    """Tests for GET /{short_code}/stats endpoint."""
+
+    def test_stats_returns_aggregates(self):
+        """Test that stats return the total and per-minute buckets."""
+        bucket = datetime.now().replace(second=0, microsecond=0)
+        mock_session = AsyncMock(spec=AsyncSession)
+        mock_session.scalar.return_value = 7
+        mock_session.scalars.return_value = [
+            UrlClicks(short_code="abc123", bucket=bucket, clicks=7)
+        ]
+
+        async def override_get_session():
+            yield mock_session
+
+        app.dependency_overrides[get_session] = override_get_session
+
+        with patch("app.main.url_storage.get_by_code", return_value=MagicMock()):
+            response = TestClient(app).get("/abc123/stats")
+
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert data["total_clicks"] == 7
+        assert data["buckets"][0]["clicks"] == 7
+
+        app.dependency_overrides.clear()
+
+    def test_stats_unknown_code(self):
+        """Test that stats for an unknown code return 404."""
+        mock_session = AsyncMock(spec=AsyncSession)
+
+        async def override_get_session():
+            yield mock_session
+
+        app.dependency_overrides[get_session] = override_get_session
+
+        with patch(
+            "app.main.url_storage.get_by_code", return_value=None
+        ) as mock_get_by_code:
+            response = TestClient(app).get("/nonexistent/stats")
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        mock_get_by_code.assert_awaited_once_with("nonexistent")
+        mock_session.scalar.assert_not_awaited()
+
+        app.dependency_overrides.clear()
+
+    @pytest.mark.parametrize(
+        "minutes", [0, -5, settings.analytics_stats_max_minutes + 1, 10**12]
+    )
+    def test_stats_rejects_out_of_range_window(self, minutes):
+        """Test that a window outside 1..analytics_stats_max_minutes returns 422."""
+        response = TestClient(app).get(f"/abc123/stats?minutes={minutes}")
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    @pytest.mark.parametrize("minutes", [1, settings.analytics_stats_max_minutes])
+    def test_stats_accepts_window_bounds(self, minutes):
+        """Test that the smallest and largest windows are accepted."""
+        mock_session = AsyncMock(spec=AsyncSession)
+        mock_session.scalar.return_value = 0
+        mock_session.scalars.return_value = []
+
+        async def override_get_session():
+            yield mock_session
+
+        app.dependency_overrides[get_session] = override_get_session
+
+        with patch("app.main.url_storage.get_by_code", return_value=MagicMock()):
+            response = TestClient(app).get(f"/abc123/stats?minutes={minutes}")
+
+        assert response.status_code == HTTPStatus.OK
+
+        app.dependency_overrides.clear()
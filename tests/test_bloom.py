@@ -0,0 +1,211 @@
+import asyncio
+from http import HTTPStatus
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ..app.bloom import BloomFilter, CodeIndex
+from ..app.codes import ShortCodeAllocator
+from ..app.main import app
+
+
+def codes(start, stop):
+    allocator = ShortCodeAllocator("test", 1024)
+    return [allocator.encode_id(i) for i in range(start, stop)]
+
+
+async def fake_stream(items):
+    for item in items:
+        yield item
+
+
+def make_index(existing):
+    index = CodeIndex(capacity=1000, error_rate=0.01, rebuild_interval=60)
+    stream = patch(
+        "app.bloom.stream_short_codes", side_effect=lambda: fake_stream(existing)
+    )
+    count = patch("app.bloom.count_short_codes", return_value=len(existing))
+    return index, stream, count
+
+
+class TestBloomFilter:
+    """Tests for the probabilistic membership filter."""
+
+    def test_added_keys_are_always_found(self):
+        """Test that the filter has no false negatives."""
+        bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+        members = codes(0, 10_000)
+        for code in members:
+            bloom.add(code)
+
+        assert all(code in bloom for code in members)
+        assert bloom.count == len(members)
+
+    def test_false_positive_rate_matches_configuration(self):
+        """Test that unknown keys are rejected at roughly the configured rate."""
+        bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+        for code in codes(0, 10_000):
+            bloom.add(code)
+
+        false_positives = sum(code in bloom for code in codes(10_000, 30_000))
+
+        assert false_positives / 20_000 < 0.02
+
+    def test_size_follows_capacity_and_error_rate(self):
+        """Test that memory use is derived from capacity and error rate."""
+        loose = BloomFilter(capacity=100_000, error_rate=0.05)
+        strict = BloomFilter(capacity=100_000, error_rate=0.001)
+
+        # ~9.6 bits per element at 1%; fewer at 5%, more at 0.1%.
+        assert loose.nbytes < BloomFilter(100_000, 0.01).nbytes < strict.nbytes
+        assert 110_000 < BloomFilter(100_000, 0.01).nbytes < 130_000
+
+
+class TestCodeIndex:
+    """Tests for the rebuild and readiness rules of the short code index."""
+
+    def test_not_ready_index_never_rejects(self):
+        """Test that lookups fall through to the database before a rebuild."""
+        index = CodeIndex(capacity=1000, error_rate=0.01, rebuild_interval=60)
+
+        assert index.might_exist("missing")
+        assert index.rejections == 0
+
+    @pytest.mark.asyncio
+    async def test_rebuild_loads_existing_codes(self):
+        """Test that a rebuild after subscribing rejects unknown codes."""
+        existing = codes(0, 100)
+        index, stream, count = make_index(existing)
+        index.start_listening()
+
+        with stream, count:
+            await index.rebuild()
+
+        assert index.ready
+        assert all(index.might_exist(code) for code in existing)
+        assert not index.might_exist("zzzzzzz")
+        assert index.rejections == 1
+
+    @pytest.mark.asyncio
+    async def test_rebuild_without_announcements_stays_open(self):
+        """Test that the index is not trusted until the channel is subscribed."""
+        index, stream, count = make_index(codes(0, 10))
+
+        with stream, count:
+            await index.rebuild()
+
+        assert not index.ready
+        assert index.might_exist("zzzzzzz")
+
+    @pytest.mark.asyncio
+    async def test_losing_channel_during_rebuild_keeps_index_open(self):
+        """Test that announcements lost mid-rebuild prevent rejecting codes."""
+        index = CodeIndex(capacity=1000, error_rate=0.01, rebuild_interval=60)
+        index.start_listening()
+
+        async def stream():
+            yield "aaaaaaa"
+            index.invalidate()
+            yield "bbbbbbb"
+
+        with (
+            patch("app.bloom.stream_short_codes", side_effect=stream),
+            patch("app.bloom.count_short_codes", return_value=2),
+        ):
+            await index.rebuild()
+
+        assert not index.ready
+
+    @pytest.mark.asyncio
+    async def test_codes_added_during_rebuild_are_kept(self):
+        """Test that codes announced while rebuilding reach the new filter."""
+        index = CodeIndex(capacity=1000, error_rate=0.01, rebuild_interval=60)
+        index.start_listening()
+
+        async def stream():
+            yield "aaaaaaa"
+            index.add("bbbbbbb")
+
+        with (
+            patch("app.bloom.stream_short_codes", side_effect=stream),
+            patch("app.bloom.count_short_codes", return_value=1),
+        ):
+            await index.rebuild()
+
+        assert index.might_exist("bbbbbbb")
+
+    @pytest.mark.asyncio
+    async def test_new_epoch_stops_rejecting(self):
+        """Test that an epoch bumped by another worker reopens the index."""
+        index, stream, count = make_index(codes(0, 10))
+        index.start_listening("1")
+
+        with stream, count:
+            await index.rebuild()
+        index.observe_epoch("1")
+        assert index.ready
+
+        index.observe_epoch("2")
+        assert not index.ready
+        assert index.might_exist("zzzzzzz")
+
+    @pytest.mark.asyncio
+    async def test_reconnects_do_not_rebuild_back_to_back(self):
+        """Test that rebuilds are spaced by the minimum interval."""
+        index = CodeIndex(
+            capacity=1000, error_rate=0.01, rebuild_interval=60, min_rebuild_interval=60
+        )
+        index.start_listening()
+
+        with patch.object(index, "rebuild") as rebuild:
+            runner = asyncio.create_task(index.run())
+            await asyncio.sleep(0.01)
+            index.invalidate()
+            index.start_listening()
+            await asyncio.sleep(0.01)
+            runner.cancel()
+
+        rebuild.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_unreachable_database_does_not_stop_rebuilds(self):
+        """Test that a connection error during a rebuild keeps the loop alive."""
+        index = CodeIndex(capacity=1000, error_rate=0.01, rebuild_interval=60)
+        index.start_listening()
+
+        with patch.object(
+            index, "rebuild", side_effect=ConnectionRefusedError("db down")
+        ) as rebuild:
+            runner = asyncio.create_task(index.run())
+            await asyncio.sleep(0.01)
+            assert not runner.done()
+            runner.cancel()
+
+        rebuild.assert_awaited_once()
+        assert not index.ready
+
+
+class TestGetUrlWithCodeIndex:
+    """Tests for GET /{short_code} with a ready code index."""
+
+    @pytest.mark.asyncio
+    async def test_unknown_code_skips_database(self):
+        """Test that a code rejected by the index returns 404 without a query."""
+        index, stream, count = make_index(codes(0, 100))
+        index.start_listening()
+        with stream, count:
+            await index.rebuild()
+
+        session_factory = MagicMock()
+        with (
+            patch("app.main.code_index", index),
+            patch("app.main.get_cached_code", return_value=None),
+            patch("app.database.AsyncSessionLocal", session_factory),
+            patch("app.main.set_negative_cache") as mock_negative,
+        ):
+            response = TestClient(app).get("/zzzzzzz", follow_redirects=False)
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        session_factory.assert_not_called()
+        mock_negative.assert_not_called()
@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+import pytest
+from redis.exceptions import ConnectionError, ResponseError
+
+from ..app.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+async def fail(breaker, error=ConnectionError("down")):
+    with pytest.raises(type(error)):
+        async with breaker:
+            raise error
+
+
+async def succeed(breaker):
+    async with breaker:
+        pass
+
+
+class TestCircuitBreaker:
+    """Tests for the Redis circuit breaker state machine."""
+
+    @pytest.mark.asyncio
+    async def test_opens_after_consecutive_failures(self):
+        """Test that the circuit opens at the threshold and then fails fast."""
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=5)
+
+        for _ in range(3):
+            await fail(breaker)
+
+        assert breaker.state == OPEN
+        assert breaker.trips == 1
+        with pytest.raises(CircuitOpenError):
+            await succeed(breaker)
+        assert breaker.rejected == 1
+
+    @pytest.mark.asyncio
+    async def test_success_resets_failure_count(self):
+        """Test that only consecutive failures trip the circuit."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5)
+
+        await fail(breaker)
+        await succeed(breaker)
+        await fail(breaker)
+
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_command_errors_do_not_trip(self):
+        """Test that an error reply proves Redis is up and does not count."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5)
+
+        await fail(breaker, ResponseError("WRONGTYPE"))
+
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_half_open_allows_a_single_probe(self):
+        """Test that after the reset timeout one call probes Redis at a time."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5)
+        with patch("app.breaker.monotonic", return_value=100):
+            await fail(breaker)
+
+        with patch("app.breaker.monotonic", return_value=106):
+            assert breaker.allow()
+            assert breaker.state == HALF_OPEN
+            assert not breaker.allow()
+
+            breaker.record_success()
+
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    @pytest.mark.asyncio
+    async def test_failed_probe_reopens(self):
+        """Test that a failing probe keeps the circuit open for another timeout."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5)
+        with patch("app.breaker.monotonic", return_value=100):
+            await fail(breaker)
+
+        with patch("app.breaker.monotonic", return_value=106):
+            await fail(breaker)
+            assert breaker.state == OPEN
+            assert not breaker.allow()
+
+        with patch("app.breaker.monotonic", return_value=111):
+            assert breaker.allow()
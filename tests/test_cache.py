@@ -0,0 +1,305 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import pytest
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError
+
+from ..app import cache
+from ..app.cache import (
+    NOT_FOUND,
+    cache_ttl_for,
+    cache_urls,
+    digest_key,
+    get_cached_code,
+    jittered_ttl,
+    listen_invalidations,
+    set_cached_data,
+    sync_code_index_epoch,
+)
+from ..app.models import Url
+from ..app.redirects import RedirectTarget
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    cache.local_cache.clear()
+    cache.cache_stats.__init__()
+    cache.redis_breaker.record_success()
+    yield
+    cache.local_cache.clear()
+    cache.code_index.announcements_lost = False
+
+
+class TestCacheLookups:
+    """Tests for the Redis-backed lookup path."""
+
+    def test_jittered_ttl_stays_within_bounds(self):
+        """Test that TTL jitter spreads expiries around the base TTL."""
+        ttls = {jittered_ttl(1000) for _ in range(200)}
+
+        assert len(ttls) > 1
+        assert all(900 <= ttl <= 1100 for ttl in ttls)
+
+    def test_ttl_never_outlives_link_expiry(self):
+        """Test that expiring links leave the cache no later than they expire."""
+        soon = datetime.now() + timedelta(seconds=120)
+
+        assert cache_ttl_for(None) > 3600
+        assert 110 <= cache_ttl_for(soon) <= 120
+        assert cache_ttl_for(datetime.now() - timedelta(seconds=1)) is None
+
+    @pytest.mark.asyncio
+    async def test_negative_entry_is_counted_and_not_stored_locally(self):
+        """Test that cached 404s count as negative hits and skip the local tier."""
+        with patch.object(cache.redis_client, "get", AsyncMock(return_value=NOT_FOUND)):
+            assert await get_cached_code("nonexistent") == NOT_FOUND
+
+        assert cache.cache_stats.negative_hits == 1
+        assert len(cache.local_cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_redis_hit_populates_local_tier(self):
+        """Test that a Redis hit is served locally on the next lookup."""
+        redis_get = AsyncMock(return_value="https://example.com")
+
+        with patch.object(cache.redis_client, "get", redis_get):
+            await get_cached_code("abc123")
+            assert await get_cached_code("abc123") == "https://example.com"
+
+        redis_get.assert_awaited_once()
+        assert cache.cache_stats.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_local_copy_expires_with_the_link(self):
+        """Test that a Redis hit is kept locally only until the link expires."""
+        now = datetime.now()
+        soon = RedirectTarget.from_fields(
+            "https://example.com", now, now + timedelta(seconds=5), True
+        ).encode()
+        gone = RedirectTarget.from_fields(
+            "https://example.com", now, now - timedelta(seconds=1), True
+        ).encode()
+
+        with (
+            patch.object(
+                cache.redis_client, "get", AsyncMock(side_effect=[soon, gone])
+            ),
+            patch.object(cache.local_cache, "set") as local_set,
+        ):
+            await get_cached_code("abc123")
+            await get_cached_code("xyz789")
+
+        [call] = local_set.call_args_list
+        assert call.args == ("abc123", soon)
+        assert 0 < call.kwargs["ttl"] <= 5
+
+
+class TestRedisOutage:
+    """Tests for degraded mode while Redis is unavailable."""
+
+    @pytest.mark.asyncio
+    async def test_write_failure_keeps_local_copy(self):
+        """Test that a failed Redis SET does not fail the redirect."""
+        redis_set = AsyncMock(side_effect=ConnectionError("down"))
+
+        with patch.object(cache.redis_client, "set", redis_set):
+            await set_cached_data("abc123", "https://example.com")
+
+        assert cache.local_cache.get("abc123") == "https://example.com"
+        assert cache.cache_stats.errors == 1
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_skips_redis(self):
+        """Test that lookups fail fast once the breaker has tripped."""
+        redis_get = AsyncMock(side_effect=ConnectionError("down"))
+
+        with patch.object(cache.redis_client, "get", redis_get):
+            for _ in range(cache.redis_breaker.failure_threshold + 3):
+                assert await get_cached_code("abc123") is None
+
+        assert cache.redis_breaker.state == "open"
+        assert redis_get.await_count == cache.redis_breaker.failure_threshold
+        assert cache.cache_stats.errors == cache.redis_breaker.failure_threshold
+
+
+def mock_pipeline(error=None):
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(side_effect=error)
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=pipe)
+    context.__aexit__ = AsyncMock(return_value=False)
+    return pipe, MagicMock(return_value=context)
+
+
+class TestWriteThrough:
+    """Tests for caching URLs at creation time."""
+
+    @staticmethod
+    def make_url(short_code):
+        return Url(
+            uuid=str(uuid4()),
+            long_url=f"https://example.com/{short_code}",
+            short_code=short_code,
+            long_url_digest=f"digest-{short_code}",
+            created_at=datetime.now(),
+        )
+
+    @pytest.mark.asyncio
+    async def test_created_urls_are_written_in_one_round_trip(self):
+        """Test that code, digest and announcement go through one pipeline."""
+        pipe, pipeline = mock_pipeline()
+        urls = [self.make_url("aaaaaaa"), self.make_url("bbbbbbb")]
+
+        with patch.object(cache.redis_client, "pipeline", pipeline):
+            await cache_urls(urls)
+
+        pipe.execute.assert_awaited_once()
+        written = [call.args[0] for call in pipe.set.call_args_list]
+        assert written == [
+            "aaaaaaa",
+            digest_key("digest-aaaaaaa"),
+            "bbbbbbb",
+            digest_key("digest-bbbbbbb"),
+        ]
+        assert pipe.publish.call_count == 2
+        target = RedirectTarget.decode(cache.local_cache.get("aaaaaaa"))
+        assert target.long_url == "https://example.com/aaaaaaa"
+        assert target.cacheable
+
+    @pytest.mark.asyncio
+    async def test_redis_failure_does_not_fail_creation(self):
+        """Test that a Redis error after the insert is logged and counted."""
+        _, pipeline = mock_pipeline(ConnectionError("down"))
+
+        with patch.object(cache.redis_client, "pipeline", pipeline):
+            await cache_urls([self.make_url("aaaaaaa")])
+
+        assert cache.cache_stats.errors == 1
+        assert cache.code_index.announcements_lost
+
+    @pytest.mark.asyncio
+    async def test_batch_ttls_never_outlive_links(self):
+        """Test that each key of a batch write is capped by its own expiry."""
+        pipe, pipeline = mock_pipeline()
+        now = datetime.now()
+
+        with patch.object(cache.redis_client, "pipeline", pipeline):
+            await cache.set_cached_many(
+                {
+                    "aaaaaaa": ("a", None),
+                    "bbbbbbb": ("b", now + timedelta(minutes=5)),
+                    "ccccccc": ("c", now - timedelta(seconds=1)),
+                },
+                local=False,
+            )
+
+        ttls = {call.args[0]: call.kwargs["ex"] for call in pipe.set.call_args_list}
+        assert set(ttls) == {"aaaaaaa", "bbbbbbb"}
+        assert ttls["aaaaaaa"] > 300
+        assert 0 < ttls["bbbbbbb"] <= 300
+
+    @pytest.mark.asyncio
+    async def test_expired_urls_are_not_cached(self):
+        """Test that a URL past its expiry is not written back to the cache."""
+        pipe, pipeline = mock_pipeline()
+        url = self.make_url("aaaaaaa")
+        url.expires_at = datetime.now() - timedelta(seconds=1)
+
+        with patch.object(cache.redis_client, "pipeline", pipeline):
+            await cache_urls([url])
+
+        pipe.set.assert_not_called()
+        assert cache.local_cache.get("aaaaaaa") is None
+
+
+def resp(*items):
+    """RESP3 push frame of bulk strings and integers."""
+    frame = f">{len(items)}\r\n"
+    for item in items:
+        if isinstance(item, int):
+            frame += f":{item}\r\n"
+        else:
+            frame += f"${len(item)}\r\n{item}\r\n"
+    return frame.encode()
+
+
+class FakePubSubServer:
+    """Just enough of a RESP3 server to subscribe and receive pushes."""
+
+    def __init__(self):
+        self.subscribes = 0
+        self.writers = []
+
+    async def handle(self, reader, writer):
+        self.writers.append(writer)
+        while line := await reader.readline():
+            args = []
+            for _ in range(int(line[1:])):
+                size = int((await reader.readline())[1:])
+                args.append((await reader.readexactly(size + 2))[:-2].decode())
+            command = args[0].upper()
+            if command == "HELLO":
+                writer.write(b"%1\r\n$5\r\nproto\r\n:3\r\n")
+            elif command == "SUBSCRIBE":
+                self.subscribes += 1
+                for i, channel in enumerate(args[1:], 1):
+                    writer.write(resp("subscribe", channel, i))
+            else:
+                writer.write(b"+OK\r\n")
+            await writer.drain()
+
+    def publish(self, channel, data):
+        for writer in self.writers:
+            writer.write(resp("message", channel, data))
+
+
+class TestInvalidationListener:
+    """Tests for the pub/sub listener against a live connection."""
+
+    @pytest.mark.asyncio
+    async def test_lost_announcement_bumps_epoch(self):
+        """Test that a failed announcement is reported through the epoch key."""
+        client = AsyncMock()
+        client.incr.return_value = 8
+        cache.code_index.announcements_lost = True
+
+        with (
+            patch.object(cache, "redis_client", client),
+            patch.object(cache.code_index, "observe_epoch") as observe_epoch,
+        ):
+            await sync_code_index_epoch()
+
+        client.incr.assert_awaited_once_with(cache.CODE_INDEX_EPOCH_KEY)
+        observe_epoch.assert_called_once_with("8")
+        assert not cache.code_index.announcements_lost
+
+    @pytest.mark.asyncio
+    async def test_idle_channel_is_not_a_disconnect(self):
+        """Test that silence longer than socket_timeout keeps the local tier."""
+        fake = FakePubSubServer()
+        server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = Redis(port=port, protocol=3, decode_responses=True, socket_timeout=0.1)
+        cache.local_cache.set("abc1234", "https://example.com")
+        cache.local_cache.set("xyz7890", "https://example.com/other")
+
+        with (
+            patch.object(cache, "redis_client", client),
+            patch.object(cache.code_index, "invalidate") as invalidate,
+        ):
+            listener = asyncio.create_task(listen_invalidations())
+            await asyncio.sleep(1)
+            fake.publish(cache.settings.cache_invalidation_channel, "abc1234")
+            await asyncio.sleep(0.2)
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+        await client.aclose()
+        server.close()
+        assert fake.subscribes == 1
+        invalidate.assert_not_called()
+        assert cache.local_cache.get("abc1234") is None
+        assert cache.local_cache.get("xyz7890") == "https://example.com/other"
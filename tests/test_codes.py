@@ -0,0 +1,74 @@
+import os
+import random
+from array import array
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..app.codes import (
+    CODE_LENGTH,
+    CODE_SPACE,
+    CodeSpaceExhausted,
+    ShortCodeAllocator,
+    decode_base62,
+    encode_base62,
+)
+
+PROOF_COUNT = int(os.getenv("CODE_PROOF_COUNT", "2000000"))
+
+
+@pytest.fixture
+def allocator():
+    return ShortCodeAllocator("test-secret", block_size=1024)
+
+
+class TestShortCodeAllocator:
+    """Tests for the block-based, Feistel-scrambled code allocator."""
+
+    def test_base62_is_fixed_width_and_reversible(self):
+        """Test that base62 encoding pads to CODE_LENGTH and round-trips."""
+        for value in (0, 1, 61, 62, CODE_SPACE - 1):
+            code = encode_base62(value)
+            assert len(code) == CODE_LENGTH
+            assert decode_base62(code) == value
+
+    def test_encode_is_a_bijection(self, allocator):
+        """Test that decoding a code recovers its ID over the whole space."""
+        rng = random.Random(0)
+        ids = [0, CODE_SPACE - 1] + [rng.randrange(CODE_SPACE) for _ in range(50_000)]
+
+        for value in ids:
+            assert allocator.decode_code(allocator.encode_id(value)) == value
+
+    def test_consecutive_ids_never_collide(self, allocator):
+        """Test that millions of consecutive IDs produce distinct codes."""
+        values = array(
+            "Q", (decode_base62(allocator.encode_id(i)) for i in range(PROOF_COUNT))
+        )
+        values = sorted(values)
+
+        assert all(a != b for a, b in zip(values, values[1:]))
+
+    def test_codes_are_not_sequential(self, allocator):
+        """Test that neighbouring IDs do not map to neighbouring codes."""
+        codes = [allocator.encode_id(i) for i in range(100)]
+
+        assert codes != sorted(codes)
+
+    def test_id_outside_code_space_is_rejected(self, allocator):
+        """Test that the allocator refuses IDs past 62**7."""
+        with pytest.raises(CodeSpaceExhausted):
+            allocator.encode_id(CODE_SPACE)
+
+    @pytest.mark.asyncio
+    async def test_allocate_reserves_one_block_per_block_size(self, allocator):
+        """Test that the sequence is hit once per block, not once per code."""
+        session = AsyncMock(spec=AsyncSession)
+        session.scalar.side_effect = [0, 1024]
+
+        codes = [await allocator.allocate(session) for _ in range(1025)]
+
+        assert session.scalar.await_count == 2
+        assert len(set(codes)) == 1025
+        assert codes[-1] == allocator.encode_id(1024)
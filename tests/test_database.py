@@ -0,0 +1,166 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..app import database
+from ..app.database import ReplicaRouter, read_first, stream_partitions
+from ..app.models import Url
+from ..app.storage import PostgresStorage
+
+
+def session_returning(row=None, error=None):
+    session = AsyncMock(spec=AsyncSession)
+    session.execute.return_value = MagicMock(first=MagicMock(return_value=row))
+    session.execute.side_effect = error
+    return session
+
+
+def session_streaming(*partitions, error=None):
+    """Session whose stream yields `partitions`, then raises `error` if given."""
+
+    async def rows():
+        for partition in partitions:
+            yield partition
+        if error is not None:
+            raise error
+
+    session = AsyncMock(spec=AsyncSession)
+    session.stream.return_value = MagicMock(partitions=rows)
+    return session
+
+
+class TestReplicaRouter:
+    """Tests for read-replica selection."""
+
+    def test_round_robin_skips_replicas_marked_down(self):
+        """Test that reads rotate over healthy replicas only."""
+        first, second, third = MagicMock(), MagicMock(), MagicMock()
+        router = ReplicaRouter([first, second, third], health_interval=5)
+
+        router.mark_down(second, OSError("connection refused"))
+
+        assert [router.pick() for _ in range(4)] == [first, third, first, third]
+
+    def test_falls_back_to_primary_without_healthy_replicas(self):
+        """Test that the primary serves reads when every replica is down."""
+        replica = MagicMock()
+        router = ReplicaRouter([replica], health_interval=5)
+
+        router.mark_down(replica, OSError("connection refused"))
+
+        assert router.pick() is database.async_engine
+
+    @pytest.mark.asyncio
+    async def test_health_check_restores_replica(self):
+        """Test that a replica passing the health check rejoins the rotation."""
+        replica = MagicMock()
+        replica.connect.return_value.__aenter__.return_value = AsyncMock()
+        router = ReplicaRouter([replica], health_interval=5)
+        router.mark_down(replica, OSError("connection refused"))
+
+        await router.check(replica)
+
+        assert router.pick() is replica
+
+
+class TestReadRouting:
+    """Tests for lookups routed to replicas."""
+
+    @pytest.mark.asyncio
+    async def test_replica_error_fails_over_to_primary(self, mock_session_factory):
+        """Test that a failing replica is marked down and the primary answers."""
+        replica = MagicMock()
+        router = ReplicaRouter([replica], health_interval=5)
+        error = OperationalError("SELECT 1", {}, OSError("connection reset"))
+
+        with (
+            patch("app.database.replica_router", router),
+            patch(
+                "app.database.AsyncSession",
+                mock_session_factory(session_returning(error=error)),
+            ),
+            patch(
+                "app.database.AsyncSessionLocal",
+                mock_session_factory(session_returning(("https://example.com",))),
+            ),
+        ):
+            result = await read_first(select(Url.long_url))
+
+        assert result == ("https://example.com",)
+        assert router.failovers == 1
+        assert router.healthy() == []
+
+    @pytest.mark.asyncio
+    async def test_replica_miss_is_confirmed_on_primary(self, mock_session_factory):
+        """Test that a code missing on a lagging replica is read from the primary."""
+        router = ReplicaRouter([MagicMock()], health_interval=5)
+        replica_session = session_returning(None)
+        primary_session = session_returning(("https://example.com/new", None))
+
+        with (
+            patch("app.database.replica_router", router),
+            patch("app.storage.replica_router", router),
+            patch("app.database.AsyncSession", mock_session_factory(replica_session)),
+        ):
+            storage = PostgresStorage(mock_session_factory(primary_session))
+            result = await storage.get_by_code("abc1234")
+
+        assert result == ("https://example.com/new", None)
+        replica_session.execute.assert_awaited_once()
+        primary_session.execute.assert_awaited_once()
+
+
+class TestStreamPartitions:
+    """Tests for long reads streamed from a replica."""
+
+    @pytest.mark.asyncio
+    async def test_replica_error_before_first_batch_fails_over(
+        self, mock_session_factory
+    ):
+        """Test that a replica failing up front is marked down for the primary."""
+        router = ReplicaRouter([MagicMock()], health_interval=5)
+        error = OperationalError("SELECT 1", {}, OSError("connection reset"))
+
+        with (
+            patch("app.database.replica_router", router),
+            patch(
+                "app.database.AsyncSession",
+                mock_session_factory(session_streaming(error=error)),
+            ),
+            patch(
+                "app.database.AsyncSessionLocal",
+                mock_session_factory(session_streaming([("a",)], [("b",)])),
+            ),
+        ):
+            batches = [rows async for rows in stream_partitions(select(Url), 1)]
+
+        assert batches == [[("a",)], [("b",)]]
+        assert router.failovers == 1
+        assert router.healthy() == []
+
+    @pytest.mark.asyncio
+    async def test_replica_error_mid_stream_is_raised(self, mock_session_factory):
+        """Test that rows already yielded are not read again from the primary."""
+        router = ReplicaRouter([MagicMock()], health_interval=5)
+        error = OperationalError("SELECT 1", {}, OSError("connection reset"))
+        primary = session_streaming([("a",)])
+
+        with (
+            patch("app.database.replica_router", router),
+            patch(
+                "app.database.AsyncSession",
+                mock_session_factory(session_streaming([("a",)], error=error)),
+            ),
+            patch("app.database.AsyncSessionLocal", mock_session_factory(primary)),
+        ):
+            batches = []
+            with pytest.raises(OperationalError):
+                async for rows in stream_partitions(select(Url), 1):
+                    batches.append(rows)
+
+        assert batches == [[("a",)]]
+        assert router.healthy() == []
+        primary.stream.assert_not_awaited()
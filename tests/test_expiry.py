@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..app.cache import digest_key
+from ..app.expiry import ExpiryPurger, purge_statement
+
+
+def session_purging(*batches):
+    """Session whose purge DELETEs return `batches` in turn."""
+    session = AsyncMock(spec=AsyncSession)
+    results = []
+    for batch in batches:
+        results.append(MagicMock(all=MagicMock(return_value=batch)))
+        if batch:
+            # DELETE of the clicks of the purged codes.
+            results.append(MagicMock())
+    session.execute.side_effect = results
+    return session
+
+
+class TestPurgeStatement:
+    """Tests for the batched DELETE of expired links."""
+
+    def test_batch_is_limited_and_skips_locked_rows(self):
+        """Test that each batch is bounded and safe to run from several workers."""
+        sql = str(
+            purge_statement(datetime.now(), 500).compile(dialect=postgresql.dialect())
+        )
+
+        assert "ORDER BY urls.expires_at" in sql
+        assert "LIMIT" in sql
+        assert "FOR UPDATE SKIP LOCKED" in sql
+        assert "RETURNING urls.short_code, urls.long_url_digest" in sql
+
+
+class TestExpiryPurger:
+    """Tests for the background purge of expired links."""
+
+    @pytest.mark.asyncio
+    async def test_purges_in_batches_until_drained(self, mock_session_factory):
+        """Test that full batches are followed by another until one comes up short."""
+        session = session_purging(
+            [("aaaaaaa", "da"), ("bbbbbbb", "db")], [("ccccccc", "dc")]
+        )
+        purger = ExpiryPurger(batch_size=2, interval=60, pause=0)
+
+        with (
+            patch("app.expiry.AsyncSessionLocal", mock_session_factory(session)),
+            patch("app.expiry.invalidate_cached_codes") as mock_invalidate,
+        ):
+            purged = await purger.purge()
+
+        assert purged == 3
+        assert purger.purged == 3
+        assert session.commit.await_count == 2
+        mock_invalidate.assert_any_await(
+            "aaaaaaa", "bbbbbbb", digest_key("da"), digest_key("db")
+        )
+        assert mock_invalidate.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_nothing_expired_touches_no_cache(self, mock_session_factory):
+        """Test that an empty batch ends the purge without invalidations."""
+        session = session_purging([])
+        purger = ExpiryPurger(batch_size=100, interval=60, pause=0)
+
+        with (
+            patch("app.expiry.AsyncSessionLocal", mock_session_factory(session)),
+            patch("app.expiry.invalidate_cached_codes") as mock_invalidate,
+        ):
+            assert await purger.purge() == 0
+
+        mock_invalidate.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_unreachable_database_does_not_stop_the_loop(self):
+        """Test that a connection error is logged and the next round still runs."""
+        purger = ExpiryPurger(batch_size=100, interval=0, pause=0)
+
+        with patch.object(
+            purger,
+            "purge",
+            side_effect=[ConnectionRefusedError("db down"), 0, asyncio.CancelledError],
+        ) as purge:
+            with pytest.raises(asyncio.CancelledError):
+                await purger.run()
+
+        assert purge.await_count == 3
@@ -0,0 +1,55 @@
+from unittest.mock import patch
+
+from ..app.local_cache import LocalCache
+
+
+class TestLocalCache:
+    """Tests for the in-process LRU/TTL cache."""
+
+    def test_get_returns_cached_value(self):
+        """Test that a stored value is returned and counted as a hit."""
+        cache = LocalCache(maxsize=10, ttl=60)
+        cache.set("abc123", "https://example.com")
+
+        assert cache.get("abc123") == "https://example.com"
+        assert cache.hits == 1
+        assert cache.misses == 0
+
+    def test_get_missing_key_counts_miss(self):
+        """Test that an unknown key returns None and counts a miss."""
+        cache = LocalCache(maxsize=10, ttl=60)
+
+        assert cache.get("missing") is None
+        assert cache.misses == 1
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the LRU entry is evicted once maxsize is exceeded."""
+        cache = LocalCache(maxsize=2, ttl=60)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.get("c") == "3"
+        assert cache.evictions == 1
+
+    def test_expired_entry_is_dropped(self):
+        """Test that entries past their TTL are treated as misses."""
+        cache = LocalCache(maxsize=10, ttl=5)
+
+        with patch("app.local_cache.monotonic", return_value=100.0):
+            cache.set("abc123", "https://example.com")
+        with patch("app.local_cache.monotonic", return_value=106.0):
+            assert cache.get("abc123") is None
+
+        assert len(cache) == 0
+
+    def test_delete_evicts_entry(self):
+        """Test that delete removes the entry."""
+        cache = LocalCache(maxsize=10, ttl=60)
+        cache.set("abc123", "https://example.com")
+        cache.delete("abc123")
+
+        assert cache.get("abc123") is None
@@ -1,30 +1,40 @@
 # from Claude Haiku 4.5
 
-from datetime import datetime
+import json
+from datetime import datetime, timedelta
 from http import HTTPStatus
-from unittest.mock import AsyncMock, patch
+from unittest.mock import patch
 from uuid import uuid4
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..app.database import get_session
+from ..app.cache import NOT_FOUND
+from ..app.codes import CodeSpaceExhausted
 from ..app.main import app
 from ..app.models import Url
+from ..app.ratelimit import rate_limiter
+from ..app.redirects import RedirectTarget
+from ..app.schemas import UrlOut
+from ..app.storage import MemoryStorage
+from ..app.utils import hash_url
+
+LONG_URL = "https://example.com/very/long/url"
 
 
 @pytest.fixture
 def client():
-    """Create a TestClient for the FastAPI app."""
-    return TestClient(app)
+    """Create a TestClient for the FastAPI app, without rate limiting."""
+    with patch.object(rate_limiter, "enabled", False):
+        yield TestClient(app)
 
 
 @pytest.fixture
-async def mock_session():
-    """Create a mock AsyncSession."""
-    mock = AsyncMock(spec=AsyncSession)
-    return mock
+def storage():
+    """Route the app to an empty in-memory storage."""
+    storage = MemoryStorage("test")
+    with patch("app.main.url_storage", storage):
+        yield storage
 
 
 @pytest.fixture
@@ -32,8 +42,9 @@ def mock_url_object():
     """Create a mock Url object."""
     return Url(
         uuid=str(uuid4()),
-        long_url="https://example.com/very/long/url",
+        long_url=LONG_URL,
         short_code="abc123",
+        long_url_digest=hash_url(LONG_URL),
         created_at=datetime.now(),
     )
 
@@ -60,59 +71,39 @@ class TestIndexEndpoint:
 class TestShortenEndpoint:
     """Tests for POST /shorten endpoint."""
 
-    @pytest.mark.asyncio
-    async def test_shorten_url_creates_new_entry(self, client, mock_url_object):
-        """Test successful URL shortening creates new entry."""
-
-        async def override_get_session():
-            mock_session = AsyncMock(spec=AsyncSession)
-            mock_session.scalar.return_value = None
-            mock_session.commit = AsyncMock()
-            mock_session.refresh = AsyncMock()
-
-            async def add_side_effect(obj):
-                obj.uuid = mock_url_object.uuid
-                obj.created_at = mock_url_object.created_at
-
-            mock_session.add.side_effect = add_side_effect
-            yield mock_session
-
-        app.dependency_overrides[get_session] = override_get_session
-
-        response = client.post(
-            "/shorten", params={"url": "https://example.com/very/long/url"}
-        )
+    def test_shorten_url_creates_new_entry(self, client, storage):
+        """Test successful URL shortening stores and caches a new link."""
+        with (
+            patch("app.main.get_cached_urls", return_value={}),
+            patch("app.main.cache_urls") as mock_cache,
+        ):
+            response = client.post("/shorten", json={"url": LONG_URL})
 
         assert response.status_code == HTTPStatus.CREATED
         data = response.json()
         assert "uuid" in data
-        assert data["long_url"] == "https://example.com/very/long/url"
-        assert "short_code" in data
+        assert data["long_url"] == LONG_URL
         assert "created_at" in data
-
-        app.dependency_overrides.clear()
+        url = storage.by_digest[hash_url(LONG_URL)]
+        assert data["short_code"] == url.short_code
+        mock_cache.assert_awaited_once_with([url])
 
     @pytest.mark.asyncio
-    async def test_shorten_url_returns_existing(self, client, mock_url_object):
+    async def test_shorten_url_returns_existing(self, client, storage):
         """Test that existing URL is returned without duplication."""
+        existing = await storage.create(hash_url(LONG_URL), LONG_URL)
 
-        async def override_get_session():
-            mock_session = AsyncMock(spec=AsyncSession)
-            mock_session.scalar.return_value = mock_url_object
-            yield mock_session
-
-        app.dependency_overrides[get_session] = override_get_session
-
-        response = client.post(
-            "/shorten", params={"url": "https://example.com/very/long/url"}
-        )
+        with (
+            patch("app.main.get_cached_urls", return_value={}),
+            patch("app.main.cache_urls"),
+        ):
+            response = client.post("/shorten", json={"url": LONG_URL})
 
         assert response.status_code == HTTPStatus.CREATED
         data = response.json()
-        assert data["long_url"] == "https://example.com/very/long/url"
-        assert data["short_code"] == mock_url_object.short_code
-
-        app.dependency_overrides.clear()
+        assert data["long_url"] == LONG_URL
+        assert data["short_code"] == existing.short_code
+        assert list(storage.by_code) == [existing.short_code]
 
     def test_shorten_url_invalid_url(self, client):
         """Test that invalid URL returns validation error."""
@@ -120,26 +111,37 @@ class TestShortenEndpoint:
 
         assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
 
+    def test_shorten_malformed_url_is_not_stored(self, client, storage):
+        """Test that a body URL that is not an http(s) URL is rejected."""
+        with patch("app.main.get_cached_urls", return_value={}):
+            response = client.post("/shorten", json={"url": "javascript:alert(1)"})
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert not storage.by_code
+
     def test_shorten_url_missing_url_parameter(self, client):
         """Test that missing URL parameter returns error."""
         response = client.post("/shorten")
 
         assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
 
-    @pytest.mark.asyncio
-    async def test_shorten_url_response_structure(self, client, mock_url_object):
-        """Test that shorten response has correct structure."""
-
-        async def override_get_session():
-            mock_session = AsyncMock(spec=AsyncSession)
-            mock_session.scalar.return_value = mock_url_object
-            yield mock_session
+    def test_exhausted_code_space_is_unavailable(self, client, storage):
+        """Test that running out of codes answers 503 instead of crashing."""
+        with (
+            patch("app.main.get_cached_urls", return_value={}),
+            patch.object(storage, "create", side_effect=CodeSpaceExhausted("full")),
+        ):
+            response = client.post("/shorten", json={"url": LONG_URL})
 
-        app.dependency_overrides[get_session] = override_get_session
+        assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
 
-        response = client.post(
-            "/shorten", params={"url": "https://example.com/very/long/url"}
-        )
+    def test_shorten_url_response_structure(self, client, storage):
+        """Test that shorten response has correct structure."""
+        with (
+            patch("app.main.get_cached_urls", return_value={}),
+            patch("app.main.cache_urls"),
+        ):
+            response = client.post("/shorten", json={"url": LONG_URL})
 
         data = response.json()
         assert "uuid" in data
@@ -147,113 +149,459 @@ class TestShortenEndpoint:
         assert "short_code" in data
         assert "created_at" in data
 
-        app.dependency_overrides.clear()
 
+class TestShortenExpiry:
+    """Tests for the optional expires_at field of POST /shorten."""
 
-class TestGetUrlEndpoint:
-    """Tests for GET /{short_code} endpoint."""
+    def test_expiry_is_stored_with_the_url(self, client, storage):
+        """Test that a future expires_at reaches the stored link."""
+        expires_at = datetime.now() + timedelta(days=7)
+
+        with (
+            patch("app.main.get_cached_urls", return_value={}),
+            patch("app.main.cache_urls"),
+        ):
+            response = client.post(
+                "/shorten",
+                json={"url": LONG_URL, "expires_at": expires_at.isoformat()},
+            )
+
+        assert response.status_code == HTTPStatus.CREATED
+        assert response.json()["expires_at"] == expires_at.isoformat()
+        assert storage.by_digest[hash_url(LONG_URL)].expires_at == expires_at
+
+    @pytest.mark.parametrize("expires_at", ["2000-01-01T00:00:00", "tomorrow", 42])
+    def test_invalid_or_past_expiry_is_rejected(self, client, expires_at):
+        """Test that expires_at must be an ISO 8601 date in the future."""
+        response = client.post(
+            "/shorten",
+            json={"url": "https://example.com", "expires_at": expires_at},
+        )
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
 
     @pytest.mark.asyncio
-    async def test_get_url_redirects_to_long_url(self, client, mock_url_object):
-        """Test that short code redirects to long URL."""
+    async def test_cached_url_expiring_too_soon_goes_to_storage(self, client, storage):
+        """Test that a request for a longer-lived link extends the cached one."""
+        existing = await storage.create(
+            hash_url(LONG_URL), LONG_URL, datetime.now() + timedelta(hours=1)
+        )
+        cached = UrlOut.model_validate(existing, from_attributes=True)
 
-        async def override_get_session():
-            mock_session = AsyncMock(spec=AsyncSession)
-            mock_session.scalar.return_value = mock_url_object
-            yield mock_session
+        with (
+            patch(
+                "app.main.get_cached_urls",
+                return_value={existing.long_url_digest: cached.model_dump_json()},
+            ),
+            patch("app.main.cache_urls"),
+        ):
+            response = client.post("/shorten", json={"url": LONG_URL})
 
-        app.dependency_overrides[get_session] = override_get_session
+        assert response.status_code == HTTPStatus.CREATED
+        assert response.json()["expires_at"] is None
+        assert existing.expires_at is None
 
-        with patch("app.main.get_cached_code", return_value=None):
-            with patch("app.main.set_cached_data"):
-                response = client.get(
-                    f"/{mock_url_object.short_code}", follow_redirects=False
-                )
 
-        assert response.status_code == HTTPStatus.FOUND
-        assert response.headers["location"] == mock_url_object.long_url
+class TestShortenCache:
+    """Tests for the digest cache in front of POST /shorten."""
+
+    def test_cached_digest_skips_storage(self, client, storage, mock_url_object):
+        """Test that a URL shortened before is answered from Redis alone."""
+        cached = UrlOut.model_validate(mock_url_object, from_attributes=True)
 
-        app.dependency_overrides.clear()
+        with (
+            patch(
+                "app.main.get_cached_urls",
+                return_value={
+                    mock_url_object.long_url_digest: cached.model_dump_json()
+                },
+            ),
+            patch("app.main.cache_urls") as mock_cache,
+            patch.object(storage, "create_many") as mock_create,
+        ):
+            response = client.post("/shorten", json={"url": mock_url_object.long_url})
+
+        assert response.status_code == HTTPStatus.CREATED
+        assert response.json()["short_code"] == mock_url_object.short_code
+        mock_create.assert_not_awaited()
+        mock_cache.assert_not_awaited()
 
     @pytest.mark.asyncio
-    async def test_get_url_from_cache(self, client, mock_url_object):
-        """Test that URL is served from cache when available."""
+    async def test_bulk_queries_only_uncached_digests(
+        self, client, storage, mock_url_object
+    ):
+        """Test that cached URLs in a batch are not looked up in storage."""
+        cached = UrlOut.model_validate(mock_url_object, from_attributes=True)
+        other = await storage.create(
+            hash_url("https://example.com/other"), "https://example.com/other"
+        )
+
+        with (
+            patch(
+                "app.main.get_cached_urls",
+                return_value={
+                    mock_url_object.long_url_digest: cached.model_dump_json()
+                },
+            ),
+            patch("app.main.cache_urls") as mock_cache,
+            patch.object(
+                storage, "get_by_digests", wraps=storage.get_by_digests
+            ) as lookup,
+        ):
+            response = client.post(
+                "/shorten/bulk",
+                json=[mock_url_object.long_url, "https://example.com/other"],
+            )
 
-        async def override_get_session():
-            mock_session = AsyncMock(spec=AsyncSession)
-            yield mock_session
+        assert response.status_code == HTTPStatus.CREATED
+        assert [
+            json.loads(line)["short_code"] for line in response.text.splitlines()
+        ] == ["abc123", other.short_code]
+        lookup.assert_awaited_once_with([other.long_url_digest])
+        mock_cache.assert_awaited_once_with([other])
 
-        app.dependency_overrides[get_session] = override_get_session
 
-        with patch("app.main.get_cached_code", return_value=mock_url_object.long_url):
+class TestGetUrlEndpoint:
+    """Tests for GET /{short_code} endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_get_url_redirects_to_long_url(self, client, storage):
+        """Test that short code redirects to long URL."""
+        url = await storage.create(hash_url(LONG_URL), LONG_URL)
+
+        with (
+            patch("app.main.get_cached_code", return_value=None),
+            patch("app.main.set_cached_data"),
+        ):
+            response = client.get(f"/{url.short_code}", follow_redirects=False)
+
+        assert response.status_code == HTTPStatus.MOVED_PERMANENTLY
+        assert response.headers["location"] == LONG_URL
+
+    def test_get_url_from_cache(self, client, storage, mock_url_object):
+        """Test that URL is served from cache without reaching storage."""
+        with (
+            patch("app.main.get_cached_code", return_value=mock_url_object.long_url),
+            patch.object(storage, "get_by_code") as lookup,
+        ):
             response = client.get(
                 f"/{mock_url_object.short_code}", follow_redirects=False
             )
 
         assert response.status_code == HTTPStatus.FOUND
         assert response.headers["location"] == mock_url_object.long_url
+        assert response.content == b""
+        lookup.assert_not_awaited()
+
+    def test_get_url_not_found(self, client, storage):
+        """Test that 404 is returned and cached for non-existent short code."""
+        with (
+            patch("app.main.get_cached_code", return_value=None),
+            patch("app.main.set_negative_cache") as mock_negative,
+        ):
+            response = client.get("/nonexistent", follow_redirects=False)
 
-        app.dependency_overrides.clear()
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        assert "URL não encontrada" in response.json()["detail"]
+        mock_negative.assert_called_once_with("nonexistent")
 
     @pytest.mark.asyncio
-    async def test_get_url_not_found(self, client):
-        """Test that 404 is returned for non-existent short code."""
+    async def test_get_url_expired_link_not_found(self, client, storage):
+        """Test that a link past its expiry is not redirected."""
+        url = await storage.create(
+            hash_url(LONG_URL), LONG_URL, datetime.now() + timedelta(hours=1)
+        )
+        url.expires_at = datetime.now() - timedelta(seconds=1)
+
+        with (
+            patch("app.main.get_cached_code", return_value=None),
+            patch("app.main.set_negative_cache"),
+        ):
+            response = client.get(f"/{url.short_code}", follow_redirects=False)
 
-        async def override_get_session():
-            mock_session = AsyncMock(spec=AsyncSession)
-            mock_session.scalar.return_value = None
-            yield mock_session
+        assert response.status_code == HTTPStatus.NOT_FOUND
 
-        app.dependency_overrides[get_session] = override_get_session
+    def test_get_url_expired_cache_entry_not_found(self, client, storage):
+        """Test that a cached target past its expiry is not redirected."""
+        target = RedirectTarget.from_fields(
+            LONG_URL,
+            datetime.now() - timedelta(days=1),
+            datetime.now() - timedelta(seconds=1),
+            True,
+        )
 
-        with patch("app.main.get_cached_code", return_value=None):
+        with (
+            patch("app.main.get_cached_code", return_value=target.encode()),
+            patch("app.main.redirect_response") as redirect,
+            patch("app.main.click_recorder.record") as record,
+        ):
+            response = client.get("/abc123", follow_redirects=False)
+
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        redirect.assert_not_called()
+        record.assert_not_called()
+
+    def test_get_url_negative_cache_hit(self, client, storage):
+        """Test that a cached 404 is served without reaching storage."""
+        with (
+            patch("app.main.get_cached_code", return_value=NOT_FOUND),
+            patch.object(storage, "get_by_code") as lookup,
+        ):
             response = client.get("/nonexistent", follow_redirects=False)
 
         assert response.status_code == HTTPStatus.NOT_FOUND
-        assert "URL não encontrada" in response.json()["detail"]
+        lookup.assert_not_awaited()
 
-        app.dependency_overrides.clear()
+    def test_get_url_not_found_response_structure(self, client, storage):
+        """Test that 404 response has correct error structure."""
+        with (
+            patch("app.main.get_cached_code", return_value=None),
+            patch("app.main.set_negative_cache"),
+        ):
+            response = client.get("/invalid")
+
+        data = response.json()
+        assert "detail" in data
 
     @pytest.mark.asyncio
-    async def test_get_url_not_found_response_structure(self, client):
-        """Test that 404 response has correct error structure."""
+    async def test_get_url_caches_data_when_found(self, client, storage):
+        """Test that data is cached when URL is found in storage."""
+        url = await storage.create(hash_url(LONG_URL), LONG_URL)
+
+        with (
+            patch("app.main.get_cached_code", return_value=None),
+            patch("app.main.set_cached_data") as mock_cache,
+        ):
+            response = client.get(f"/{url.short_code}", follow_redirects=False)
+
+            mock_cache.assert_called_once_with(
+                url.short_code, RedirectTarget.from_url(url).encode(), None
+            )
 
-        async def override_get_session():
-            mock_session = AsyncMock(spec=AsyncSession)
-            mock_session.scalar.return_value = None
-            yield mock_session
+        assert response.status_code == HTTPStatus.MOVED_PERMANENTLY
 
-        app.dependency_overrides[get_session] = override_get_session
 
-        with patch("app.main.get_cached_code", return_value=None):
-            response = client.get("/invalid")
+class TestRedirectCaching:
+    """Tests for the HTTP caching headers of GET/HEAD /{short_code}."""
 
-        data = response.json()
-        assert "detail" in data
+    @staticmethod
+    def get(client, url, method="GET", headers=None):
+        with (
+            patch(
+                "app.main.get_cached_code",
+                return_value=RedirectTarget.from_url(url).encode(),
+            ),
+            patch("app.main.click_recorder.record") as mock_record,
+        ):
+            response = client.request(
+                method, f"/{url.short_code}", headers=headers, follow_redirects=False
+            )
+        return response, mock_record
 
-        app.dependency_overrides.clear()
+    def test_permanent_link_is_cacheable(self, client, mock_url_object):
+        """Test that links without expiry get a permanent, cacheable redirect."""
+        response, mock_record = self.get(client, mock_url_object)
 
-    @pytest.mark.asyncio
-    async def test_get_url_caches_data_when_found(self, client, mock_url_object):
-        """Test that data is cached when URL is found in database."""
+        assert response.status_code == HTTPStatus.MOVED_PERMANENTLY
+        assert response.headers["location"] == mock_url_object.long_url
+        assert response.headers["cache-control"] == "public, max-age=3600"
+        assert response.headers["etag"]
+        assert response.headers["last-modified"].endswith("GMT")
+        mock_record.assert_called_once_with(mock_url_object.short_code)
+
+    def test_expiring_link_is_cached_until_it_expires(self, client, mock_url_object):
+        """Test that max-age never outlives the link and the redirect is 302."""
+        mock_url_object.expires_at = datetime.now() + timedelta(minutes=10)
 
-        async def override_get_session():
-            mock_session = AsyncMock(spec=AsyncSession)
-            mock_session.scalar.return_value = mock_url_object
-            yield mock_session
+        response, _ = self.get(client, mock_url_object)
 
-        app.dependency_overrides[get_session] = override_get_session
+        assert response.status_code == HTTPStatus.FOUND
+        max_age = int(response.headers["cache-control"].split("max-age=")[1])
+        assert 590 <= max_age <= 600
 
-        with patch("app.main.get_cached_code", return_value=None):
-            with patch("app.main.set_cached_data") as mock_cache:
-                response = client.get(
-                    f"/{mock_url_object.short_code}", follow_redirects=False
-                )
+    def test_non_cacheable_link_is_not_stored(self, client, mock_url_object):
+        """Test that opted-out links reach the origin on every click."""
+        mock_url_object.cacheable = False
 
-                mock_cache.assert_called_once_with(
-                    mock_url_object.short_code, mock_url_object.long_url
-                )
+        response, _ = self.get(client, mock_url_object)
 
         assert response.status_code == HTTPStatus.FOUND
+        assert response.headers["cache-control"] == "no-store"
+        assert "etag" not in response.headers
+
+    def test_matching_etag_gets_not_modified(self, client, mock_url_object):
+        """Test that a revalidation with the current ETag gets an empty 304."""
+        first, _ = self.get(client, mock_url_object)
+
+        response, _ = self.get(
+            client, mock_url_object, headers={"If-None-Match": first.headers["etag"]}
+        )
+
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert response.headers["etag"] == first.headers["etag"]
+        assert response.content == b""
+
+    def test_head_does_not_count_as_click(self, client, mock_url_object):
+        """Test that HEAD gets the same redirect without recording a click."""
+        response, mock_record = self.get(client, mock_url_object, method="HEAD")
+
+        assert response.status_code == HTTPStatus.MOVED_PERMANENTLY
+        assert response.headers["location"] == mock_url_object.long_url
+        mock_record.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_opting_out_bypasses_cached_cacheable_link(self, client, storage):
+        """Test that cacheable=false reaches storage to update the link."""
+        existing = await storage.create(hash_url(LONG_URL), LONG_URL)
+        cached = UrlOut.model_validate(existing, from_attributes=True)
+
+        with (
+            patch(
+                "app.main.get_cached_urls",
+                return_value={existing.long_url_digest: cached.model_dump_json()},
+            ),
+            patch("app.main.cache_urls"),
+        ):
+            response = client.post(
+                "/shorten", json={"url": LONG_URL, "cacheable": False}
+            )
+
+        assert response.status_code == HTTPStatus.CREATED
+        assert response.json()["cacheable"] is False
+        assert existing.cacheable is False
+
+
+class TestShortenBulkEndpoint:
+    """Tests for POST /shorten/bulk endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_bulk_returns_results_in_input_order(self, client, storage):
+        """Test that existing and new URLs come back in input order, deduplicated."""
+        existing = await storage.create(
+            hash_url("https://example.com/a"), "https://example.com/a"
+        )
+
+        with (
+            patch("app.main.get_cached_urls", return_value={}),
+            patch("app.main.cache_urls") as mock_cache,
+            patch.object(storage, "create_many", wraps=storage.create_many) as create,
+        ):
+            response = client.post(
+                "/shorten/bulk",
+                json=[
+                    "https://example.com/b",
+                    {"url": "https://example.com/a"},
+                    "https://example.com/c",
+                    "https://example.com/b",
+                ],
+            )
+
+        assert response.status_code == HTTPStatus.CREATED
+        b, c = (storage.by_digest[hash_url(f"https://example.com/{x}")] for x in "bc")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["short_code"] for line in lines] == [
+            b.short_code,
+            existing.short_code,
+            c.short_code,
+            b.short_code,
+        ]
+
+        # Only the new URLs are created, in a single call.
+        create.assert_awaited_once_with(
+            {b.long_url_digest: b.long_url, c.long_url_digest: c.long_url}
+        )
+        mock_cache.assert_awaited_once_with([existing, b, c])
+
+    def test_bulk_keeps_first_spelling_of_repeated_url(self, client, storage):
+        """Test that the first of several URLs sharing a digest is stored."""
+        with (
+            patch("app.main.get_cached_urls", return_value={}),
+            patch("app.main.cache_urls"),
+        ):
+            response = client.post(
+                "/shorten/bulk",
+                json=["HTTPS://EXAMPLE.com/a", "https://example.com/a"],
+            )
+
+        assert response.status_code == HTTPStatus.CREATED
+        (url,) = storage.by_code.values()
+        assert url.long_url == "HTTPS://EXAMPLE.com/a"
+        assert [
+            json.loads(line)["short_code"] for line in response.text.splitlines()
+        ] == [
+            url.short_code,
+            url.short_code,
+        ]
+
+    def test_bulk_accepts_ndjson(self, client, storage):
+        """Test that an NDJSON body is accepted."""
+        with (
+            patch("app.main.get_cached_urls", return_value={}),
+            patch("app.main.cache_urls"),
+        ):
+            response = client.post(
+                "/shorten/bulk",
+                content=b'"https://example.com/a"\n{"url": "https://example.com/a"}\n',
+                headers={"content-type": "application/x-ndjson"},
+            )
+
+        assert response.status_code == HTTPStatus.CREATED
+        assert len(response.text.splitlines()) == 2
+        assert len(storage.by_code) == 1
+
+    def test_bulk_rejects_oversized_batch(self, client):
+        """Test that batches above the configured limit are rejected."""
+        with patch("app.main.settings.bulk_max_batch_size", 2):
+            response = client.post(
+                "/shorten/bulk",
+                json=[
+                    "https://example.com/1",
+                    "https://example.com/2",
+                    "https://example.com/3",
+                ],
+            )
+
+        assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
 
-        app.dependency_overrides.clear()
+    def test_bulk_rejects_invalid_item(self, client):
+        """Test that non-string items are rejected with their position."""
+        response = client.post("/shorten/bulk", json=["https://example.com/1", 42])
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert "1" in response.json()["detail"]
+
+    def test_bulk_rejects_malformed_url_before_writing(self, client, storage):
+        """Test that a string that is not a URL fails the batch with no writes."""
+        response = client.post(
+            "/shorten/bulk",
+            json=["https://example.com/1", "https://example.com/2", "not a url"],
+        )
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert "2" in response.json()["detail"]
+        assert not storage.by_code
+
+
+class TestMemoryBackend:
+    """Tests for the endpoints that need the Postgres storage."""
+
+    @pytest.mark.parametrize("path", ["/abc123/stats", "/urls/export"])
+    def test_postgres_only_endpoints_are_unavailable(self, client, path):
+        """Test that stats and export answer 501 without Postgres."""
+        with patch("app.main.settings.storage_backend", "memory"):
+            response = client.get(path)
+
+        assert response.status_code == HTTPStatus.NOT_IMPLEMENTED
+
+
+class TestDebugPoolEndpoint:
+    """Tests for GET /debug/pool endpoint."""
+
+    def test_pool_readout_structure(self, client):
+        """Test that the pool readout exposes occupancy and wait times."""
+        response = client.get("/debug/pool")
+
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        for key in ("size", "checked_out", "overflow", "p99_wait_ms", "timeouts"):
+            assert key in data
@@ -0,0 +1,60 @@
+from http import HTTPStatus
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from ..app.main import app
+from ..app.metrics import Histogram, merge, render
+
+
+class TestMetrics:
+    """Tests for the Prometheus exposition."""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that histogram samples follow Prometheus bucket semantics."""
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+
+        samples = {
+            (name, labels[-1][1] if labels else None): value
+            for name, labels, value in histogram.samples("latency", ())
+        }
+
+        assert samples[("latency_bucket", "0.1")] == 1
+        assert samples[("latency_bucket", "1.0")] == 2
+        assert samples[("latency_bucket", "+Inf")] == 3
+        assert samples[("latency_count", None)] == 3
+
+    def test_merge_sums_worker_snapshots(self):
+        """Test that snapshots from several workers are summed on scrape."""
+        worker = {
+            "hits_total": {
+                "type": "counter",
+                "help": "Hits.",
+                "samples": [["hits_total", [["tier", "local"]], 3]],
+            }
+        }
+
+        text = render(merge([worker, worker]))
+
+        assert "# TYPE hits_total counter" in text
+        assert 'hits_total{tier="local"} 6' in text
+
+    def test_metrics_endpoint_reports_route_latency(self):
+        """Test that /metrics exposes per-route latency after a request."""
+        client = TestClient(app)
+
+        with patch("app.main.get_cached_code", return_value="https://example.com"):
+            client.get("/abc1234", follow_redirects=False)
+        response = client.get("/metrics")
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-type"].startswith("text/plain")
+        assert (
+            'http_requests_total{method="GET",route="/{short_code}",status="302"}'
+            in response.text
+        )
+        assert "http_request_duration_seconds_bucket" in response.text
+        assert "cache_requests_total" in response.text
+        assert "db_pool_checked_out" in response.text
@@ -0,0 +1,170 @@
+from http import HTTPStatus
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError, NoScriptError
+
+from ..app.cache import redis_breaker
+from ..app.ratelimit import (
+    TOKEN_BUCKET_SCRIPT,
+    TOKEN_BUCKET_SHA,
+    LocalBuckets,
+    RateLimiter,
+    rate_limit,
+)
+from ..app.settings import RateLimit
+
+LIMITS = {"shorten": RateLimit(rate=1.0, burst=2)}
+
+
+@pytest.fixture
+def limiter():
+    """Swap in a fresh limiter with a small burst and a closed circuit."""
+    redis_breaker.record_success()
+    limiter = RateLimiter(LIMITS, enabled=True, local_maxsize=100)
+    with patch("app.ratelimit.rate_limiter", limiter):
+        yield limiter
+
+
+@pytest.fixture
+def client(limiter):
+    """A minimal app with one rate-limited route."""
+    app = FastAPI()
+
+    @app.post("/shorten", dependencies=[Depends(rate_limit("shorten"))])
+    async def shorten():
+        return {}
+
+    return TestClient(app)
+
+
+class TestRateLimitDependency:
+    """Tests for the 429 response of rate-limited routes."""
+
+    def test_limited_request_gets_429_with_retry_after(self, client, limiter):
+        """Test that Retry-After is the script's wait rounded up to seconds."""
+        with patch(
+            "app.cache.redis_client.evalsha",
+            new_callable=AsyncMock,
+            return_value="2.5",
+        ):
+            response = client.post("/shorten")
+
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        assert response.headers["retry-after"] == "3"
+        assert limiter.limited["shorten"] == 1
+
+    def test_allowed_request_uses_one_script_call(self, client):
+        """Test that a check is a single EVALSHA keyed by route and client."""
+        with (
+            patch(
+                "app.cache.redis_client.evalsha",
+                new_callable=AsyncMock,
+                return_value="0",
+            ) as mock_evalsha,
+            patch("app.ratelimit.settings.rate_limit_api_keys", ["other", "secret"]),
+        ):
+            response = client.post("/shorten", headers={"X-API-Key": "secret"})
+
+        assert response.status_code == HTTPStatus.OK
+        mock_evalsha.assert_awaited_once()
+        sha, numkeys, key, rate, burst = mock_evalsha.await_args.args
+        assert (sha, numkeys, rate, burst) == (TOKEN_BUCKET_SHA, 1, 1.0, 2)
+        assert key.startswith("ratelimit:shorten:key:")
+        assert "secret" not in key
+
+    def test_rotating_unknown_api_keys_share_the_ip_bucket(self, client):
+        """Test that a fresh unknown X-API-Key per request still gets 429."""
+        with (
+            patch(
+                "app.cache.redis_client.evalsha",
+                new_callable=AsyncMock,
+                side_effect=ConnectionError("down"),
+            ),
+            patch("app.ratelimit.settings.rate_limit_api_keys", ["secret"]),
+        ):
+            statuses = [
+                client.post("/shorten", headers={"X-API-Key": f"key-{i}"}).status_code
+                for i in range(3)
+            ]
+
+        assert statuses == [HTTPStatus.OK, HTTPStatus.OK, HTTPStatus.TOO_MANY_REQUESTS]
+
+    def test_disabled_limiter_skips_redis(self, client, limiter):
+        """Test that turning the limiter off bypasses the check entirely."""
+        limiter.enabled = False
+        with patch("app.cache.redis_client.evalsha") as mock_evalsha:
+            response = client.post("/shorten")
+
+        assert response.status_code == HTTPStatus.OK
+        mock_evalsha.assert_not_called()
+
+
+class TestRateLimiter:
+    """Tests for the Redis check and its local fallback."""
+
+    @pytest.mark.asyncio
+    async def test_unknown_script_is_loaded_with_eval(self, limiter):
+        """Test that a Redis without the cached script falls back to EVAL."""
+        with (
+            patch(
+                "app.cache.redis_client.evalsha",
+                new_callable=AsyncMock,
+                side_effect=NoScriptError("NOSCRIPT"),
+            ),
+            patch(
+                "app.cache.redis_client.eval",
+                new_callable=AsyncMock,
+                return_value="0",
+            ) as mock_eval,
+        ):
+            assert await limiter.retry_after("shorten", "ip:1.2.3.4") == 0
+
+        assert mock_eval.await_args.args[0] == TOKEN_BUCKET_SCRIPT
+
+    @pytest.mark.asyncio
+    async def test_redis_outage_falls_back_to_local_buckets(self, limiter):
+        """Test that requests are still limited per worker without Redis."""
+        with patch(
+            "app.cache.redis_client.evalsha",
+            new_callable=AsyncMock,
+            side_effect=ConnectionError("down"),
+        ):
+            waits = [
+                await limiter.retry_after("shorten", "ip:1.2.3.4") for _ in range(3)
+            ]
+            other = await limiter.retry_after("shorten", "ip:5.6.7.8")
+
+        assert waits[:2] == [0, 0]
+        assert waits[2] > 0
+        assert other == 0
+        assert limiter.fallbacks == 4
+
+
+class TestLocalBuckets:
+    """Tests for the in-process token buckets."""
+
+    def test_tokens_refill_over_time(self):
+        """Test that an empty bucket admits again after 1 / rate seconds."""
+        buckets = LocalBuckets(maxsize=10)
+        limit = RateLimit(rate=2.0, burst=1)
+
+        with patch("app.ratelimit.monotonic", return_value=100.0):
+            assert buckets.take("a", limit) == 0
+            assert buckets.take("a", limit) == pytest.approx(0.5)
+        with patch("app.ratelimit.monotonic", return_value=100.5):
+            assert buckets.take("a", limit) == 0
+
+    def test_least_recently_used_buckets_are_evicted(self):
+        """Test that the bucket table stays within maxsize."""
+        buckets = LocalBuckets(maxsize=2)
+        limit = RateLimit(rate=1.0, burst=1)
+
+        for key in ("a", "b", "c"):
+            buckets.take(key, limit)
+
+        # "a" was evicted, so it starts again with a full bucket.
+        assert buckets.take("a", limit) == 0
+        assert buckets.take("c", limit) > 0
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+from email.utils import formatdate
+
+from starlette.requests import Request
+
+from ..app.redirects import RedirectTarget, not_modified
+
+
+def request_with(headers):
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+class TestRedirectTarget:
+    """Tests for the cached representation of a redirect."""
+
+    def test_encoding_round_trips(self):
+        """Test that every field survives the cache, including '|' in URLs."""
+        target = RedirectTarget.from_fields(
+            "https://example.com/a|b?c=1",
+            datetime(2026, 1, 29, 10, 30),
+            datetime.now() + timedelta(days=1),
+            False,
+        )
+
+        assert RedirectTarget.decode(target.encode()) == target
+
+    def test_plain_urls_from_older_entries_are_accepted(self):
+        """Test that values cached before the metadata decode as bare URLs."""
+        target = RedirectTarget.decode("https://example.com/a")
+
+        assert target.long_url == "https://example.com/a"
+        assert target.created_at is None
+
+
+class TestConditionalRequests:
+    """Tests for If-None-Match and If-Modified-Since."""
+
+    target = RedirectTarget("https://example.com", 1_800_000_000, None, True)
+
+    def test_if_none_match_compares_etags(self):
+        """Test that any listed (or weak) matching tag counts as fresh."""
+        assert not_modified(
+            request_with({"If-None-Match": self.target.etag}), self.target
+        )
+        assert not_modified(
+            request_with({"If-None-Match": f'"x", W/{self.target.etag}'}), self.target
+        )
+        assert not not_modified(request_with({"If-None-Match": '"x"'}), self.target)
+
+    def test_if_none_match_takes_precedence(self):
+        """Test that If-Modified-Since is ignored when If-None-Match is sent."""
+        headers = {
+            "If-None-Match": '"x"',
+            "If-Modified-Since": formatdate(self.target.created_at, usegmt=True),
+        }
+
+        assert not not_modified(request_with(headers), self.target)
+
+    def test_if_modified_since_uses_creation_time(self):
+        """Test that copies from the creation time on are still valid."""
+        created = self.target.created_at
+
+        assert not_modified(
+            request_with({"If-Modified-Since": formatdate(created, usegmt=True)}),
+            self.target,
+        )
+        assert not not_modified(
+            request_with({"If-Modified-Since": formatdate(created - 1, usegmt=True)}),
+            self.target,
+        )
+        assert not not_modified(
+            request_with({"If-Modified-Since": "not a date"}), self.target
+        )
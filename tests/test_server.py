@@ -0,0 +1,39 @@
+import os
+from unittest.mock import patch
+
+from ..app import server
+
+
+class TestMain:
+    """Tests for the production server entry point."""
+
+    def test_metrics_dir_from_env_file_is_kept(self, tmp_path, monkeypatch):
+        """Test that a METRICS_DIR set only in .env is not replaced by a temp dir."""
+        (tmp_path / ".env").write_text("WEB_WORKERS=4\nMETRICS_DIR=/srv/metrics\n")
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.delenv("WEB_WORKERS", raising=False)
+        monkeypatch.delenv("METRICS_DIR", raising=False)
+
+        with (
+            patch("app.server.uvicorn.run") as mock_run,
+            patch("app.server.tempfile.mkdtemp") as mock_mkdtemp,
+        ):
+            server.main()
+
+        mock_mkdtemp.assert_not_called()
+        assert mock_run.call_args.kwargs["workers"] == 4
+
+    def test_workers_share_a_temp_metrics_dir(self, tmp_path, monkeypatch):
+        """Test that several workers without METRICS_DIR get a shared temp dir."""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("WEB_WORKERS", "4")
+        monkeypatch.delenv("METRICS_DIR", raising=False)
+
+        with (
+            patch("app.server.uvicorn.run"),
+            patch("app.server.tempfile.mkdtemp", return_value="/tmp/m") as mkdtemp,
+        ):
+            server.main()
+
+        mkdtemp.assert_called_once()
+        assert os.environ["METRICS_DIR"] == "/tmp/m"
@@ -0,0 +1,166 @@
+from collections import Counter
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from ..app import cache
+from ..app.breaker import CircuitBreaker
+from ..app.cache import digest_key, get_cached_urls, invalidate_cached_codes
+from ..app.sharding import HashRing, ShardedRedis
+
+NODES = [f"redis://node{i}:6379/0" for i in range(4)]
+KEYS = [f"code{i:05d}" for i in range(20_000)]
+
+
+def make_shards(urls=NODES):
+    return ShardedRedis(urls, 160, lambda: CircuitBreaker(3, 5), decode_responses=True)
+
+
+def mock_pipeline(error=None):
+    """Stand-in for a node client's pipeline() context manager."""
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(side_effect=error)
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=pipe)
+    context.__aexit__ = AsyncMock(return_value=False)
+    return pipe, MagicMock(return_value=context)
+
+
+class TestHashRing:
+    """Tests for consistent hashing with virtual nodes."""
+
+    def test_keys_are_spread_evenly(self):
+        """Test that virtual nodes keep every node near its fair share."""
+        ring = HashRing(NODES, 160)
+
+        shares = Counter(ring.node_for(key) for key in KEYS)
+
+        assert set(shares) == set(NODES)
+        assert all(0.18 < count / len(KEYS) < 0.32 for count in shares.values())
+
+    def test_adding_a_node_only_moves_keys_to_it(self):
+        """Test that growing the ring remaps about 1/N of the keys."""
+        before = HashRing(NODES, 160)
+        after = HashRing([*NODES, "redis://node4:6379/0"], 160)
+
+        moved = [key for key in KEYS if before.node_for(key) != after.node_for(key)]
+
+        assert 0.12 < len(moved) / len(KEYS) < 0.28
+        assert {after.node_for(key) for key in moved} == {"redis://node4:6379/0"}
+
+    def test_removing_a_node_only_moves_its_keys(self):
+        """Test that the other nodes keep all of their keys."""
+        before = HashRing(NODES, 160)
+        after = HashRing(NODES[1:], 160)
+
+        moved = {key for key in KEYS if before.node_for(key) != after.node_for(key)}
+
+        assert moved == {key for key in KEYS if before.node_for(key) == NODES[0]}
+
+
+class TestShardedRedis:
+    """Tests for routing keys and commands to nodes."""
+
+    def test_nodes_are_named_without_credentials(self):
+        """Test that node names used in the ring and metrics hide passwords."""
+        shards = make_shards(["redis://:secret@cache-a:6380/2", "redis://cache-b"])
+
+        assert [node.name for node in shards.nodes] == [
+            "cache-a:6380/2",
+            "cache-b:6379/0",
+        ]
+        assert shards.primary is shards.nodes[0]
+
+    def test_duplicate_nodes_are_rejected(self):
+        """Test that one server listed twice is a configuration error."""
+        with pytest.raises(ValueError):
+            make_shards(["redis://cache-a:6379/0", "redis://cache-a:6379"])
+
+    @pytest.mark.asyncio
+    async def test_pipeline_runs_once_per_node(self):
+        """Test that keyed commands are batched per owning node."""
+        shards = make_shards()
+        pipes = {}
+        for node in shards.nodes:
+            pipes[node], node.client.pipeline = mock_pipeline()
+
+        pipe = shards.pipeline()
+        for key in KEYS[:100]:
+            pipe.keyed("set", key, "value")
+        pipe.primary("publish", "channel", "message")
+        await pipe.execute()
+
+        for node, node_pipe in pipes.items():
+            written = {call.args[0] for call in node_pipe.set.call_args_list}
+            assert written == {k for k in KEYS[:100] if shards.node_for(k) is node}
+            node_pipe.execute.assert_awaited_once()
+        pipes[shards.primary].publish.assert_called_once_with("channel", "message")
+
+    @pytest.mark.asyncio
+    async def test_health_check_trips_only_the_failing_node(self):
+        """Test that a dead node opens its own breaker and spares the others."""
+        shards = make_shards()
+        dead = shards.nodes[1]
+        for node in shards.nodes:
+            node.client.ping = AsyncMock(
+                side_effect=ConnectionError("down") if node is dead else None
+            )
+
+        for _ in range(dead.breaker.failure_threshold):
+            await shards.check_health()
+
+        assert dead.breaker.state == "open"
+        assert list(shards.stats().values()).count("closed") == len(NODES) - 1
+
+
+class TestShardedCache:
+    """Tests for the cache helpers over several nodes."""
+
+    @pytest.fixture
+    def shards(self):
+        shards = make_shards()
+        with patch.object(cache, "redis_shards", shards):
+            yield shards
+
+    @pytest.mark.asyncio
+    async def test_digest_lookup_survives_a_node_outage(self, shards):
+        """Test that digests on a failed node are misses, not a failed request."""
+        digests = [f"digest{i}" for i in range(50)]
+        dead = shards.node_for(digest_key(digests[0]))
+        for node in shards.nodes:
+            node.client.mget = AsyncMock(
+                side_effect=(
+                    ConnectionError("down")
+                    if node is dead
+                    else lambda keys: [f"out:{key}" for key in keys]
+                )
+            )
+
+        cached = await get_cached_urls(digests)
+
+        assert set(cached) == {
+            d for d in digests if shards.node_for(digest_key(d)) is not dead
+        }
+        assert cached[next(iter(cached))].startswith("out:digest:")
+
+    @pytest.mark.asyncio
+    async def test_invalidation_deletes_on_owners_and_publishes_on_primary(
+        self, shards
+    ):
+        """Test that keys are deleted where they live and announced once."""
+        pipes = {}
+        for node in shards.nodes:
+            pipes[node], node.client.pipeline = mock_pipeline()
+        keys = KEYS[:20]
+
+        await invalidate_cached_codes(*keys)
+
+        deleted = [
+            key
+            for node_pipe in pipes.values()
+            for call in node_pipe.delete.call_args_list
+            for key in call.args
+        ]
+        assert sorted(deleted) == keys
+        assert pipes[shards.primary].publish.call_count == len(keys)
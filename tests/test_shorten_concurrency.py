@@ -0,0 +1,68 @@
+import asyncio
+import os
+from http import HTTPStatus
+from unittest.mock import patch
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from ..app.main import app
+from ..app.models import Url, table_registry
+from ..app.ratelimit import rate_limiter
+from ..app.storage import PostgresStorage
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="requires a Postgres database in TEST_DATABASE_URL"
+)
+
+
+@pytest_asyncio.fixture
+async def session_factory():
+    """Create the schema on a real Postgres and route the app to it."""
+    engine = create_async_engine(TEST_DATABASE_URL, pool_size=20, max_overflow=0)
+    async with engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.drop_all)
+        await conn.run_sync(table_registry.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    with patch("app.main.url_storage", PostgresStorage(factory)):
+        yield factory
+
+    async with engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.drop_all)
+    await engine.dispose()
+
+
+class TestShortenConcurrency:
+    """Tests for concurrent POST /shorten against Postgres."""
+
+    @pytest.mark.asyncio
+    async def test_identical_requests_create_single_row(self, session_factory):
+        """Test that hundreds of identical submissions yield one row and code."""
+        url = "https://example.com/campaign/launch"
+        transport = httpx.ASGITransport(app=app)
+
+        with (
+            patch("app.main.get_cached_urls", return_value={}),
+            patch("app.main.cache_urls"),
+            patch.object(rate_limiter, "enabled", False),
+        ):
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                responses = await asyncio.gather(
+                    *(client.post("/shorten", json={"url": url}) for _ in range(300))
+                )
+
+        assert all(r.status_code == HTTPStatus.CREATED for r in responses)
+        assert len({r.json()["short_code"] for r in responses}) == 1
+
+        async with session_factory() as session:
+            count = await session.scalar(select(func.count()).select_from(Url))
+        assert count == 1
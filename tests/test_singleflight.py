@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from ..app.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for request coalescing."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """Test that N concurrent calls for one key run the function once."""
+        flight = SingleFlight()
+        calls = 0
+
+        async def lookup():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "https://example.com"
+
+        results = await asyncio.gather(
+            *(flight.do("abc123", lookup) for _ in range(50))
+        )
+
+        assert calls == 1
+        assert flight.coalesced == 49
+        assert set(results) == {"https://example.com"}
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_waiters(self):
+        """Test that a failing call raises in every waiter and is not cached."""
+        flight = SingleFlight()
+
+        async def lookup():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("db down")
+
+        results = await asyncio.gather(
+            *(flight.do("abc123", lookup) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+        async def recovered():
+            return "https://example.com"
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert await flight.do("abc123", recovered) == "https://example.com"
+
+    @pytest.mark.asyncio
+    async def test_different_keys_do_not_coalesce(self):
+        """Test that distinct keys run independently."""
+        flight = SingleFlight()
+
+        async def lookup():
+            await asyncio.sleep(0.01)
+            return 1
+
+        await asyncio.gather(flight.do("a", lookup), flight.do("b", lookup))
+
+        assert flight.coalesced == 0
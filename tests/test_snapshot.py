@@ -0,0 +1,205 @@
+from datetime import datetime
+from http import HTTPStatus
+from time import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ..app.codes import ShortCodeAllocator
+from ..app.edge import app
+from ..app.snapshot import (
+    BASE_PREFIX,
+    DELTA_PREFIX,
+    Snapshot,
+    SnapshotSet,
+    SnapshotWriter,
+    snapshot_name,
+)
+from ..app.snapshot_builder import DELTA_OVERLAP, build_delta
+
+
+def write_snapshot(path, entries, built_at=None):
+    """Write `entries` ({code: url or (url, expires_at)}) sorted by code."""
+    writer = SnapshotWriter(path, 7, built_at or time())
+    for code in sorted(entries):
+        value = entries[code]
+        url, expires_at = value if isinstance(value, tuple) else (value, None)
+        writer.add(code, url, expires_at)
+    return writer.commit()
+
+
+class TestSnapshotFile:
+    """Tests for the memory-mapped snapshot format."""
+
+    def test_every_code_is_found_by_binary_search(self, tmp_path):
+        """Test that all written codes resolve and others do not."""
+        allocator = ShortCodeAllocator("test", 1024)
+        entries = {
+            allocator.encode_id(i): f"https://example.com/{i}" for i in range(1000)
+        }
+        snapshot = Snapshot(write_snapshot(tmp_path / "s.snap", entries))
+
+        assert snapshot.count == 1000
+        for code, url in entries.items():
+            assert snapshot.long_url(snapshot.find(code)) == url
+        assert snapshot.find("zzzzzzz") == -1
+        assert snapshot.find("toolongcode") == -1
+        snapshot.close()
+
+    def test_shorter_legacy_codes_are_padded(self, tmp_path):
+        """Test that codes narrower than the key width do not match prefixes."""
+        snapshot = Snapshot(
+            write_snapshot(
+                tmp_path / "s.snap",
+                {"abc": "https://example.com/abc", "abcd": "https://example.com/abcd"},
+            )
+        )
+
+        assert snapshot.long_url(snapshot.find("abc")) == "https://example.com/abc"
+        assert snapshot.long_url(snapshot.find("abcd")) == "https://example.com/abcd"
+        assert snapshot.find("ab") == -1
+        snapshot.close()
+
+    def test_unsorted_input_is_rejected(self, tmp_path):
+        """Test that the writer refuses rows the binary search could not find."""
+        writer = SnapshotWriter(tmp_path / "s.snap", 7, time())
+        writer.add("bbbbbbb", "https://example.com/b", None)
+
+        with pytest.raises(ValueError):
+            writer.add("aaaaaaa", "https://example.com/a", None)
+        writer.close()
+
+    def test_non_ascii_urls_round_trip(self, tmp_path):
+        """Test that URLs are stored as UTF-8 in the blob."""
+        url = "https://exemplo.com.br/ação?q=çã"
+        snapshot = Snapshot(write_snapshot(tmp_path / "s.snap", {"aaaaaaa": url}))
+
+        assert snapshot.long_url(snapshot.find("aaaaaaa")) == url
+        snapshot.close()
+
+
+class TestSnapshotSet:
+    """Tests for base + delta lookups and hot swapping."""
+
+    def test_deltas_add_new_codes_and_win_over_base(self, tmp_path):
+        """Test that the newest file holding a code answers for it."""
+        write_snapshot(
+            tmp_path / snapshot_name(BASE_PREFIX, 100),
+            {"aaaaaaa": "https://example.com/a", "bbbbbbb": "https://example.com/b"},
+            built_at=100,
+        )
+        write_snapshot(
+            tmp_path / snapshot_name(DELTA_PREFIX, 200),
+            {"bbbbbbb": ("https://example.com/b", 1), "ccccccc": "https://c.com"},
+            built_at=200,
+        )
+        snapshots = SnapshotSet(tmp_path)
+        snapshots.reload()
+
+        assert snapshots.get("aaaaaaa") == "https://example.com/a"
+        assert snapshots.get("ccccccc") == "https://c.com"
+        # Expired in the newer delta: the base entry is not used.
+        assert snapshots.get("bbbbbbb") is None
+        snapshots.close()
+
+    def test_deltas_older_than_base_are_ignored(self, tmp_path):
+        """Test that a new full build supersedes earlier deltas."""
+        write_snapshot(
+            tmp_path / snapshot_name(DELTA_PREFIX, 100),
+            {"aaaaaaa": "https://old.com"},
+            built_at=100,
+        )
+        write_snapshot(
+            tmp_path / snapshot_name(BASE_PREFIX, 200),
+            {"bbbbbbb": "https://example.com/b"},
+            built_at=200,
+        )
+        snapshots = SnapshotSet(tmp_path)
+        snapshots.reload()
+
+        assert snapshots.get("aaaaaaa") is None
+        assert snapshots.stats()["files"] == [snapshot_name(BASE_PREFIX, 200)]
+        snapshots.close()
+
+    def test_reload_swaps_only_when_files_change(self, tmp_path):
+        """Test that a new delta is picked up and unchanged sets are kept."""
+        write_snapshot(
+            tmp_path / snapshot_name(BASE_PREFIX, 100),
+            {"aaaaaaa": "https://example.com/a"},
+            built_at=100,
+        )
+        snapshots = SnapshotSet(tmp_path)
+
+        assert snapshots.reload()
+        assert not snapshots.reload()
+        assert snapshots.get("bbbbbbb") is None
+
+        write_snapshot(
+            tmp_path / snapshot_name(DELTA_PREFIX, 200),
+            {"bbbbbbb": "https://example.com/b"},
+            built_at=200,
+        )
+
+        assert snapshots.reload()
+        assert snapshots.get("bbbbbbb") == "https://example.com/b"
+        assert snapshots.get("aaaaaaa") == "https://example.com/a"
+        snapshots.close()
+
+
+class TestSnapshotBuilder:
+    """Tests for choosing between a delta and a full build."""
+
+    @pytest.mark.asyncio
+    async def test_delta_reads_links_created_since_latest_file(self, tmp_path):
+        """Test that a recent base gets a delta of the newer links only."""
+        built_at = time() - 60
+        write_snapshot(tmp_path / snapshot_name(BASE_PREFIX, built_at), {}, built_at)
+
+        with (
+            patch("app.snapshot_builder.build_snapshot") as build_snapshot,
+            patch("app.snapshot_builder.build_full") as build_full,
+        ):
+            await build_delta(tmp_path, 100, max_base_age=3600)
+
+        build_full.assert_not_awaited()
+        since = build_snapshot.await_args.args[2]
+        assert since == datetime.fromtimestamp(built_at) - DELTA_OVERLAP
+
+    @pytest.mark.asyncio
+    async def test_old_base_is_rebuilt_in_full(self, tmp_path):
+        """Test that staleness from changed old links is bounded by the base age."""
+        built_at = time() - 7200
+        write_snapshot(tmp_path / snapshot_name(BASE_PREFIX, built_at), {}, built_at)
+
+        with (
+            patch("app.snapshot_builder.build_snapshot") as build_snapshot,
+            patch("app.snapshot_builder.build_full") as build_full,
+        ):
+            await build_delta(tmp_path, 100, max_base_age=3600)
+
+        build_full.assert_awaited_once_with(tmp_path, 100)
+        build_snapshot.assert_not_awaited()
+
+
+class TestEdgeApp:
+    """Tests for the redirect-only edge app."""
+
+    def test_redirects_from_snapshot(self, tmp_path):
+        """Test that codes resolve from the snapshot without a database."""
+        write_snapshot(
+            tmp_path / snapshot_name(BASE_PREFIX, 100),
+            {"aaaaaaa": "https://example.com/a"},
+            built_at=100,
+        )
+
+        with (
+            patch("app.edge.snapshots", SnapshotSet(tmp_path)),
+            TestClient(app) as client,
+        ):
+            found = client.get("/aaaaaaa", follow_redirects=False)
+            missing = client.get("/zzzzzzz", follow_redirects=False)
+
+        assert found.status_code == HTTPStatus.FOUND
+        assert found.headers["location"] == "https://example.com/a"
+        assert missing.status_code == HTTPStatus.NOT_FOUND
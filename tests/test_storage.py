@@ -0,0 +1,232 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..app.cache import digest_key
+from ..app.models import Url
+from ..app.storage import MemoryStorage, PostgresStorage, upsert_url_statement
+from ..app.utils import hash_url
+
+URLS = {
+    hash_url(f"https://example.com/{i}"): f"https://example.com/{i}" for i in range(3)
+}
+
+
+class TestMemoryStorage:
+    """Tests for the in-process storage engine."""
+
+    @pytest.mark.asyncio
+    async def test_links_are_indexed_by_code_and_digest(self):
+        """Test that a created link is found by its code and by its digest."""
+        storage = MemoryStorage("test")
+
+        created = await storage.create_many(URLS)
+
+        assert len({url.short_code for url in created}) == len(URLS)
+        for url in created:
+            assert await storage.get_by_code(url.short_code) is url
+        assert await storage.get_by_digests([*URLS, "missing"]) == {
+            url.long_url_digest: url for url in created
+        }
+
+    @pytest.mark.asyncio
+    async def test_concurrent_creates_share_one_link(self):
+        """Test that simultaneous requests for one URL yield a single code."""
+        storage = MemoryStorage("test")
+        digest, long_url = next(iter(URLS.items()))
+
+        created = await asyncio.gather(
+            *(storage.create(digest, long_url) for _ in range(100))
+        )
+
+        assert len({url.short_code for url in created}) == 1
+        assert len(storage.by_code) == 1
+
+    @pytest.mark.asyncio
+    async def test_changed_links_are_invalidated(self):
+        """Test that extending or opting a link out of caching invalidates it."""
+        storage = MemoryStorage("test")
+        digest, long_url = next(iter(URLS.items()))
+
+        with patch("app.storage.invalidate_cached_codes") as mock_invalidate:
+            url = await storage.create(digest, long_url)
+            await storage.create(digest, long_url)
+            mock_invalidate.assert_not_awaited()
+
+            await storage.create(digest, long_url, cacheable=False)
+
+        mock_invalidate.assert_awaited_once_with(url.short_code, digest_key(digest))
+
+    @pytest.mark.asyncio
+    async def test_recreating_follows_upsert_rules(self):
+        """Test that expiry only grows and opting out of caching sticks."""
+        storage = MemoryStorage("test")
+        digest, long_url = next(iter(URLS.items()))
+        soon = datetime.now() + timedelta(hours=1)
+        later = soon + timedelta(days=1)
+
+        url = await storage.create(digest, long_url, later)
+        await storage.create(digest, long_url, soon, cacheable=False)
+        assert (url.expires_at, url.cacheable) == (later, False)
+
+        await storage.create(digest, long_url)
+        assert (url.expires_at, url.cacheable) == (None, False)
+
+    @pytest.mark.asyncio
+    async def test_expired_links_are_hidden_then_purged(self):
+        """Test that expired codes are not served and the purge drops them."""
+        storage = MemoryStorage("test")
+        [expiring, extended, permanent] = await storage.create_many(
+            dict(list(URLS.items())[:2]), datetime.now() + timedelta(hours=1)
+        ) + await storage.create_many(dict(list(URLS.items())[2:]))
+        # Another request extended the second link before it expired.
+        await storage.create(
+            extended.long_url_digest,
+            extended.long_url,
+            datetime.now() + timedelta(days=1),
+        )
+        expiring.expires_at = datetime.now() - timedelta(seconds=1)
+
+        assert await storage.get_by_code(expiring.short_code) is None
+        with patch("app.storage.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime.now() + timedelta(hours=2)
+            assert storage.purge_expired() == 1
+
+        assert set(storage.by_code) == {extended.short_code, permanent.short_code}
+        assert expiring.long_url_digest not in storage.by_digest
+
+
+def upserted(stmt, params):
+    """RETURNING of an upsert that inserts every row it is given."""
+    if isinstance(params, dict):
+        return Url(**params)
+    return [Url(**row) for row in params]
+
+    @pytest.mark.asyncio
+    async def test_delete_invalidates_cache(self):
+        """Test that a deleted link leaves both indexes and the cache."""
+        storage = MemoryStorage("test")
+        url = await storage.create(*next(iter(URLS.items())))
+
+        with patch("app.storage.invalidate_cached_codes") as mock_invalidate:
+            assert await storage.delete(url.short_code) is True
+            assert await storage.delete(url.short_code) is False
+
+        assert not storage.by_code and not storage.by_digest
+        assert await storage.get_by_code(url.short_code) is None
+        mock_invalidate.assert_awaited_once_with(
+            url.short_code, digest_key(url.long_url_digest)
+        )
+
+
+class TestPostgresStorage:
+    """Tests for the statements issued by the Postgres storage."""
+
+    def test_upsert_only_updates_links_it_changes(self):
+        """Test that links that already satisfy the request are not rewritten."""
+        sql = str(upsert_url_statement().compile(dialect=postgresql.dialect()))
+
+        assert "ON CONFLICT (long_url_digest) DO UPDATE" in sql
+        assert "WHERE urls.cacheable AND NOT excluded.cacheable" in sql
+
+    @pytest.mark.asyncio
+    async def test_single_link_is_one_upsert(self, mock_session_factory):
+        """Test that creating one link is a single statement and a commit."""
+        session = AsyncMock(spec=AsyncSession)
+        session.scalar.side_effect = upserted
+        storage = PostgresStorage(mock_session_factory(session))
+        digest, long_url = next(iter(URLS.items()))
+        expires_at = datetime.now() + timedelta(days=7)
+
+        with (
+            patch("app.storage.code_allocator.allocate", return_value="abc1234"),
+            patch("app.storage.invalidate_cached_codes") as mock_invalidate,
+        ):
+            url = await storage.create(digest, long_url, expires_at, cacheable=False)
+
+        session.scalar.assert_awaited_once()
+        row = session.scalar.await_args.args[1]
+        assert (row["short_code"], row["long_url_digest"]) == ("abc1234", digest)
+        assert (row["expires_at"], row["cacheable"]) == (expires_at, False)
+        assert url.short_code == "abc1234"
+        session.commit.assert_awaited_once()
+        mock_invalidate.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_many_links_are_one_multi_row_upsert(self, mock_session_factory):
+        """Test that a batch of links is inserted in a single statement."""
+        session = AsyncMock(spec=AsyncSession)
+        session.scalars.side_effect = upserted
+        storage = PostgresStorage(mock_session_factory(session))
+
+        with patch("app.storage.code_allocator.allocate", return_value="abc1234"):
+            created = await storage.create_many(URLS)
+
+        session.scalars.assert_awaited_once()
+        rows = session.scalars.await_args.args[1]
+        assert [row["long_url"] for row in rows] == list(URLS.values())
+        assert [url.long_url for url in created] == list(URLS.values())
+        session.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_changed_links_are_invalidated(self, mock_session_factory):
+        """Test that links the upsert changed leave every worker's cache."""
+        [changed_digest, unchanged_digest, new_digest] = URLS
+        changed = Url(
+            uuid="existing",
+            long_url=URLS[changed_digest],
+            short_code="chgd123",
+            long_url_digest=changed_digest,
+            cacheable=False,
+        )
+        unchanged = Url(
+            uuid="existing-too",
+            long_url=URLS[unchanged_digest],
+            short_code="same123",
+            long_url_digest=unchanged_digest,
+        )
+        session = AsyncMock(spec=AsyncSession)
+
+        def upsert_then_read(stmt, params):
+            if params is None:
+                # Re-read of the links the upsert left as they were.
+                return [unchanged]
+            [new] = [
+                Url(**row) for row in params if row["long_url_digest"] == new_digest
+            ]
+            return [changed, new]
+
+        session.scalars.side_effect = lambda stmt, params=None: upsert_then_read(
+            stmt, params
+        )
+        storage = PostgresStorage(mock_session_factory(session))
+
+        with (
+            patch("app.storage.code_allocator.allocate", return_value="abc1234"),
+            patch("app.storage.invalidate_cached_codes") as mock_invalidate,
+        ):
+            created = await storage.create_many(URLS, cacheable=False)
+
+        assert [url.long_url_digest for url in created] == list(URLS)
+        mock_invalidate.assert_awaited_once_with("chgd123", digest_key(changed_digest))
+
+    @pytest.mark.asyncio
+    async def test_delete_invalidates_cache(self, mock_session_factory):
+        """Test that a link and its clicks are deleted, then leave the cache."""
+        digest = next(iter(URLS))
+        session = AsyncMock(spec=AsyncSession)
+        session.scalar.side_effect = [digest, None]
+        storage = PostgresStorage(mock_session_factory(session))
+
+        with patch("app.storage.invalidate_cached_codes") as mock_invalidate:
+            assert await storage.delete("abc1234") is True
+            assert await storage.delete("abc1234") is False
+
+        # The clicks are only deleted for the link that existed.
+        session.execute.assert_awaited_once()
+        assert session.commit.await_count == 2
+        mock_invalidate.assert_awaited_once_with("abc1234", digest_key(digest))
@@ -0,0 +1,258 @@
+import json
+from collections import namedtuple
+from datetime import datetime
+from http import HTTPStatus
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..app.codes import ShortCodeAllocator
+from ..app.main import app
+from ..app.transfer import (
+    MAX_IMPORTED_CODE_LENGTH,
+    import_row,
+    import_urls,
+    read_csv,
+    read_ndjson,
+)
+from ..app.utils import hash_url
+
+ExportRow = namedtuple(
+    "ExportRow",
+    ["uuid", "long_url", "short_code", "created_at", "expires_at", "cacheable"],
+)
+
+CREATED_AT = datetime(2026, 1, 29, 10, 30)
+
+
+def export_row(short_code):
+    return ExportRow(
+        "550e8400-e29b-41d4-a716-446655440000",
+        f"https://example.com/{short_code}",
+        short_code,
+        CREATED_AT,
+        None,
+        True,
+    )
+
+
+def fake_partitions(*partitions):
+    async def stream(batch_size):
+        for rows in partitions:
+            yield rows
+
+    return stream
+
+
+def session_inserting(*results):
+    """Session whose INSERT ... RETURNING calls return `results` in turn."""
+    session = AsyncMock(spec=AsyncSession)
+    session.scalars.side_effect = list(results)
+    return session
+
+
+ADMIN_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+class TestExport:
+    """Tests for GET /urls/export."""
+
+    @pytest.fixture(autouse=True)
+    def admin_token(self):
+        with (
+            patch("app.main.settings.admin_token", "test-token"),
+            patch("app.main.code_sequence_bound", return_value=6144),
+        ):
+            yield
+
+    def test_export_requires_admin_token(self):
+        """Test that the table is only streamed to the admin bearer token."""
+        client = TestClient(app)
+
+        assert client.get("/urls/export").status_code == HTTPStatus.UNAUTHORIZED
+        response = client.get("/urls/export", headers={"Authorization": "Bearer wrong"})
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        with patch("app.main.settings.admin_token", None):
+            response = client.get("/urls/export", headers=ADMIN_HEADERS)
+        assert response.status_code == HTTPStatus.FORBIDDEN
+
+    def test_export_reports_sequence_bound(self):
+        """Test that the response carries the bound for import --sequence-bound."""
+        with patch("app.transfer.stream_url_rows", fake_partitions()):
+            response = TestClient(app).get("/urls/export", headers=ADMIN_HEADERS)
+
+        assert response.headers["x-short-code-sequence-bound"] == "6144"
+
+    def test_ndjson_streams_one_object_per_row(self):
+        """Test that every row of every cursor batch becomes one NDJSON line."""
+        partitions = [[export_row("aaaaaaa"), export_row("bbbbbbb")], [export_row("c")]]
+
+        with patch("app.transfer.stream_url_rows", fake_partitions(*partitions)):
+            response = TestClient(app).get("/urls/export", headers=ADMIN_HEADERS)
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["short_code"] for line in lines] == ["aaaaaaa", "bbbbbbb", "c"]
+        assert lines[0]["created_at"] == "2026-01-29T10:30:00"
+        assert lines[0]["expires_at"] is None
+
+    def test_csv_has_header_and_round_trips(self):
+        """Test that the CSV export can be read back by the importer."""
+        with patch(
+            "app.transfer.stream_url_rows",
+            fake_partitions([export_row("aaaaaaa")]),
+        ):
+            response = TestClient(app).get(
+                "/urls/export", params={"format": "csv"}, headers=ADMIN_HEADERS
+            )
+
+        lines = response.text.splitlines()
+        assert lines[0] == "uuid,long_url,short_code,created_at,expires_at,cacheable"
+        [record] = read_csv(lines)
+        assert record["short_code"] == "aaaaaaa"
+        assert "expires_at" not in record
+        assert import_row(record, CREATED_AT)["cacheable"] is True
+
+    def test_unknown_format_is_rejected(self):
+        """Test that only NDJSON and CSV are offered."""
+        response = TestClient(app).get(
+            "/urls/export", params={"format": "xml"}, headers=ADMIN_HEADERS
+        )
+
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+class TestImport:
+    """Tests for the batched importer."""
+
+    @pytest.mark.asyncio
+    async def test_records_are_inserted_in_batches(self, mock_session_factory):
+        """Test that each batch is one INSERT and codes are allocated when missing."""
+        records = [
+            {"long_url": "https://example.com/a", "short_code": "aaaaaaa"},
+            {"url": "https://example.com/b"},
+            {"long_url": "https://example.com/c", "short_code": "ccccccc"},
+        ]
+        session = session_inserting(["aaaaaaa", "zzzzzzz"], ["ccccccc"])
+
+        with (
+            patch("app.transfer.AsyncSessionLocal", mock_session_factory(session)),
+            patch("app.transfer.code_allocator.allocate", return_value="zzzzzzz"),
+            patch("app.transfer.announce_codes") as mock_announce,
+        ):
+            stats = await import_urls(records, batch_size=2)
+
+        assert stats.inserted == 3
+        assert stats.skipped == 0
+        first_batch = session.scalars.await_args_list[0].args[1]
+        assert [row["short_code"] for row in first_batch] == ["aaaaaaa", "zzzzzzz"]
+        assert first_batch[1]["long_url_digest"] == hash_url("https://example.com/b")
+        assert session.commit.await_count == 2
+        mock_announce.assert_any_await(["aaaaaaa", "zzzzzzz"])
+
+    @pytest.mark.asyncio
+    async def test_existing_urls_and_invalid_records_are_skipped(
+        self, mock_session_factory
+    ):
+        """Test that conflicts keep the stored row and bad lines do not abort."""
+        lines = [
+            json.dumps({"long_url": "https://example.com/a", "short_code": "aaaaaaa"}),
+            "{not json",
+            json.dumps({"short_code": "bbbbbbb"}),
+            json.dumps({"long_url": "not a url"}),
+        ]
+        session = session_inserting([])
+
+        with (
+            patch("app.transfer.AsyncSessionLocal", mock_session_factory(session)),
+            patch("app.transfer.announce_codes"),
+        ):
+            stats = await import_urls(read_ndjson(lines), batch_size=10)
+
+        assert (stats.inserted, stats.skipped, stats.invalid) == (0, 1, 3)
+
+    @pytest.mark.asyncio
+    async def test_malformed_short_codes_are_invalid(self, mock_session_factory):
+        """Test that non-string, empty, non-base62 and oversized codes are rejected."""
+        codes = [1234567, "", "a/b", "abc def", "a" * (MAX_IMPORTED_CODE_LENGTH + 1)]
+        records = [
+            {"long_url": f"https://example.com/{i}", "short_code": code}
+            for i, code in enumerate(codes)
+        ]
+        session = session_inserting([])
+
+        with (
+            patch("app.transfer.AsyncSessionLocal", mock_session_factory(session)),
+            patch("app.transfer.announce_codes"),
+        ):
+            stats = await import_urls(records, batch_size=10)
+
+        assert (stats.inserted, stats.skipped, stats.invalid) == (0, 0, len(codes))
+        session.scalars.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_allocated_code_colliding_with_imported_one_is_retried(
+        self, mock_session_factory
+    ):
+        """Test that a URL whose new code was taken gets another code."""
+        records = [{"long_url": "https://example.com/b"}]
+        # INSERT skips the row, the digest lookup finds nothing, the retry lands.
+        session = session_inserting([], [], ["yyyyyyy"])
+
+        with (
+            patch("app.transfer.AsyncSessionLocal", mock_session_factory(session)),
+            patch(
+                "app.transfer.code_allocator.allocate",
+                side_effect=["xxxxxxx", "yyyyyyy"],
+            ),
+            patch("app.transfer.announce_codes"),
+        ):
+            stats = await import_urls(records, batch_size=10)
+
+        assert stats.inserted == 1
+        assert stats.skipped == 0
+
+    @pytest.mark.asyncio
+    async def test_sequence_moves_past_imported_codes(self, mock_session_factory):
+        """Test that codes the source allocated push the ID sequence forward."""
+        allocator = ShortCodeAllocator("test", 1024)
+        codes = [allocator.encode_id(5000), allocator.encode_id(50_000)]
+        session = session_inserting(codes)
+
+        with (
+            patch("app.transfer.code_allocator", allocator),
+            patch("app.transfer.AsyncSessionLocal", mock_session_factory(session)),
+            patch("app.transfer.announce_codes"),
+            patch("app.transfer.advance_code_sequence") as mock_advance,
+        ):
+            await import_urls(
+                [
+                    {"long_url": f"https://example.com/{code}", "short_code": code}
+                    for code in codes
+                ],
+                batch_size=10,
+                sequence_bound=6144,
+            )
+
+        # The second code decodes past the source's sequence: not allocated there.
+        mock_advance.assert_awaited_once_with(5000)
+
+    @pytest.mark.asyncio
+    async def test_sequence_is_kept_by_default(self, mock_session_factory):
+        """Test that importing codes does not touch the sequence unless asked."""
+        session = session_inserting(["aaaaaaa"])
+
+        with (
+            patch("app.transfer.AsyncSessionLocal", mock_session_factory(session)),
+            patch("app.transfer.announce_codes"),
+            patch("app.transfer.advance_code_sequence") as mock_advance,
+        ):
+            await import_urls(
+                [{"long_url": "https://example.com/a", "short_code": "aaaaaaa"}],
+                batch_size=10,
+            )
+
+        mock_advance.assert_not_awaited()
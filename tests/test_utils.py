@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+from ..app.utils import hash_url, normalize_url, parse_local_datetime
+
+
+class TestUrlDigest:
+    """Tests for URL normalization and hashing."""
+
+    def test_normalize_lowercases_scheme_and_host(self):
+        """Test that scheme and host are case-insensitive."""
+        assert (
+            normalize_url(" HTTPS://Example.COM/Path?Q=1 ")
+            == "https://example.com/Path?Q=1"
+        )
+
+    def test_normalize_keeps_userinfo_case(self):
+        """Test that credentials in the netloc are left untouched."""
+        assert (
+            normalize_url("https://User:Pw@Example.com/")
+            == "https://User:Pw@example.com/"
+        )
+
+    def test_hash_is_fixed_width(self):
+        """Test that digests are 64 hex chars regardless of URL length."""
+        digest = hash_url("https://example.com/" + "a" * 10_000)
+
+        assert len(digest) == 64
+        assert hash_url("https://EXAMPLE.com/a") == hash_url("https://example.com/a")
+        assert hash_url("https://example.com/a") != hash_url("https://example.com/A")
+
+
+class TestParseLocalDatetime:
+    """Tests for the ISO 8601 parsing shared by the API and the importer."""
+
+    def test_aware_datetimes_become_naive_local_time(self):
+        """Test that an offset is converted to local time and dropped."""
+        parsed = parse_local_datetime("2030-01-01T12:00:00+00:00")
+
+        assert parsed.tzinfo is None
+        utc = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+        assert parsed == utc.astimezone().replace(tzinfo=None)
+
+    def test_naive_datetimes_are_kept(self):
+        """Test that a value without offset is already local time."""
+        assert parse_local_datetime("2030-01-01T12:00:00") == datetime(2030, 1, 1, 12)
+        assert parse_local_datetime(None) is None
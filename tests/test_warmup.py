@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from ..app import warmup
+from ..app.warmup import warm_cache, warm_cache_on_startup, warmup_statement
+
+
+def fake_batches(*batches, delay=0):
+    async def stream(max_rows, batch_size):
+        for batch in batches:
+            await asyncio.sleep(delay)
+            yield batch
+
+    return stream
+
+
+class TestWarmupStatement:
+    """Tests for the query that picks the URLs to warm."""
+
+    def test_rows_are_limited_in_sql(self):
+        """Test that the row budget is a LIMIT, not a client-side cutoff."""
+        stmt = warmup_statement(datetime.now(), 500)
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+        assert "LIMIT" in sql
+        assert stmt.compile(dialect=postgresql.dialect()).params["param_1"] == 500
+
+
+class TestWarmCache:
+    """Tests for the startup cache warm-up."""
+
+    @pytest.mark.asyncio
+    async def test_batches_are_written_to_redis_only(self):
+        """Test that each streamed batch becomes one pipelined Redis write."""
+        batches = [
+            {"aaaaaaa": ("https://example.com/a", None)},
+            {"bbbbbbb": ("https://b.com", None)},
+        ]
+
+        with (
+            patch("app.warmup.stream_warmup_batches", fake_batches(*batches)),
+            patch("app.warmup.set_cached_many") as mock_cache,
+        ):
+            warmed = await warm_cache(max_rows=10, max_seconds=5, batch_size=1)
+
+        assert warmed == 2
+        assert [call.args[0] for call in mock_cache.await_args_list] == batches
+        assert all(
+            call.kwargs == {"local": False} for call in mock_cache.await_args_list
+        )
+
+    @pytest.mark.asyncio
+    async def test_stops_at_time_budget(self):
+        """Test that the warm-up gives up once its time budget is spent."""
+        batches = [{f"code{i}": ("https://example.com", None)} for i in range(100)]
+
+        with (
+            patch(
+                "app.warmup.stream_warmup_batches", fake_batches(*batches, delay=0.01)
+            ),
+            patch("app.warmup.set_cached_many"),
+        ):
+            warmed = await warm_cache(max_rows=100, max_seconds=0.05, batch_size=1)
+
+        assert 0 < warmed < 100
+
+    @pytest.mark.asyncio
+    async def test_survives_refused_connection(self):
+        """Test that a refused database connection ends the warm-up quietly."""
+
+        async def refused(max_rows, batch_size):
+            yield {"aaaaaaa": ("https://example.com/a", None)}
+            raise ConnectionRefusedError("db down")
+
+        with (
+            patch("app.warmup.stream_warmup_batches", refused),
+            patch("app.warmup.set_cached_many"),
+        ):
+            warmed = await warm_cache(max_rows=10, max_seconds=5, batch_size=1)
+
+        assert warmed == 1
+
+    @pytest.mark.asyncio
+    async def test_only_one_worker_warms(self):
+        """Test that workers that lose the Redis lock skip the warm-up."""
+        with (
+            patch.object(warmup.redis_client, "set", AsyncMock(return_value=None)),
+            patch("app.warmup.warm_cache") as mock_warm,
+        ):
+            await warm_cache_on_startup()
+
+        mock_warm.assert_not_awaited()